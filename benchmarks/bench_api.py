@@ -0,0 +1,288 @@
+"""
+Навантажувальний тест API: затримки p50/p95/p99 і RPS за ендпоінтами.
+
+Генерується відтворюваний набір даних (N користувачів x M контактів) у SQLite або Postgres,
+після чого сценарії register, login, list, search, update, export виконуються асинхронним
+HTTP-клієнтом (httpx) з concurrency одночасними клієнтами - проти застосунку в тому ж процесі
+(ASGITransport) або проти запущеного uvicorn (--url). Результат можна зберегти в JSON
+і порівняти з базовою лінією іншого коміту.
+
+Працює без мережі: листи лише ставляться в чергу outbox (воркер SMTP не запускається),
+аватари - у локальному сховищі (AVATAR_STORAGE=local), обмеження запитів вимкнено.
+
+Запуск:
+    python -m benchmarks.bench_api --users 20 --contacts 500 --requests 300 --output bench.json
+    python -m benchmarks.bench_api --baseline bench.json
+    # проти uvicorn (RATE_LIMIT_ENABLED=false uvicorn main:app --workers 4):
+    python -m benchmarks.bench_api --url http://127.0.0.1:8000 --database-url postgresql://...
+"""
+
+import os
+
+os.environ.setdefault("AVATAR_STORAGE", "local")
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import subprocess
+import tempfile
+import time
+from datetime import date
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import crud
+from database import create_schema, to_async_url
+from main import create_app
+from models import Contact, User
+from services.passwords import password_hasher
+from settings import Settings
+
+WORKLOADS = ("register", "login", "list", "search", "update", "export")
+PASSWORD = "bench-password"
+LAST_NAMES = ("Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Oliinyk", "Lysenko", "Melnyk")
+
+
+def user_email(n: int) -> str:
+    return f"bench{n}@example.com"
+
+
+def make_contacts(user: int, count: int, rng: random.Random):
+    for n in range(count):
+        yield n, {
+            "first_name": f"Name{rng.randrange(1000)}",
+            "last_name": rng.choice(LAST_NAMES),
+            "email": f"c{user}_{n}@bench.example.com",
+            "phone_number": f"+380{rng.randrange(10 ** 9):09d}",
+            "birthday": date(1970 + rng.randrange(40), 1 + rng.randrange(12), 1 + rng.randrange(28)),
+            "additional_info": None if n % 2 else f"note {n}",
+        }
+
+
+async def seed(url: str, users: int, contacts: int, seed_value: int) -> Dict[str, List[int]]:
+    """Користувачі з однаковим паролем (bcrypt один раз) та їхні контакти; повертає id контактів за email."""
+    create_schema(url)
+    engine = create_async_engine(to_async_url(url))
+    rng = random.Random(seed_value)
+    hashed_password = await password_hasher.hash(PASSWORD)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            existing = set((await db.execute(select(User.email).where(User.email.like("bench%@example.com")))).scalars())
+            for n in range(users):
+                if user_email(n) in existing:
+                    continue
+                user = User(email=user_email(n), hashed_password=hashed_password, is_verified=True)
+                db.add(user)
+                await db.flush()
+                rows = list(make_contacts(n, contacts, rng))
+                for start in range(0, contacts, 500):
+                    await crud.bulk_create_contacts(db, rows[start:start + 500], user.id)
+                await db.commit()
+            rows = await db.execute(
+                select(User.email, Contact.id).join(Contact, Contact.owner_id == User.id).where(
+                    User.email.in_([user_email(n) for n in range(users)]), Contact.deleted_at.is_(None)
+                )
+            )
+            ids: Dict[str, List[int]] = {}
+            for email, contact_id in rows:
+                ids.setdefault(email, []).append(contact_id)
+            return ids
+    finally:
+        await engine.dispose()
+        password_hasher.shutdown()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentile методом найближчого рангу."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class Workloads:
+    """Один запит кожного сценарію; повертає HTTP-статус."""
+
+    def __init__(self, client: httpx.AsyncClient, tokens: Dict[str, str], contact_ids: Dict[str, List[int]], rng: random.Random):
+        self.client = client
+        self.tokens = tokens
+        self.contact_ids = contact_ids
+        self.rng = rng
+        self.registered = 0
+        self.run_id = f"{os.getpid()}{int(time.time())}"
+
+    def _user(self):
+        email = self.rng.choice(list(self.tokens))
+        return email, {"Authorization": f"Bearer {self.tokens[email]}"}
+
+    async def register(self):
+        self.registered += 1
+        params = {"email": f"new{self.run_id}_{self.registered}@example.com", "password": PASSWORD}
+        return (await self.client.post("/register/", params=params)).status_code
+
+    async def login(self):
+        email, _ = self._user()
+        return (await self.client.post("/login", data={"username": email, "password": PASSWORD})).status_code
+
+    async def list(self):
+        _, headers = self._user()
+        return (await self.client.get("/contacts/", params={"limit": 50}, headers=headers)).status_code
+
+    async def search(self):
+        _, headers = self._user()
+        q = self.rng.choice(LAST_NAMES)[: self.rng.randint(3, 6)]
+        return (await self.client.get("/contacts/search", params={"q": q}, headers=headers)).status_code
+
+    async def update(self):
+        email, headers = self._user()
+        contact_id = self.rng.choice(self.contact_ids[email])
+        body = {"additional_info": f"updated {self.rng.random()}"}
+        return (await self.client.patch(f"/contacts/{contact_id}", json=body, headers=headers)).status_code
+
+    async def export(self):
+        _, headers = self._user()
+        async with self.client.stream("GET", "/contacts/export", params={"format": "csv"}, headers=headers) as response:
+            async for _ in response.aiter_bytes():
+                pass
+            return response.status_code
+
+
+async def run_workload(workloads: Workloads, name: str, requests: int, concurrency: int) -> dict:
+    """requests запитів сценарію name з concurrency одночасними клієнтами."""
+    func = getattr(workloads, name)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                status = await func()
+            except httpx.HTTPError:
+                status = 599
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        # 503 від пулу bcrypt означає відкинуте навантаження (HASH_MAX_PENDING), а не збій
+        "errors": sum(count for status, count in statuses.items() if int(status) >= 400),
+        "statuses": dict(sorted(statuses.items())),
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def login_all(client: httpx.AsyncClient, emails: List[str]) -> Dict[str, str]:
+    tokens = {}
+    for email in emails:
+        response = await client.post("/login", data={"username": email, "password": PASSWORD})
+        response.raise_for_status()
+        tokens[email] = response.json()["access_token"]
+    return tokens
+
+
+async def benchmark(args, database_url: str) -> dict:
+    contact_ids = await seed(database_url, args.users, args.contacts, args.seed)
+    rng = random.Random(args.seed)
+    results = {}
+
+    async def run(client):
+        tokens = await login_all(client, sorted(contact_ids))
+        workloads = Workloads(client, tokens, contact_ids, rng)
+        for name in args.workloads:
+            # Прогрів: з'єднання пулу, кеші користувачів, підготовлені вирази
+            await run_workload(workloads, name, min(args.concurrency, args.requests), args.concurrency)
+            results[name] = await run_workload(workloads, name, args.requests, args.concurrency)
+            print(f"{name:>8}: " + "  ".join(f"{key}={value}" for key, value in results[name].items()))
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            await run(client)
+    else:
+        app = create_app(Settings(database_url=database_url, rate_limit_enabled=False))
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                await run(client)
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """Зміна p95 і RPS відносно базової лінії (від'ємна зміна p95 - покращення)."""
+    print(f"\nПорівняння з {baseline['meta'].get('commit')}:")
+    for name, current in results.items():
+        previous = baseline["results"].get(name)
+        if not previous:
+            continue
+        p95 = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100 if previous["p95_ms"] else 0.0
+        rps = (current["rps"] - previous["rps"]) / previous["rps"] * 100 if previous["rps"] else 0.0
+        print(f"{name:>8}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms ({p95:+.1f}%), rps {previous['rps']} -> {current['rps']} ({rps:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="за замовчуванням - тимчасовий SQLite-файл")
+    parser.add_argument("--url", help="адреса запущеного uvicorn замість застосунку в цьому процесі")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--contacts", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=300, help="запитів на кожен сценарій")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON-файл для результатів")
+    parser.add_argument("--baseline", help="JSON-файл попереднього запуску для порівняння")
+    args = parser.parse_args()
+    # Журнал кожного HTTP-запиту клієнта спотворив би вимірювання
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or "sqlite:///" + os.path.join(tmp, "bench_api.db")
+        if args.url and not args.database_url:
+            parser.error("--url потребує --database-url бази, з якою працює сервер")
+        results = asyncio.run(benchmark(args, database_url))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "database": database_url.partition("://")[0],
+            "target": args.url or "in-process",
+            "users": args.users,
+            "contacts": args.contacts,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Масштабованість запиту найближчих днів народження.
+Кількість контактів у вікні фіксована, розмір книги зростає - час запиту має
+залежати від кількості збігів, а не від розміру книги.
+
+Запуск:
+    python -m benchmarks.bench_birthdays --sizes 1000 10000 100000 --matches 50
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import crud
+from models import Base, User
+
+TODAY = date(2025, 6, 1)
+DAYS = 7
+
+
+def make_rows(size: int, matches: int, prefix: str):
+    """matches контактів у вікні [TODAY, TODAY + DAYS], решта - поза ним."""
+    for n in range(size):
+        if n < matches:
+            birthday = (TODAY + timedelta(days=n % (DAYS + 1))).replace(year=1990)
+        else:
+            birthday = (TODAY + timedelta(days=DAYS + 1 + n % (365 - DAYS - 2))).replace(year=1990)
+        yield n, {
+            "first_name": f"First{n}",
+            "last_name": f"Last{n}",
+            "email": f"{prefix}{n}@example.com",
+            "phone_number": f"+380{n:09d}",
+            "birthday": birthday,
+            "additional_info": None,
+        }
+
+
+async def run(database_url: str, sizes: list[int], matches: int, repeat: int) -> None:
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with SessionLocal() as db:
+        for size in sizes:
+            user = User(email=f"bench{size}@example.com", hashed_password="x")
+            db.add(user)
+            await db.commit()
+            rows = list(make_rows(size, matches, f"u{size}-"))
+            for start in range(0, size, 1000):
+                await crud.bulk_create_contacts(db, rows[start:start + 1000], user.id)
+            await db.commit()
+
+            started = time.perf_counter()
+            for _ in range(repeat):
+                found = await crud.get_upcoming_birthdays(db, user.id, days=DAYS, today=TODAY)
+            elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+            print(f"book={size:>7} matches={len(found):>4} query={elapsed_ms:.2f} ms")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///" + os.path.join(tempfile.gettempdir(), "bench_birthdays.db"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--matches", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.database_url, args.sizes, args.matches, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Масштабованість пошуку дублікатів.
+Кожен двадцятий контакт має дубліката з іншим форматом телефону та регістром імені;
+час проходу воркера має зростати майже лінійно з розміром книги.
+
+Запуск:
+    python -m benchmarks.bench_dedup --sizes 10000 50000 100000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import crud
+from models import Base, User
+from services.dedup import DedupWorker
+
+FIRST_NAMES = ("Іван", "Олена", "Петро", "Марія", "Андрій", "Оксана", "Тарас", "Наталія")
+LAST_NAMES = ("Шевченко", "Коваленко", "Бондаренко", "Ткаченко", "Кравченко", "Олійник", "Лисенко", "Мельник")
+
+
+def make_rows(size: int, prefix: str, rng: random.Random):
+    """Унікальні контакти і дублікати кожного двадцятого з них."""
+    for n in range(size):
+        original = n - n % 20
+        person = random.Random(original)
+        first, last = person.choice(FIRST_NAMES), person.choice(LAST_NAMES) + str(original)
+        phone = f"50{original:07d}"
+        if n % 20 == 1:
+            first, last, phone = last.upper(), first.lower(), f"0{phone[:2]} {phone[2:5]} {phone[5:]}"
+        elif n % 20:
+            first, last, phone = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES) + str(n), f"67{n:07d}"
+        yield n, {
+            "first_name": first,
+            "last_name": last,
+            "email": f"{prefix}{n}@example.com",
+            "phone_number": "+380" + phone if n % 20 != 1 else phone,
+            "birthday": date(1960 + original % 40, 1 + original % 12, 1 + original % 28),
+            "additional_info": None,
+        }
+
+
+async def run(database_url: str, sizes: list[int]) -> None:
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    worker = DedupWorker(SessionLocal)
+
+    async with SessionLocal() as db:
+        for size in sizes:
+            user = User(email=f"bench{size}@example.com", hashed_password="x")
+            db.add(user)
+            await db.commit()
+            rows = list(make_rows(size, f"u{size}-", random.Random(size)))
+            for start in range(0, size, 1000):
+                await crud.bulk_create_contacts(db, rows[start:start + 1000], user.id)
+            await db.commit()
+
+            started = time.perf_counter()
+            pairs = await worker.process_owner(db, user.id)
+            elapsed = time.perf_counter() - started
+            print(f"book={size:>7} pairs={pairs:>6} pass={elapsed:.2f} s ({elapsed / size * 1e6:.1f} us/contact)")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///" + os.path.join(tempfile.gettempdir(), "bench_dedup.db"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    args = parser.parse_args()
+    asyncio.run(run(args.database_url, args.sizes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Порівняння імпорту контактів: по одному (crud.create_contact) та порціями (services.importer).
+
+Запуск:
+    python -m benchmarks.bench_import --rows 5000 --batch-size 1000
+    python -m benchmarks.bench_import --database-url postgresql+asyncpg://...
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import crud
+import schemas
+from models import Base, User
+from services.importer import import_contacts
+
+
+def make_rows(count: int, prefix: str) -> list[dict]:
+    return [
+        {
+            "first_name": f"First{n}",
+            "last_name": f"Last{n}",
+            "email": f"{prefix}{n}@example.com",
+            "phone_number": f"+380{n:09d}",
+            "birthday": date(1990, 1 + n % 12, 1 + n % 28).isoformat(),
+        }
+        for n in range(count)
+    ]
+
+
+async def run(database_url: str, rows: int, batch_size: int, transaction: str) -> None:
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with SessionLocal() as db:
+        user = User(email="bench@example.com", hashed_password="x")
+        db.add(user)
+        await db.commit()
+
+        started = time.perf_counter()
+        for row in make_rows(rows, "single"):
+            await crud.create_contact(db, schemas.ContactCreate(**row), user.id)
+        per_row = time.perf_counter() - started
+
+        started = time.perf_counter()
+        report = await import_contacts(db, user.id, make_rows(rows, "bulk"), batch_size=batch_size, transaction=transaction)
+        bulk = time.perf_counter() - started
+
+    await engine.dispose()
+    print(f"rows={rows} batch_size={batch_size} transaction={transaction}")
+    print(f"per-row: {per_row:.3f}s ({rows / per_row:.0f} rows/s)")
+    print(f"bulk:    {bulk:.3f}s ({report.inserted / bulk:.0f} rows/s, failed={report.failed})")
+    print(f"speedup: {per_row / bulk:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///" + os.path.join(tempfile.gettempdir(), "bench_import.db"))
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--transaction", choices=["batch", "all"], default="batch")
+    args = parser.parse_args()
+    asyncio.run(run(args.database_url, args.rows, args.batch_size, args.transaction))
+
+
+if __name__ == "__main__":
+    main()
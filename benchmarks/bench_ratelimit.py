@@ -0,0 +1,40 @@
+"""
+Накладні витрати обмежувача швидкості на один запит (мікросекунди на take()).
+
+Запуск:
+    python -m benchmarks.bench_ratelimit --iterations 20000
+    python -m benchmarks.bench_ratelimit --storage redis://localhost:6379/0
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from services.ratelimit import create_backend
+
+
+async def measure(url: str, iterations: int, keys: int) -> float:
+    backend = create_backend(url)
+    for n in range(keys):
+        await backend.take(f"warmup:{n}", 1000.0, 1000)
+    started = time.perf_counter()
+    for n in range(iterations):
+        await backend.take(f"user:{n % keys}", 1000.0, 1000)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--storage", action="append", help="URL сховища; можна вказати кілька разів")
+    args = parser.parse_args()
+    storages = args.storage or ["memory://", "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_ratelimit.db")]
+    for url in storages:
+        print(f"{url}: {asyncio.run(measure(url, args.iterations, args.keys)):.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
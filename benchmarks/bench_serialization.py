@@ -0,0 +1,96 @@
+"""
+Порівняння поточного шляху GET /contacts/ (ORM-об'єкти + ContactPage + JSONResponse)
+зі швидким (column-only select + contact_page_json). Тіла відповідей звіряються побайтово.
+
+Запуск:
+    python -m benchmarks.bench_serialization --sizes 100 10000 100000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import date
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import crud
+import schemas
+from models import Base, User
+from services.serialization import contact_page_json, orjson
+
+
+def make_rows(size: int, prefix: str):
+    for n in range(size):
+        yield n, {
+            "first_name": f"Ім'я{n}",
+            "last_name": f"Last{n}",
+            "email": f"{prefix}{n}@example.com",
+            "phone_number": f"+380{n:09d}",
+            "birthday": date(1990, 1 + n % 12, 1 + n % 28),
+            "additional_info": None if n % 2 else f"note {n}",
+        }
+
+
+async def current_body(db: AsyncSession, owner_id: int, limit: int) -> bytes:
+    contacts, next_cursor = await crud.get_contacts(db, owner_id, limit=limit)
+    page = schemas.ContactPage.model_validate({"items": contacts, "next_cursor": next_cursor}, from_attributes=True)
+    return JSONResponse(jsonable_encoder(page, exclude_unset=True)).body
+
+
+async def fast_body(db: AsyncSession, owner_id: int, limit: int) -> bytes:
+    names, rows, next_cursor = await crud.get_contact_rows(db, owner_id, limit=limit)
+    return contact_page_json(names, rows, next_cursor)
+
+
+async def timed(func, db, owner_id, limit, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = await func(db, owner_id, limit)
+        db.expunge_all()
+    return body, (time.perf_counter() - started) * 1000 / repeat
+
+
+async def run(database_url: str, sizes: list[int], repeat: int) -> None:
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    print(f"encoder: {'orjson' if orjson else 'json'}")
+    async with SessionLocal() as db:
+        for size in sizes:
+            user = User(email=f"bench{size}@example.com", hashed_password="x")
+            db.add(user)
+            await db.commit()
+            rows = list(make_rows(size, f"u{size}-"))
+            for start in range(0, size, 1000):
+                await crud.bulk_create_contacts(db, rows[start:start + 1000], user.id)
+            await db.commit()
+
+            current, current_ms = await timed(current_body, db, user.id, size, repeat)
+            fast, fast_ms = await timed(fast_body, db, user.id, size, repeat)
+            assert current == fast, "fast path output differs from the response_model output"
+            print(
+                f"contacts={size:>7} current={current_ms:9.2f} ms fast={fast_ms:9.2f} ms "
+                f"speedup={current_ms / fast_ms:5.1f}x body={len(fast)} bytes"
+            )
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///" + os.path.join(tempfile.gettempdir(), "bench_serialization.db"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.database_url, args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Час старту застосунку: від імпорту main до першої відповіді.
+Кожен замір - окремий процес інтерпретатора (холодний імпорт), база - тимчасовий SQLite-файл.
+
+Запуск:
+    python -m benchmarks.bench_startup --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    status = client.get("/metrics", headers={"Authorization": "Bearer bench"}).status_code
+first_response = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_response_ms": (first_response - started) * 1000,
+    "status": status,
+}))
+"""
+
+
+def probe(database_url: str) -> dict:
+    env = {**os.environ, "DATABASE_URL": database_url, "CREATE_SCHEMA": "false", "METRICS_TOKEN": "bench"}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=root, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_startup.db"))
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    results = [probe(args.database_url) for _ in range(args.runs)]
+    for key in ("import_ms", "startup_ms", "first_response_ms"):
+        values = [result[key] for result in results]
+        print(f"{key:>18}: median={statistics.median(values):8.1f} min={min(values):8.1f} max={max(values):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
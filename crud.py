@@ -1,16 +1,40 @@
-from sqlalchemy.orm import Session
+import calendar
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Optional, Sequence
+from sqlalchemy import case, delete, func, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 import models
 import schemas
+from services.cache import invalidate_user
+from services.pagination import decode_cursor, encode_cursor
 from fastapi import HTTPException, status
-import random
-import string
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+
+
+# Лічильник змін контактів власника (ETag колекції, водяний знак синхронізації).
+# Викликається на початку транзакції зміни: блокування рядка users впорядковує записи
+# одного власника, тож ревізії фіксуються строго за зростанням.
+async def bump_contacts_revision(db: AsyncSession, owner_id: int) -> int:
+    result = await db.execute(
+        update(models.User)
+        .where(models.User.id == owner_id)
+        .values(contacts_revision=models.User.contacts_revision + 1)
+        .returning(models.User.contacts_revision)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar()
+
+
+# Поточна ревізія контактів власника - один пошук за первинним ключем
+async def get_contacts_revision(db: AsyncSession, owner_id: int) -> Optional[int]:
+    result = await db.execute(select(models.User.contacts_revision).where(models.User.id == owner_id))
+    return result.scalar()
 
 
 # Створення нового контакту
-def create_contact(db: Session, contact: schemas.ContactCreate, owner_id: int):
+async def create_contact(db: AsyncSession, contact: schemas.ContactCreate, owner_id: int):
     db_contact = models.Contact(
         first_name=contact.first_name,
         last_name=contact.last_name,
@@ -21,96 +45,579 @@ def create_contact(db: Session, contact: schemas.ContactCreate, owner_id: int):
         owner_id=owner_id
     )
     try:
+        db_contact.revision = await bump_contacts_revision(db, owner_id)
         db.add(db_contact)
-        db.commit()
-        db.refresh(db_contact)
+        await db.commit()
+        await db.refresh(db_contact)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     return db_contact
 
 
-# Отримання всіх контактів поточного користувача
-def get_contacts(db: Session, owner_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Contact).filter(models.Contact.owner_id == owner_id).offset(skip).limit(limit).all()
+# INSERT із підтримкою ON CONFLICT для відповідного діалекту
+INSERT_BY_DIALECT = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+# Масове створення контактів одним багаторядковим INSERT ... ON CONFLICT DO NOTHING
+# Межа кількості параметрів одного виразу (asyncpg/Postgres - 32767)
+MAX_BIND_PARAMS = 32767
+
+
+async def bulk_create_contacts(db: AsyncSession, rows: Sequence[tuple[int, dict]], owner_id: int):
+    """
+    rows - пари (номер рядка, значення ContactCreate).
+    Повертає (кількість вставлених, помилки для рядків із вже наявним email). Коміт - на стороні виклику.
+    Багаторядковий INSERT ділиться на частини, що вміщуються в MAX_BIND_PARAMS.
+    """
+    errors, values, seen = [], [], set()
+    for number, row in rows:
+        if row["email"] in seen:
+            errors.append(schemas.ImportRowError(row=number, error="Duplicate email in batch"))
+            continue
+        seen.add(row["email"])
+        values.append((number, {**row, "birthday_key": models.birthday_key(row["birthday"]), "owner_id": owner_id}))
+    if not values:
+        return 0, errors
+
+    revision = await bump_contacts_revision(db, owner_id)
+    insert = INSERT_BY_DIALECT[db.get_bind().dialect.name]
+    # Верхня оцінка параметрів на рядок: усі колонки таблиці (включно зі значеннями за замовчуванням)
+    chunk_size = MAX_BIND_PARAMS // len(models.Contact.__table__.columns)
+    inserted = set()
+    for start in range(0, len(values), chunk_size):
+        stmt = (
+            insert(models.Contact)
+            .values([{**row, "revision": revision} for _, row in values[start:start + chunk_size]])
+            .on_conflict_do_nothing(index_elements=["email"])
+            .returning(models.Contact.email)
+        )
+        inserted.update((await db.execute(stmt)).scalars().all())
+    for number, row in values:
+        if row["email"] not in inserted:
+            errors.append(schemas.ImportRowError(row=number, error="Email already exists"))
+    return len(inserted), errors
+
+
+# Поля контакту, доступні для вибірки через fields=
+CONTACT_FIELDS = ("first_name", "last_name", "email", "phone_number", "birthday", "additional_info", "id")
+
+# Ключі сортування для keyset-пагінації
+CONTACT_ORDERINGS = {
+    "id": ("id",),
+    "last_name": ("last_name", "id"),
+}
+
+
+# Запит сторінки контактів: колонки names (або ORM-сутність) після курсора, limit + 1 рядок
+def _contacts_page_query(owner_id: int, limit: int, cursor: Optional[str], order_by: str, names: Optional[Sequence[str]] = None):
+    key_columns = [getattr(models.Contact, name) for name in CONTACT_ORDERINGS[order_by]]
+    if names:
+        query = select(*[getattr(models.Contact, name) for name in names])
+    else:
+        query = select(models.Contact)
+    query = query.where(models.Contact.owner_id == owner_id, models.Contact.deleted_at.is_(None))
+    if cursor is not None:
+        # Значення курсора мають тип колонки ключа (дати в JSON - рядки), інакше 400, а не DataError драйвера
+        types = [int if column.type.python_type is int else str for column in key_columns]
+        values = decode_cursor(cursor, len(key_columns), types=types)
+        query = query.where(tuple_(*key_columns) > tuple_(*values))
+    return query.order_by(*key_columns).limit(limit + 1)
+
+
+# Отримання сторінки контактів поточного користувача (keyset-пагінація)
+async def get_contacts(
+    db: AsyncSession,
+    owner_id: int,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    order_by: str = "id",
+    fields: Optional[Sequence[str]] = None,
+):
+    """
+    Повертає (contacts, next_cursor).
+    Без fields - ORM-об'єкти Contact; з fields - словники лише з вибраними колонками.
+    """
+    key = CONTACT_ORDERINGS[order_by]
+    names = list(dict.fromkeys(list(fields) + list(key))) if fields else None
+    result = await db.execute(_contacts_page_query(owner_id, limit, cursor, order_by, names))
+    if fields:
+        rows = result.mappings().all()
+        contacts = [{name: row[name] for name in fields} for row in rows[:limit]]
+    else:
+        rows = result.scalars().all()
+        contacts = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor([last[name] if fields else getattr(last, name) for name in key])
+    return contacts, next_cursor
+
+
+# Сторінка контактів як кортежі колонок, без ORM-об'єктів (швидкий шлях серіалізації)
+async def get_contact_rows(
+    db: AsyncSession,
+    owner_id: int,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    order_by: str = "id",
+    fields: Optional[Sequence[str]] = None,
+):
+    """
+    Повертає (names, rows, next_cursor): rows - кортежі значень у порядку names.
+    names - вибрані поля в порядку CONTACT_FIELDS (як у схемі ContactFields).
+    """
+    key = CONTACT_ORDERINGS[order_by]
+    names = [name for name in CONTACT_FIELDS if not fields or name in fields]
+    # Колонки ключа сортування додаються в кінець, щоб побудувати курсор
+    columns = names + [name for name in key if name not in names]
+    rows = (await db.execute(_contacts_page_query(owner_id, limit, cursor, order_by, columns))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor([last[columns.index(name)] for name in key])
+    width = len(names)
+    page = [tuple(row[:width]) for row in rows[:limit]] if width < len(columns) else rows[:limit]
+    return names, page, next_cursor
+
+
+# Потокове читання всіх контактів власника серверним курсором
+async def stream_contacts(db: AsyncSession, owner_id: int, fields: Sequence[str] = CONTACT_FIELDS, batch_size: int = 1000):
+    columns = [getattr(models.Contact, name) for name in fields]
+    query = (
+        select(*columns)
+        .where(models.Contact.owner_id == owner_id, models.Contact.deleted_at.is_(None))
+        .order_by(models.Contact.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(query)
+    async for row in result.mappings():
+        yield row
+
+
+# Діапазони birthday_key, що покривають дні з start по start + days включно
+def birthday_key_ranges(start: date, days: int) -> list[tuple[int, int]]:
+    if days >= 365:
+        return [(101, 1231)]
+    end = start + timedelta(days=days)
+    end_key = models.birthday_key(end)
+    # У невисокосний рік 29 лютого святкують 28 лютого
+    if end.month == 2 and end.day == 28 and not calendar.isleap(end.year):
+        end_key = 229
+    start_key = models.birthday_key(start)
+    if start_key <= end_key and start.year == end.year:
+        return [(start_key, end_key)]
+    return [(start_key, 1231), (101, end_key)]
+
+
+# Найближча дата дня народження, починаючи з дати from_date
+def next_birthday(birthday: date, from_date: date) -> date:
+    for year in (from_date.year, from_date.year + 1):
+        day = birthday.day
+        if birthday.month == 2 and day == 29 and not calendar.isleap(year):
+            day = 28
+        candidate = date(year, birthday.month, day)
+        if candidate >= from_date:
+            return candidate
+
+
+# Контакти з днями народження в найближчі days днів (діапазонний пошук за індексом (owner_id, birthday_key))
+async def get_upcoming_birthdays(db: AsyncSession, owner_id: int, days: int = 7, today: Optional[date] = None):
+    today = today or date.today()
+    ranges = birthday_key_ranges(today, days)
+    start_key = ranges[0][0]
+    query = (
+        select(models.Contact)
+        .where(
+            models.Contact.owner_id == owner_id,
+            models.Contact.deleted_at.is_(None),
+            or_(*[models.Contact.birthday_key.between(low, high) for low, high in ranges]),
+        )
+        .order_by(case((models.Contact.birthday_key >= start_key, 0), else_=1), models.Contact.birthday_key, models.Contact.id)
+    )
+    contacts = (await db.execute(query)).scalars().all()
+    return [(contact, next_birthday(contact.birthday, today)) for contact in contacts]
 
 
 # Отримання контакту за id для поточного користувача
-def get_contact(db: Session, contact_id: int, owner_id: int):
-    return db.query(models.Contact).filter(models.Contact.id == contact_id, models.Contact.owner_id == owner_id).first()
-
-
-# Оновлення контакту
-def update_contact(db: Session, contact_id: int, contact: schemas.ContactUpdate, owner_id: int):
-    db_contact = db.query(models.Contact).filter(models.Contact.id == contact_id, models.Contact.owner_id == owner_id).first()
-    if not db_contact:
-        raise ValueError("Contact not found")
-    
-    db_contact = db.query(models.Contact).filter(models.Contact.id == contact_id, models.Contact.owner_id == owner_id).first()
-    if db_contact:
-        if contact.first_name:
-            db_contact.first_name = contact.first_name
-        if contact.last_name:
-            db_contact.last_name = contact.last_name
-        if contact.email:
-            db_contact.email = contact.email
-        if contact.phone_number:
-            db_contact.phone_number = contact.phone_number
-        if contact.birthday:
-            db_contact.birthday = contact.birthday
-        if contact.additional_info:
-            db_contact.additional_info = contact.additional_info
-
-        db.commit()
-        db.refresh(db_contact)
+async def get_contact(db: AsyncSession, contact_id: int, owner_id: int):
+    result = await db.execute(
+        select(models.Contact).where(
+            models.Contact.id == contact_id, models.Contact.owner_id == owner_id, models.Contact.deleted_at.is_(None)
+        )
+    )
+    return result.scalars().first()
+
+
+# Поля, які не можна очистити (NOT NULL або обов'язкові в ContactCreate)
+REQUIRED_CONTACT_FIELDS = ("first_name", "last_name", "email", "phone_number", "birthday")
+
+
+# Зміни з bump_contacts_revision виконуються у SAVEPOINT: якщо рядок не знайдено,
+# відкочується лише підвищення ревізії, а не вся сесія.
+# Якщо рядок не змінено, з'ясовуємо причину: контакту немає (404) чи версія застаріла (412)
+async def _raise_not_updated(db: AsyncSession, contact_id: int, owner_id: int):
+    if await get_contact(db, contact_id, owner_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Contact was modified by another request")
+
+
+# Оновлення контакту одним UPDATE ... RETURNING; expected_version - оптимістичне блокування (If-Match)
+async def update_contact(
+    db: AsyncSession,
+    contact_id: int,
+    contact: schemas.ContactUpdate,
+    owner_id: int,
+    expected_version: Optional[int] = None,
+):
+    values = contact.dict(exclude_unset=True)
+    cleared = [name for name in REQUIRED_CONTACT_FIELDS if name in values and values[name] is None]
+    if cleared:
+        raise HTTPException(status_code=422, detail=f"Fields cannot be null: {', '.join(cleared)}")
+    if "birthday" in values:
+        values["birthday_key"] = models.birthday_key(values["birthday"])
+
+    try:
+        revision = await bump_contacts_revision(db, owner_id)
+        stmt = (
+            update(models.Contact)
+            .where(models.Contact.id == contact_id, models.Contact.owner_id == owner_id, models.Contact.deleted_at.is_(None))
+            .values(**values, version=models.Contact.version + 1, revision=revision, updated_at=func.now())
+            .returning(models.Contact)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        if expected_version is not None:
+            stmt = stmt.where(models.Contact.version == expected_version)
+        db_contact = (await db.execute(stmt)).scalars().first()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e.orig))
+    # RETURNING уже каже, чи щось змінилося: без збігу відкочуємо всю транзакцію разом із ревізією
+    if db_contact is None:
+        await db.rollback()
+        await _raise_not_updated(db, contact_id, owner_id)
+    await db.commit()
     return db_contact
 
 
-# Видалення контакту
-def delete_contact(db: Session, contact_id: int, owner_id: int):
-    db_contact = db.query(models.Contact).filter(models.Contact.id == contact_id, models.Contact.owner_id == owner_id).first()
-    if db_contact:
-        db.delete(db_contact)
-        db.commit()
+# М'яке видалення: рядок стає надгробком (tombstone) для синхронізації, email звільняється
+def _soft_delete(owner_id: int, revision: int):
+    return (
+        update(models.Contact)
+        .where(models.Contact.owner_id == owner_id, models.Contact.deleted_at.is_(None))
+        .values(
+            deleted_at=func.now(),
+            updated_at=func.now(),
+            email=None,
+            version=models.Contact.version + 1,
+            revision=revision,
+        )
+        .returning(models.Contact.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Видалення контакту одним UPDATE ... RETURNING (надгробок)
+async def delete_contact(db: AsyncSession, contact_id: int, owner_id: int, expected_version: Optional[int] = None):
+    revision = await bump_contacts_revision(db, owner_id)
+    stmt = _soft_delete(owner_id, revision).where(models.Contact.id == contact_id)
+    if expected_version is not None:
+        stmt = stmt.where(models.Contact.version == expected_version)
+    deleted_id = (await db.execute(stmt)).scalar()
+    if deleted_id is None:
+        await db.rollback()
+        await _raise_not_updated(db, contact_id, owner_id)
+    await db.commit()
+    return deleted_id
+
+
+# Масове видалення контактів власника за списком id
+async def delete_contacts(db: AsyncSession, contact_ids: Sequence[int], owner_id: int) -> list[int]:
+    revision = await bump_contacts_revision(db, owner_id)
+    stmt = _soft_delete(owner_id, revision).where(models.Contact.id.in_(contact_ids))
+    deleted = (await db.execute(stmt)).scalars().all()
+    if deleted:
+        await db.commit()
+    else:
+        await db.rollback()
+    return sorted(deleted)
+
+
+# Кандидати в дублікати (результат воркера services.dedup) з обома контактами - одним запитом
+async def get_duplicate_candidates(db: AsyncSession, owner_id: int, limit: int = 50):
+    """Повертає (пари (score, contact, duplicate), pending) - pending, якщо контакти змінилися після проходу."""
+    contact, duplicate = aliased(models.Contact), aliased(models.Contact)
+    stmt = (
+        select(models.ContactDuplicate.score, contact, duplicate)
+        .join(contact, contact.id == models.ContactDuplicate.contact_id)
+        .join(duplicate, duplicate.id == models.ContactDuplicate.duplicate_id)
+        .where(
+            models.ContactDuplicate.owner_id == owner_id,
+            contact.deleted_at.is_(None),
+            duplicate.deleted_at.is_(None),
+        )
+        .order_by(models.ContactDuplicate.score.desc(), models.ContactDuplicate.id)
+        .limit(limit)
+    )
+    pairs = (await db.execute(stmt)).all()
+    revision, dedup_revision = (
+        await db.execute(
+            select(models.User.contacts_revision, models.User.contacts_dedup_revision).where(models.User.id == owner_id)
+        )
+    ).one()
+    return pairs, revision > dedup_revision
+
+
+# Поля, що переносяться з дубліката, якщо в контакті, що залишається, вони порожні
+MERGE_FIELDS = ("first_name", "last_name", "phone_number", "birthday", "additional_info")
+
+
+# Об'єднання дубліката з контактом: порожні поля заповнюються, дублікат стає надгробком
+async def merge_contacts(db: AsyncSession, owner_id: int, keep_id: int, merge_id: int):
+    if keep_id == merge_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot merge a contact with itself")
+    async with db.begin_nested():
+        revision = await bump_contacts_revision(db, owner_id)
+        rows = (
+            await db.execute(
+                select(models.Contact)
+                .where(
+                    models.Contact.id.in_((keep_id, merge_id)),
+                    models.Contact.owner_id == owner_id,
+                    models.Contact.deleted_at.is_(None),
+                )
+                .with_for_update()
+            )
+        ).scalars().all()
+        contacts = {contact.id: contact for contact in rows}
+        if len(contacts) != 2:
+            # Виняток відкочує savepoint разом зі збільшенням ревізії
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+        keep, merged = contacts[keep_id], contacts[merge_id]
+
+        values = {name: getattr(merged, name) for name in MERGE_FIELDS if not getattr(keep, name) and getattr(merged, name)}
+        if keep.additional_info and merged.additional_info and keep.additional_info != merged.additional_info:
+            values["additional_info"] = f"{keep.additional_info}\n{merged.additional_info}"
+        if "birthday" in values:
+            values["birthday_key"] = models.birthday_key(values["birthday"])
+        db_contact = (
+            await db.execute(
+                update(models.Contact)
+                .where(models.Contact.id == keep_id)
+                .values(**values, version=models.Contact.version + 1, revision=revision, updated_at=func.now())
+                .returning(models.Contact)
+                .execution_options(synchronize_session=False, populate_existing=True)
+            )
+        ).scalars().first()
+        await db.execute(_soft_delete(owner_id, revision).where(models.Contact.id == merge_id))
+        await db.execute(
+            delete(models.ContactDuplicate).where(
+                or_(models.ContactDuplicate.contact_id == merge_id, models.ContactDuplicate.duplicate_id == merge_id)
+            )
+        )
+    await db.commit()
     return db_contact
 
-def update_user_avatar(db: Session, user_id: int, avatar_url: str):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+
+# Колонки контакту у стрічці змін
+CHANGE_FIELDS = CONTACT_FIELDS + ("revision", "deleted_at")
+
+
+# Зміни контактів після водяного знаку since: створені, змінені та видалені (надгробки)
+async def get_contact_changes(db: AsyncSession, owner_id: int, since: Optional[str] = None, limit: int = 500):
+    """
+    Повертає (changes, watermark, has_more). Водяний знак - курсор за (revision, id).
+    Без since - початкова синхронізація (лише живі контакти). Якщо надгробки після since
+    вже видалено компакцією, повертає 410 - клієнт має синхронізуватися заново.
+    Межа компакції - кортеж (revision, id), а не лише ревізія: масове видалення позначає
+    багато надгробків однією ревізією, і водяний знак може стояти всередині неї.
+    """
+    revision, compacted_revision, compacted_id = (
+        await db.execute(
+            select(
+                models.User.contacts_revision,
+                models.User.contacts_compacted_revision,
+                models.User.contacts_compacted_id,
+            ).where(models.User.id == owner_id)
+        )
+    ).one()
+    query = select(*[getattr(models.Contact, name) for name in CHANGE_FIELDS]).where(models.Contact.owner_id == owner_id)
+    if since is None:
+        query = query.where(models.Contact.deleted_at.is_(None))
+    else:
+        values = decode_cursor(since, 2, types=(int, int))
+        if tuple(values) < (compacted_revision, compacted_id):
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="Watermark expired, full sync required")
+        query = query.where(tuple_(models.Contact.revision, models.Contact.id) > tuple_(*values))
+    query = query.order_by(models.Contact.revision, models.Contact.id).limit(limit + 1)
+    rows = (await db.execute(query)).mappings().all()
+
+    changes = [
+        {"id": row["id"], "deleted": True}
+        if row["deleted_at"] is not None
+        else {**{name: row[name] for name in CONTACT_FIELDS}, "deleted": False}
+        for row in rows[:limit]
+    ]
+    if changes:
+        last = rows[min(len(rows), limit) - 1]
+        watermark = encode_cursor([last["revision"], last["id"]])
+    else:
+        # Змін немає: ревізію прочитано до запиту, тож пізніші записи матимуть більшу
+        watermark = since or encode_cursor([revision, 0])
+    return changes, watermark, len(rows) > limit
+
+
+# Остаточне видалення надгробків, старших за older_than; повертає кількість видалених
+async def compact_tombstones(db: AsyncSession, older_than: datetime, batch_size: int = 1000) -> int:
+    removed = 0
+    while True:
+        batch = (
+            select(models.Contact.id)
+            .where(models.Contact.deleted_at.is_not(None), models.Contact.deleted_at < older_than)
+            .limit(batch_size)
+        )
+        stmt = (
+            delete(models.Contact)
+            .where(models.Contact.id.in_(batch.scalar_subquery()))
+            .returning(models.Contact.owner_id, models.Contact.revision, models.Contact.id)
+            .execution_options(synchronize_session=False)
+        )
+        rows = (await db.execute(stmt)).all()
+        # ondelete=CASCADE не діє в SQLite без PRAGMA foreign_keys - пари видаляються явно
+        removed_ids = [contact_id for _, _, contact_id in rows]
+        if removed_ids:
+            await db.execute(
+                delete(models.ContactDuplicate)
+                .where(
+                    models.ContactDuplicate.contact_id.in_(removed_ids)
+                    | models.ContactDuplicate.duplicate_id.in_(removed_ids)
+                )
+                .execution_options(synchronize_session=False)
+            )
+        horizons = {}
+        for owner_id, revision, contact_id in rows:
+            horizons[owner_id] = max((revision, contact_id), horizons.get(owner_id, (0, 0)))
+        for owner_id, (revision, contact_id) in horizons.items():
+            compacted = tuple_(models.User.contacts_compacted_revision, models.User.contacts_compacted_id)
+            await db.execute(
+                update(models.User)
+                .where(models.User.id == owner_id, compacted < tuple_(revision, contact_id))
+                .values(contacts_compacted_revision=revision, contacts_compacted_id=contact_id)
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+        removed += len(rows)
+        if len(rows) < batch_size:
+            return removed
+
+
+# Отримання користувача за email
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+
+async def update_user_avatar(db: AsyncSession, user_id: int, avatar_url: str):
+    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    db_user = result.scalars().first()
     if db_user:
         db_user.avatar_url = avatar_url
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        invalidate_user(db_user.email)
     return db_user
 
-# Генерація випадкового коду
-def generate_verification_code(length=6):
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+# Підтвердження email одним умовним UPDATE (без попереднього читання користувача)
+async def _commit_after(db: AsyncSession, before_commit: Optional[Callable[[], Awaitable]]) -> None:
+    """Коміт після before_commit (напр. погашення одноразового токена); його помилка відкочує зміни."""
+    if before_commit is not None:
+        try:
+            await before_commit()
+        except Exception:
+            await db.rollback()
+            raise
+    await db.commit()
 
-# Збереження коду верифікації в БД
-def create_verification_code(db: Session, user_id: int):
-    code = generate_verification_code()
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
-    if db_user:
-        db_user.verification_code = code
-        db.commit()
-        db.refresh(db_user)
-        return code
-    return None
-
-def send_verification_email(email: str, verification_code: str):
-    msg = MIMEMultipart()
-    msg['From'] = 'your-email@example.com'
-    msg['To'] = email
-    msg['Subject'] = 'Email Verification'
-
-    body = f"Your verification code is: {verification_code}"
-    msg.attach(MIMEText(body, 'plain'))
-
-    # Відправка email
-    try:
-        with smtplib.SMTP('smtp.example.com', 587) as server:
-            server.starttls()
-            server.login('your-email@example.com', 'your-email-password')
-            server.sendmail(msg['From'], msg['To'], msg.as_string())
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error sending verification email")
\ No newline at end of file
+
+async def mark_user_verified(
+    db: AsyncSession, email: str, before_commit: Optional[Callable[[], Awaitable]] = None
+) -> bool:
+    """True, якщо статус змінено; False - користувача немає або email уже підтверджено."""
+    result = await db.execute(
+        update(models.User)
+        .where(models.User.email == email, or_(models.User.is_verified.is_(False), models.User.is_verified.is_(None)))
+        .values(is_verified=True)
+        .returning(models.User.id)
+    )
+    updated = result.scalar_one_or_none() is not None
+    await _commit_after(db, before_commit)
+    if updated:
+        invalidate_user(email)
+    return updated
+
+
+# Новий пароль за токеном скидання - також один UPDATE; revoke_tokens робить недійсними
+# всі раніше видані токени (оновлення хеша під час входу їх не чіпає)
+async def reset_user_password(
+    db: AsyncSession,
+    email: str,
+    hashed_password: str,
+    revoke_tokens: bool = True,
+    before_commit: Optional[Callable[[], Awaitable]] = None,
+) -> bool:
+    values = {"hashed_password": hashed_password}
+    if revoke_tokens:
+        values["tokens_valid_after"] = datetime.utcnow()
+    result = await db.execute(
+        update(models.User)
+        .where(models.User.email == email)
+        .values(**values)
+        .returning(models.User.id)
+    )
+    updated = result.scalar_one_or_none() is not None
+    await _commit_after(db, before_commit)
+    if updated:
+        invalidate_user(email)
+    return updated
+
+
+# Відкликання токена за jti; False, якщо його вже було відкликано (повторне використання refresh token)
+async def revoke_token(db: AsyncSession, jti: str, expires_at: datetime) -> bool:
+    insert = INSERT_BY_DIALECT[db.get_bind().dialect.name]
+    result = await db.execute(
+        insert(models.RevokedToken)
+        .values(jti=jti, expires_at=expires_at, revoked_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["jti"])
+        .returning(models.RevokedToken.jti)
+    )
+    revoked = result.scalar_one_or_none() is not None
+    await db.commit()
+    return revoked
+
+
+# Чинні відкликання, додані після since (усі, якщо since не задано)
+async def get_revoked_tokens(db: AsyncSession, since: Optional[datetime] = None):
+    stmt = select(models.RevokedToken.jti, models.RevokedToken.expires_at).where(
+        models.RevokedToken.expires_at > datetime.utcnow()
+    )
+    if since is not None:
+        stmt = stmt.where(models.RevokedToken.revoked_at >= since)
+    return (await db.execute(stmt)).all()
+
+
+# Email користувачів, чиї токени скинуто (скидання пароля) не раніше за since
+async def get_token_resets(db: AsyncSession, since: datetime) -> list[str]:
+    stmt = select(models.User.email).where(models.User.tokens_valid_after >= since)
+    return list((await db.execute(stmt)).scalars().all())
+
+
+# Видалення відкликань токенів, строк дії яких уже минув
+async def prune_revoked_tokens(db: AsyncSession) -> int:
+    result = await db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= datetime.utcnow()))
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,200 @@
+"""
+Налаштування підключення до бази даних.
+Рушій створюється ліниво - під час старту застосунку або першої сесії, - тож імпорт
+модулів не підключається до бази і не потребує драйвера. Схема створюється окремою
+командою (python manage.py migrate), а не під час імпорту.
+Параметри пулу задаються в Settings; ендпоінти лише для читання можуть працювати
+з реплікою (DATABASE_REPLICA_URL) через get_read_db.
+"""
+
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from services.querylog import instrument
+
+# Асинхронні драйвери для відповідних синхронних URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Перетворення синхронного URL бази даних на URL з асинхронним драйвером."""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def to_sync_url(url: str) -> str:
+    """Зворотне перетворення для синхронного рушія (створення схеми)."""
+    scheme, sep, rest = url.partition("://")
+    return {"postgresql+asyncpg": "postgresql", "sqlite+aiosqlite": "sqlite"}.get(scheme, scheme) + sep + rest
+
+
+class PoolStats:
+    """Лічильники очікування з'єднань одного пулу."""
+
+    __slots__ = ("checkouts", "wait_sum", "wait_max", "timeouts")
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool, що вимірює час очікування вільного з'єднання."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.stats.timeouts += 1
+            raise
+        wait = time.perf_counter() - started
+        self.stats.checkouts += 1
+        self.stats.wait_sum += wait
+        if wait > self.stats.wait_max:
+            self.stats.wait_max = wait
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def engine_options(url: str, settings) -> dict:
+    """Параметри пулу для create_async_engine; SQLite у пам'яті лишається зі StaticPool."""
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":")):
+        return {}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+# Фабрики сесій для запитів; рушії прив'язуються в init_db
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+# Сесії лише для читання - репліка, якщо вона налаштована, інакше основна база
+AsyncReadSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+_engines: Dict[str, AsyncEngine] = {}
+
+
+def _create_engine(url: str, settings) -> AsyncEngine:
+    url = to_async_url(url)
+    engine = create_async_engine(url, **engine_options(url, settings))
+    # Лічильники SQL-виразів на запит і журнал повільних запитів
+    instrument(engine)
+    return engine
+
+
+def init_db(url: Optional[str] = None, replica_url: Optional[str] = None) -> AsyncEngine:
+    """Створення рушіїв (один раз на процес) і прив'язка до них фабрик сесій."""
+    if "primary" not in _engines:
+        from settings import get_settings
+
+        settings = get_settings()
+        url = url or settings.database_url
+        replica_url = replica_url or settings.database_replica_url
+        if not url:
+            raise RuntimeError("DATABASE_URL is not configured")
+        _engines["primary"] = _create_engine(url, settings)
+        AsyncSessionLocal.configure(bind=_engines["primary"])
+        if replica_url:
+            _engines["replica"] = _create_engine(replica_url, settings)
+        AsyncReadSessionLocal.configure(bind=_engines.get("replica", _engines["primary"]))
+    return _engines["primary"]
+
+
+def get_async_engine() -> Optional[AsyncEngine]:
+    return _engines.get("primary")
+
+
+async def dispose_db() -> None:
+    """Закриття пулів з'єднань під час зупинки застосунку."""
+    while _engines:
+        _, engine = _engines.popitem()
+        await engine.dispose()
+
+
+def pool_stats() -> Dict[str, dict]:
+    """Стан пулів: зайняті з'єднання, місткість та час очікування з'єднання."""
+    stats = {}
+    for name, engine in _engines.items():
+        pool = engine.sync_engine.pool
+        if not isinstance(pool, TimedQueuePool):
+            continue
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        stats[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "capacity": capacity,
+            "utilization": pool.checkedout() / capacity if capacity else 0.0,
+            "checkouts": pool.stats.checkouts,
+            "wait_seconds_sum": pool.stats.wait_sum,
+            "wait_seconds_max": pool.stats.wait_max,
+            "timeouts": pool.stats.timeouts,
+        }
+    return stats
+
+
+def pool_collector() -> List[str]:
+    """Метрики пулів з'єднань у форматі Prometheus."""
+    stats = pool_stats()
+    lines = []
+    for metric, kind in (
+        ("checked_out", "gauge"),
+        ("capacity", "gauge"),
+        ("utilization", "gauge"),
+        ("checkouts", "counter"),
+        ("wait_seconds_sum", "counter"),
+        ("wait_seconds_max", "gauge"),
+        ("timeouts", "counter"),
+    ):
+        name = f"db_pool_{metric}" + ("_total" if kind == "counter" and not metric.endswith("_sum") else "")
+        lines.append(f"# TYPE {name} {kind}")
+        lines += [f'{name}{{pool="{pool}"}} {values[metric]}' for pool, values in stats.items()]
+    return lines
+
+
+def create_schema(url: str) -> None:
+    """Створення таблиць, індексів і тригерів пошуку синхронним рушієм."""
+    import models
+
+    engine = create_engine(to_sync_url(url))
+    try:
+        models.Base.metadata.create_all(bind=engine)
+    finally:
+        engine.dispose()
+
+
+# Функція для отримання асинхронної сесії бази даних
+async def get_db():
+    init_db()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Сесія для ендпоінтів лише для читання (репліка може трохи відставати від основної бази)
+async def get_read_db():
+    init_db()
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -3,168 +3,615 @@
 Містить ендпоінти для реєстрації, автентифікації, підтвердження email, обмеження запитів, управління контактами тощо.
 """
 
+from contextlib import asynccontextmanager
 from typing import Pattern
-from fastapi import FastAPI, HTTPException, Depends, status, Request
-from fastapi.responses import JSONResponse
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from passlib.context import CryptContext
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Header, Query, Response, status, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from jose import JWTError, jwt
-from typing import List
-from slowapi import Limiter
-from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
-from slowapi.middleware import SlowAPIMiddleware
-from fastapi.security import OAuth2PasswordBearer
-from dotenv import load_dotenv
+from typing import List, Literal, Optional
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-import cloudinary
-import cloudinary.uploader
-import os
+import asyncio
 import logging
+import math
 import secrets
+import time
 from fastapi import File, UploadFile
+from starlette.datastructures import UploadFile as StarletteUploadFile
 from fastapi import Request
 
+from settings import load_env
+
+# .env - до імпорту сервісів, що читають свої параметри під час імпорту
+load_env()
+
 import models
 import crud
 import schemas
-from crud import send_verification_email
+from database import AsyncReadSessionLocal, AsyncSessionLocal, dispose_db, get_db, get_read_db, init_db, pool_collector
 from models import User
+from services.cache import UserSnapshot, cache_stats, token_cache, user_cache
+from services.compression import CompressionMiddleware
+from services import auth, importer, search
+from services.avatars import AVATAR_BASE_URL, AVATAR_CACHE_CONTROL, LocalStorage, avatar_pipeline, read_upload
+from services.etags import CACHE_CONTROL, VARY, collection_etag, contact_etag, etag_matches, if_match_version, not_modified
+from services.export import ENCODERS, EXPORT_FIELDS, MEDIA_TYPES
+from services.importer import IMPORT_BATCH_SIZE, csv_rows, vcard_rows
+from services.metrics import CONTENT_TYPE, MetricsMiddleware, metrics_registry
+from services.passwords import password_hasher
+from services.querylog import QueryStatsMiddleware
+from services.ratelimit import RateLimiter, RateLimitExceeded, client_ip, ratelimit_collector
+from services.revocation import revocation_list, run_revocation_sync, sync_revocations
+from services.serialization import FAST_CONTACT_LIST, contact_page_json
+from settings import Settings, configure, get_settings
 
-# Завантаження змінних середовища
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-# Ініціалізація бази даних
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-models.Base.metadata.create_all(bind=engine)
+# Маршрути застосунку; create_app підключає їх до екземпляра FastAPI
+router = APIRouter()
 
-# Ініціалізація FastAPI
-app = FastAPI()
-
-# Налаштування CORS
+# Схеми автентифікації
 token_auth_scheme = OAuth2PasswordBearer(tokenUrl="login")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Обмеження швидкості
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_middleware(SlowAPIMiddleware)
+optional_token_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
 
-# Налаштування безпеки
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
+# Налаштування безпеки (ключ підпису - у Settings.secret_key)
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 30
 
-# Налаштування Cloudinary
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET")
-)
-
 # Налаштування логування
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-# Функція для отримання сесії бази даних
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Функція розбору access token (з кешем перевірених claims)
+def decode_access_token(token: str) -> dict:
+    """Перевірка підпису та строку дії токена; результат кешується до закінчення строку дії."""
+    payload = token_cache.get(token)
+    if payload is None or payload.get("exp", 0) <= time.time():
+        try:
+            payload = jwt.decode(token, get_settings().secret_key, algorithms=[ALGORITHM])
+        except JWTError:
+            logger.warning("Помилка JWT при розборі токена")
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+        # Токени підтвердження email, скидання пароля та refresh token підписані тим самим ключем,
+        # але не є токенами доступу
+        if "purpose" in payload or payload.get("type", "access") != "access":
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+        token_cache.set(token, payload, ttl=payload.get("exp", 0) - time.time())
+    return payload
 
 # Функція отримання поточного користувача
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(token_auth_scheme)):
-    """Отримання поточного користувача за токеном."""
+async def get_current_user(token: str = Depends(token_auth_scheme)) -> UserSnapshot:
+    """
+    Отримання поточного користувача за токеном (з кешем claims і знімків користувачів).
+    Сесія бази даних відкривається лише при промаху кешу.
+    """
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            logger.warning("Токен не містить email")
-            raise credentials_exception
-    except JWTError:
-        logger.warning("Помилка JWT при розборі токена")
+    payload = decode_access_token(token)
+    # Відкликання перевіряється в пам'яті процесу (services.revocation), без запиту до бази
+    if revocation_list.is_revoked(payload.get("jti")):
         raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.email == email).first()
+
+    email: str = payload.get("sub")
+    if email is None:
+        logger.warning("Токен не містить email")
+        raise credentials_exception
+
+    user = user_cache.get(email)
     if user is None:
-        logger.warning(f"Користувача {email} не знайдено")
+        init_db()
+        async with AsyncSessionLocal() as db:
+            db_user = await crud.get_user_by_email(db, email)
+        if db_user is None:
+            logger.warning(f"Користувача {email} не знайдено")
+            raise credentials_exception
+        user = UserSnapshot.from_user(db_user)
+        user_cache.set(email, user)
+    # Токени, видані до скидання пароля, недійсні
+    if not user.accepts(payload):
         raise credentials_exception
     return user
 
-@app.get("/contacts/", response_model=List[schemas.ContactResponse])
-@limiter.limit("5/minute")
-def get_contacts(request: Request, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    """Отримання всіх контактів поточного користувача."""
-    return db.query(models.Contact).filter(models.Contact.owner_id == current_user.id).all()
+# Ключ ліміту запитів: автентифікований користувач, інакше IP клієнта
+async def rate_limit_key(request: Request, token: Optional[str] = Depends(optional_token_scheme)) -> str:
+    if token:
+        try:
+            subject = decode_access_token(token).get("sub")
+        except HTTPException:
+            subject = None
+        if subject:
+            return f"user:{subject}"
+    return client_ip(request)
+
+# Обмеження швидкості (token bucket зі спільним сховищем, див. Settings.rate_limit_storage)
+limiter = RateLimiter(key_func=rate_limit_key)
+
+@router.get(
+    "/contacts/",
+    response_model=schemas.ContactPage,
+    response_model_exclude_unset=True,
+    dependencies=[Depends(limiter.limit("5/minute"))],
+)
+async def get_contacts(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    order_by: Literal["id", "last_name"] = "id",
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """
+    Отримання сторінки контактів поточного користувача з курсорною пагінацією та вибіркою полів.
+    Якщо контакти не змінювалися з If-None-Match, повертається 304 без запиту списку.
+    """
+    selected = None
+    if fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = set(selected) - set(crud.CONTACT_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    etag = collection_etag(current_user.id, await crud.get_contacts_revision(db, current_user.id), request)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": VARY}
+    if FAST_CONTACT_LIST:
+        # Рядки колонок кодуються одразу в тіло відповіді, оминаючи ORM і response_model
+        names, rows, next_cursor = await crud.get_contact_rows(
+            db, current_user.id, limit=limit, cursor=cursor, order_by=order_by, fields=selected
+        )
+        return Response(content=contact_page_json(names, rows, next_cursor), media_type="application/json", headers=headers)
+    response.headers.update(headers)
+    contacts, next_cursor = await crud.get_contacts(
+        db, current_user.id, limit=limit, cursor=cursor, order_by=order_by, fields=selected
+    )
+    return {"items": contacts, "next_cursor": next_cursor}
+
+
+@router.get("/contacts/search", response_model=schemas.ContactPage, response_model_exclude_unset=True)
+async def search_contacts(
+    q: Optional[str] = None,
+    filters: schemas.ContactSearch = Depends(),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """Пошук контактів за префіксом (і нечітко на Postgres) з ранжуванням і курсорною пагінацією."""
+    contacts, next_cursor = await search.search_contacts(db, current_user.id, filters, q=q, limit=limit, cursor=cursor)
+    return {"items": contacts, "next_cursor": next_cursor}
+
+
+@router.get("/contacts/changes", response_model=schemas.ContactChanges, response_model_exclude_unset=True)
+async def get_contact_changes(
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """
+    Інкрементальна синхронізація: контакти, створені, змінені або видалені після водяного знаку since.
+    410 - водяний знак застарів (надгробки вже видалено), потрібна повна синхронізація без since.
+    """
+    changes, watermark, has_more = await crud.get_contact_changes(db, current_user.id, since=since, limit=limit)
+    return {"items": changes, "watermark": watermark, "has_more": has_more}
+
+
+@router.get("/contacts/duplicates", response_model=schemas.Duplicates)
+async def get_duplicate_contacts(
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """Ймовірні дублікати, знайдені фоновим воркером (manage.py dedup-worker); pending - результат ще оновлюється."""
+    pairs, pending = await crud.get_duplicate_candidates(db, current_user.id, limit=limit)
+    return {
+        "items": [{"score": score, "contact": contact, "duplicate": duplicate} for score, contact, duplicate in pairs],
+        "pending": pending,
+    }
+
+
+@router.get("/contacts/birthdays", response_model=List[schemas.UpcomingBirthday])
+async def get_upcoming_birthdays(
+    days: int = Query(7, ge=0, le=366),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """Контакти поточного користувача з днями народження в найближчі days днів."""
+    today = date.today()
+    upcoming = await crud.get_upcoming_birthdays(db, current_user.id, days=days, today=today)
+    return [
+        {
+            **{name: getattr(contact, name) for name in crud.CONTACT_FIELDS},
+            "next_birthday": birthday,
+            "days_until": (birthday - today).days,
+        }
+        for contact, birthday in upcoming
+    ]
+
+
+@router.get("/contacts/export")
+async def export_contacts(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """Потоковий експорт усіх контактів поточного користувача у NDJSON або CSV."""
+
+    async def body():
+        # Окрема сесія (репліки, якщо вона є) живе стільки ж, скільки й потік відповіді
+        async with AsyncReadSessionLocal() as db:
+            rows = crud.stream_contacts(db, current_user.id, fields=EXPORT_FIELDS)
+            async for chunk in ENCODERS[format](rows):
+                yield chunk
+
+    headers = {"Content-Disposition": f'attachment; filename="contacts.{format}"'}
+    return StreamingResponse(body(), media_type=MEDIA_TYPES[format], headers=headers)
+
+
+@router.post("/contacts/import", response_model=schemas.ImportReport)
+async def import_contacts(
+    request: Request,
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=3000),
+    transaction: Literal["batch", "all"] = "batch",
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """Масовий імпорт контактів з JSON-масиву або файлу CSV/vCard (multipart, поле file)."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if not isinstance(upload, StarletteUploadFile):
+            raise HTTPException(status_code=400, detail="Field 'file' is required")
+        filename = (upload.filename or "").lower()
+        if filename.endswith((".vcf", ".vcard")) or upload.content_type in ("text/vcard", "text/x-vcard"):
+            rows = vcard_rows(upload.file)
+        else:
+            rows = csv_rows(upload.file)
+    else:
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of contacts")
+        rows = (row if isinstance(row, dict) else {} for row in payload)
+
+    return await importer.import_contacts(db, current_user.id, rows, batch_size=batch_size, transaction=transaction)
+
+
+@router.post("/contacts/", response_model=schemas.ContactResponse, status_code=status.HTTP_201_CREATED)
+async def create_contact(
+    contact: schemas.ContactCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """Створення контакту поточного користувача."""
+    db_contact = await crud.create_contact(db, contact, current_user.id)
+    response.headers["ETag"] = contact_etag(db_contact)
+    return db_contact
+
+
+@router.post("/contacts/bulk-delete")
+async def bulk_delete_contacts(
+    payload: schemas.ContactIds,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """Видалення кількох контактів одним запитом; повертає id фактично видалених."""
+    deleted = await crud.delete_contacts(db, payload.ids, current_user.id)
+    return {"deleted": deleted}
+
+
+@router.post("/contacts/merge", response_model=schemas.ContactResponse)
+async def merge_contacts(
+    payload: schemas.ContactMerge,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """Об'єднання дубліката merge_id з контактом keep_id; дублікат видаляється."""
+    contact = await crud.merge_contacts(db, current_user.id, payload.keep_id, payload.merge_id)
+    response.headers["ETag"] = contact_etag(contact)
+    return contact
+
+
+@router.get("/contacts/{contact_id}", response_model=schemas.ContactResponse)
+async def get_contact(
+    contact_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """Отримання контакту за id (з ETag для умовного GET та умовного оновлення)."""
+    db_contact = await crud.get_contact(db, contact_id, current_user.id)
+    if db_contact is None:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    etag = contact_etag(db_contact)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.headers["Vary"] = VARY
+    return db_contact
+
+
+@router.put("/contacts/{contact_id}", response_model=schemas.ContactResponse)
+@router.patch("/contacts/{contact_id}", response_model=schemas.ContactResponse)
+async def update_contact(
+    contact_id: int,
+    contact: schemas.ContactUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """Часткове оновлення контакту одним UPDATE; If-Match із застарілою версією дає 412."""
+    db_contact = await crud.update_contact(
+        db, contact_id, contact, current_user.id, expected_version=if_match_version(if_match, contact_id)
+    )
+    response.headers["ETag"] = contact_etag(db_contact)
+    return db_contact
+
+
+@router.delete("/contacts/{contact_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_contact(
+    contact_id: int,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+):
+    """Видалення контакту одним DELETE; If-Match із застарілою версією дає 412."""
+    await crud.delete_contact(db, contact_id, current_user.id, expected_version=if_match_version(if_match, contact_id))
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 # Функція створення токену доступу
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
-    """Створення access token для користувача."""
+    """Створення короткоживучого access token для користувача."""
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    # iat - дробовий Unix-час, щоб токен, виданий одразу після скидання пароля, був дійсним
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": secrets.token_urlsafe(16), "type": "access"})
+    return jwt.encode(to_encode, get_settings().secret_key, algorithm=ALGORITHM)
+
+# Функція створення refresh token (одноразовий: /refresh відкликає його і видає нову пару)
+def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
+    to_encode = data.copy()
+    expire = datetime.utcnow() + (expires_delta or timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": secrets.token_urlsafe(16), "type": "refresh"})
+    return jwt.encode(to_encode, get_settings().secret_key, algorithm=ALGORITHM)
+
+# Функція розбору refresh token
+def decode_refresh_token(token: str) -> dict:
+    try:
+        payload = jwt.decode(token, get_settings().secret_key, algorithms=[ALGORITHM])
+    except JWTError:
+        payload = {}
+    if payload.get("type") != "refresh" or not payload.get("sub") or not payload.get("jti"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    return payload
+
+def issue_tokens(email: str) -> schemas.Token:
+    return schemas.Token(
+        access_token=create_access_token({"sub": email}),
+        refresh_token=create_refresh_token({"sub": email}),
+        token_type="bearer",
+    )
+
+# Відкликання токена: спільна таблиця + список у пам'яті цього процесу
+async def revoke(db: AsyncSession, payload: dict) -> bool:
+    revoked = await crud.revoke_token(db, payload["jti"], datetime.utcfromtimestamp(payload["exp"]))
+    revocation_list.add(payload["jti"], payload["exp"])
+    return revoked
 
 # Функція хешування пароля
-def hash_password(password: str) -> str:
-    """Хешування пароля за допомогою bcrypt."""
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    """Хешування пароля за допомогою bcrypt в окремому пулі."""
+    return await password_hasher.hash(password)
 
 # Реєстрація користувача
-@app.post("/register/")
-def register_user(email: str, password: str, db: Session = Depends(get_db)):
+@router.post("/register/")
+async def register_user(email: str, password: str, db: AsyncSession = Depends(get_db)):
     # Перевірка наявності користувача з таким email
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = await crud.get_user_by_email(db, email)
     if existing_user:
         raise HTTPException(status_code=409, detail="Email already registered")
     
-    hashed_password = hash_password(password)
+    hashed_password = await hash_password(password)
     new_user = User(email=email, hashed_password=hashed_password)
     db.add(new_user)
-    db.commit()
+    await db.commit()
     return {"message": "User created successfully"}
 
+# Вхід: пара access + refresh token
+@router.post("/login", response_model=schemas.Token, dependencies=[Depends(limiter.limit("10/minute"))])
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Incorrect email or password",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    user = await crud.get_user_by_email(db, form.username)
+    if user is None:
+        raise credentials_exception
+    verified, new_hash = await password_hasher.verify(form.password, user.hashed_password)
+    if not verified:
+        raise credentials_exception
+    # Хеш зі застарілою вартістю bcrypt оновлюється під час успішного входу
+    if new_hash:
+        await crud.reset_user_password(db, user.email, new_hash, revoke_tokens=False)
+    return issue_tokens(user.email)
+
+# Ротація refresh token: використаний токен відкликається, видається нова пара
+@router.post("/refresh", response_model=schemas.Token)
+async def refresh_tokens(data: schemas.RefreshRequest, db: AsyncSession = Depends(get_db)):
+    payload = decode_refresh_token(data.refresh_token)
+    # Після скидання пароля (або видалення користувача) старі refresh token не обмінюються
+    user = await crud.get_user_by_email(db, payload["sub"])
+    if user is None or not UserSnapshot.from_user(user).accepts(payload):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    # Повторне використання вже обміняного токена (в т.ч. одночасне) відхиляється атомарним INSERT
+    if revocation_list.is_revoked(payload["jti"]) or not await revoke(db, payload):
+        logger.warning(f"Повторне використання refresh token користувача {payload['sub']}")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token has been revoked")
+    return issue_tokens(payload["sub"])
+
+# Вихід: відкликання поточного access token і (за наявності) refresh token
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    data: Optional[schemas.RefreshRequest] = None,
+    token: str = Depends(token_auth_scheme),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    payload = decode_access_token(token)
+    if payload.get("jti"):
+        await revoke(db, payload)
+    if data is not None:
+        refresh = decode_refresh_token(data.refresh_token)
+        if refresh["sub"] == current_user.email:
+            await revoke(db, refresh)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 # Оновлення аватара користувача
-@app.put("/update_avatar/")
+@router.put("/update_avatar/")
 async def update_avatar(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    """Оновлення аватара користувача через Cloudinary."""
+    """Оновлення аватара користувача: обробка і завантаження у сховище виконуються поза циклом подій."""
     if file.content_type not in ["image/jpeg", "image/png"]:
         raise HTTPException(status_code=400, detail="Invalid image format. Only PNG and JPEG are allowed.")
 
+    data = await read_upload(file)
     try:
-        upload_result = cloudinary.uploader.upload(file.file)
-        avatar_url = upload_result['secure_url']
+        avatar_url = await avatar_pipeline.store(data)
+    except HTTPException:
+        raise
     except Exception:
-        raise HTTPException(status_code=500, detail="Error uploading image to Cloudinary")
+        logger.exception("Помилка завантаження аватара")
+        raise HTTPException(status_code=500, detail="Error uploading image to storage")
 
-    current_user.avatar_url = avatar_url
-    db.commit()
-    db.refresh(current_user)
+    await crud.update_user_avatar(db, current_user.id, avatar_url)
     return {"message": "Avatar updated successfully", "avatar_url": avatar_url}
 
+# Аватари з локального сховища (для Cloudinary URL аватара вказує на CDN)
+@router.get(AVATAR_BASE_URL.rstrip("/") + "/{name}", include_in_schema=False)
+async def get_avatar(name: str, if_none_match: Optional[str] = Header(None)):
+    """Файл віддається FileResponse (http.response.pathsend, якщо сервер його підтримує) з сильним ETag."""
+    storage = avatar_pipeline.storage
+    path = storage.path(name) if isinstance(storage, LocalStorage) else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    # Вміст файлу визначається його іменем, тож ETag не потребує читання файлу
+    etag = f'"{name.rpartition(".")[0]}"'
+    headers = {"ETag": etag, "Cache-Control": AVATAR_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(path, headers=headers)
+
+# Службові ендпоінти доступні лише збирачу метрик (Bearer-токен із Settings.metrics_token)
+async def require_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """Без налаштованого токена службові ендпоінти вимкнені (404), з чужим токеном - 401."""
+    expected = get_settings().metrics_token
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials", headers={"WWW-Authenticate": "Bearer"}
+        )
+
+# Статистика кешу користувачів
+@router.get("/cache/stats/", dependencies=[Depends(require_metrics_token)])
+async def get_cache_stats():
+    """Лічильники влучань/промахів кешу автентифікованих користувачів."""
+    return cache_stats()
+
+# Метрики у форматі Prometheus
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def get_metrics():
+    """Затримки, коди відповіді та розміри запитів за маршрутами, а також лічильники кешів."""
+    return Response(content=metrics_registry.render(), media_type=CONTENT_TYPE)
+
 # Обробник перевищення ліміту запитів
-@app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     """Обробка перевищення ліміту запитів."""
-    return JSONResponse(status_code=429, content={"detail": "Занадто багато запитів! Спробуйте пізніше."})
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Занадто багато запитів! Спробуйте пізніше."},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+# Старт і зупинка застосунку: важкі ресурси створюються тут, а не під час імпорту
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = app.state.settings
+    # Рушії, створені ліниво до старту (інші налаштування в тому самому процесі), замінюються
+    await dispose_db()
+    engine = init_db(settings.database_url, settings.database_replica_url)
+    if settings.create_schema:
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+    # Список відкликаних токенів завантажується до першого запиту і далі оновлюється у фоні
+    revocation_list.clear()
+    try:
+        await sync_revocations()
+    except Exception:
+        logger.exception("Не вдалося завантажити відкликані токени")
+    sync_task = asyncio.create_task(run_revocation_sync())
+    try:
+        yield
+    finally:
+        sync_task.cancel()
+        avatar_pipeline.shutdown()
+        password_hasher.shutdown()
+        await dispose_db()
+
+
+# Фабрика застосунку
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Створення застосунку; settings за замовчуванням - зі змінних середовища."""
+    settings = configure(settings or get_settings())
+    app = FastAPI(lifespan=lifespan)
+    app.state.settings = settings
+    for route_limiter in (limiter, auth.limiter):
+        route_limiter.configure(settings.rate_limit_storage)
+        route_limiter.enabled = settings.rate_limit_enabled
+
+    # Налаштування CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(settings.cors_origins),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Стиснення JSON-відповідей (zstd/br/gzip за Accept-Encoding)
+    app.add_middleware(CompressionMiddleware)
+    # Лічильники SQL-виразів на запит, журнал повільних запитів і виявлення N+1
+    app.add_middleware(QueryStatsMiddleware)
+    # Метрики запитів (зовнішній шар - рахує й відповіді CORS)
+    app.add_middleware(MetricsMiddleware)
+
+    # Стан пулів з'єднань і недоступність сховища лімітів у /metrics
+    for collector in (pool_collector, ratelimit_collector):
+        if collector not in metrics_registry.collectors:
+            metrics_registry.collectors.append(collector)
+
+    app.include_router(router)
+    app.include_router(auth.router)
+    app.add_exception_handler(RateLimitExceeded, rate_limit_handler)
+    return app
+
+
+# Екземпляр для uvicorn main:app
+app = create_app()
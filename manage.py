@@ -0,0 +1,189 @@
+"""
+Службові команди проєкту.
+
+Приклад:
+    python manage.py calibrate-bcrypt --target-ms 250
+    python manage.py outbox-worker
+    python manage.py dedup-worker
+    python manage.py birthday-digest --send --concurrency 8
+    python manage.py compact-tombstones --days 30
+    python manage.py prune-revoked-tokens
+    python manage.py migrate
+"""
+
+import argparse
+import asyncio
+import os
+
+
+def calibrate_bcrypt(args):
+    """Підбір BCRYPT_ROUNDS для цільової затримки на поточному хості."""
+    from services.passwords import calibrate
+
+    rounds = calibrate(args.target_ms)
+    print(f"BCRYPT_ROUNDS={rounds}")
+
+
+def outbox_worker(args):
+    """Фоновий відправник листів з email_outbox."""
+    from database import AsyncSessionLocal, init_db
+    from services.outbox import OUTBOX_BATCH_SIZE, OutboxWorker
+
+    init_db()
+    worker = OutboxWorker(AsyncSessionLocal, batch_size=args.batch_size or OUTBOX_BATCH_SIZE)
+    if args.once:
+        print(f"processed {asyncio.run(worker.drain_once())} messages")
+    else:
+        asyncio.run(worker.run())
+
+
+def dedup_worker(args):
+    """Фоновий пошук дублікатів контактів для власників зі зміненими контактами."""
+    from database import AsyncSessionLocal, init_db
+    from services.dedup import DEDUP_BATCH_SIZE, DedupWorker
+
+    init_db()
+    worker = DedupWorker(AsyncSessionLocal, batch_size=args.batch_size or DEDUP_BATCH_SIZE)
+    if args.once:
+        print(f"processed {asyncio.run(worker.drain_once())} owners")
+    else:
+        asyncio.run(worker.run())
+
+
+def birthday_digest(args):
+    """Дайджести найближчих днів народження: постановка в email_outbox і (з --send) надсилання."""
+    from datetime import date, datetime, timedelta
+
+    from database import AsyncSessionLocal, init_db
+    from services.digests import enqueue_birthday_digests
+    from services.outbox import OutboxWorker, SMTPPool
+
+    init_db()
+
+    async def run_once(today: date):
+        async with AsyncSessionLocal() as db:
+            enqueued = await enqueue_birthday_digests(db, today, days=args.days, batch_size=args.batch_size)
+        print(f"{today}: enqueued {enqueued} digests")
+        if args.send:
+            pool = SMTPPool.from_settings(size=args.concurrency)
+            worker = OutboxWorker(AsyncSessionLocal, pool=pool)
+            try:
+                sent = 0
+                while processed := await worker.drain_once():
+                    sent += processed
+            finally:
+                await pool.close()
+            print(f"{today}: processed {sent} messages")
+
+    async def daily():
+        hour, minute = map(int, args.at.split(":"))
+        while True:
+            now = datetime.now()
+            next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            await asyncio.sleep((next_run - now).total_seconds())
+            await run_once(next_run.date())
+
+    if args.at:
+        asyncio.run(daily())
+    else:
+        asyncio.run(run_once(date.fromisoformat(args.date) if args.date else date.today()))
+
+
+def compact_tombstones(args):
+    """Остаточне видалення надгробків контактів, старших за --days днів."""
+    from datetime import datetime, timedelta, timezone
+
+    import crud
+    from database import AsyncSessionLocal, init_db
+
+    init_db()
+
+    async def compact():
+        async with AsyncSessionLocal() as db:
+            return await crud.compact_tombstones(db, datetime.now(timezone.utc) - timedelta(days=args.days))
+
+    print(f"removed {asyncio.run(compact())} tombstones")
+
+
+def prune_revoked_tokens(args):
+    """Видалення записів про відкликані токени, строк дії яких уже минув."""
+    import crud
+    from database import AsyncSessionLocal, init_db
+
+    init_db()
+
+    async def prune():
+        async with AsyncSessionLocal() as db:
+            return await crud.prune_revoked_tokens(db)
+
+    print(f"removed {asyncio.run(prune())} revoked tokens")
+
+
+def migrate(args):
+    """Створення таблиць, індексів і тригерів пошуку (замість create_all під час імпорту main)."""
+    from database import AsyncSessionLocal, create_schema, init_db
+    from services.dedup import mark_unkeyed_owners
+    from settings import get_settings
+
+    url = args.database_url or get_settings().database_url
+    create_schema(url)
+    print("schema is up to date")
+    init_db(url)
+
+    async def backfill():
+        async with AsyncSessionLocal() as db:
+            return await mark_unkeyed_owners(db)
+
+    print(f"queued {asyncio.run(backfill())} owners for duplicate detection")
+
+
+def main(argv=None):
+    from settings import load_env
+
+    # .env - до імпорту сервісів і до значень за замовчуванням аргументів нижче
+    load_env()
+    parser = argparse.ArgumentParser(description="Службові команди hw14")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_parser = subparsers.add_parser("calibrate-bcrypt", help=calibrate_bcrypt.__doc__)
+    calibrate_parser.add_argument("--target-ms", type=float, default=250.0)
+    calibrate_parser.set_defaults(func=calibrate_bcrypt)
+
+    outbox_parser = subparsers.add_parser("outbox-worker", help=outbox_worker.__doc__)
+    outbox_parser.add_argument("--batch-size", type=int)
+    outbox_parser.add_argument("--once", action="store_true", help="обробити одну порцію і завершитися")
+    outbox_parser.set_defaults(func=outbox_worker)
+
+    dedup_parser = subparsers.add_parser("dedup-worker", help=dedup_worker.__doc__)
+    dedup_parser.add_argument("--batch-size", type=int)
+    dedup_parser.add_argument("--once", action="store_true", help="обробити одну порцію власників і завершитися")
+    dedup_parser.set_defaults(func=dedup_worker)
+
+    digest_parser = subparsers.add_parser("birthday-digest", help=birthday_digest.__doc__)
+    digest_parser.add_argument("--date", help="дата дайджесту YYYY-MM-DD, за замовчуванням - сьогодні")
+    digest_parser.add_argument("--days", type=int, default=int(os.getenv("BIRTHDAY_DIGEST_DAYS", 7)))
+    digest_parser.add_argument("--batch-size", type=int, default=int(os.getenv("BIRTHDAY_DIGEST_BATCH_SIZE", 500)))
+    digest_parser.add_argument("--send", action="store_true", help="одразу надіслати листи з email_outbox")
+    digest_parser.add_argument("--concurrency", type=int, default=int(os.getenv("SMTP_POOL_SIZE", 4)), help="кількість SMTP-з'єднань")
+    digest_parser.add_argument("--at", help="HH:MM - запускати щодня в цей час замість одноразового запуску")
+    digest_parser.set_defaults(func=birthday_digest)
+
+    compact_parser = subparsers.add_parser("compact-tombstones", help=compact_tombstones.__doc__)
+    compact_parser.add_argument("--days", type=int, default=int(os.getenv("TOMBSTONE_RETENTION_DAYS", 30)))
+    compact_parser.set_defaults(func=compact_tombstones)
+
+    prune_parser = subparsers.add_parser("prune-revoked-tokens", help=prune_revoked_tokens.__doc__)
+    prune_parser.set_defaults(func=prune_revoked_tokens)
+
+    migrate_parser = subparsers.add_parser("migrate", help=migrate.__doc__)
+    migrate_parser.add_argument("--database-url", help="за замовчуванням - DATABASE_URL")
+    migrate_parser.set_defaults(func=migrate)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Date, Text, ForeignKey, DateTime, Boolean, func
+from sqlalchemy import Column, Integer, SmallInteger, String, Date, Text, ForeignKey, DateTime, Boolean, Float, Index, DDL, event, func
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime, date
 from pydantic import BaseModel, EmailStr, constr
 from typing import Pattern
@@ -9,6 +9,11 @@ from typing import Pattern
 # Base class for all models
 Base = declarative_base()
 
+
+def birthday_key(value: date | None) -> int | None:
+    """Month-day key of a birthday (e.g. 0229 -> 229) used by the upcoming-birthdays index."""
+    return value.month * 100 + value.day if value else None
+
 class User(Base):
     """
     Represents a user in the database.
@@ -20,7 +25,15 @@ class User(Base):
         created_at (datetime): Timestamp of user creation.
         avatar_url (str | None): URL of the user's avatar.
         is_verified (bool): Indicates if the email is verified.
-        verification_code (str | None): Verification code for email confirmation.
+        verification_code (str | None): Legacy column; verification now uses signed tokens (services.tokens).
+        contacts_revision (int): Counter bumped on every change to the user's contacts (collection ETag, sync watermark).
+        contacts_compacted_revision (int): Highest revision of tombstones removed by compaction.
+        contacts_compacted_id (int): Highest tombstone id removed within contacts_compacted_revision;
+            sync watermarks below (contacts_compacted_revision, contacts_compacted_id) can no longer be served.
+        contacts_dedup_revision (int): contacts_revision at the last duplicate detection pass.
+        tokens_valid_after (datetime | None): UTC time of the last password reset;
+            access and refresh tokens issued earlier are rejected. Indexed for the
+            incremental sync that drops stale user snapshots in other processes.
         contacts (List[Contact]): List of contacts associated with the user.
     """
     __tablename__ = "users"
@@ -32,6 +45,11 @@ class User(Base):
     avatar_url = Column(String, nullable=True)
     is_verified = Column(Boolean, default=False)
     verification_code = Column(String, nullable=True)
+    contacts_revision = Column(Integer, nullable=False, default=0, server_default="0")
+    contacts_compacted_revision = Column(Integer, nullable=False, default=0, server_default="0")
+    contacts_compacted_id = Column(Integer, nullable=False, default=0, server_default="0")
+    contacts_dedup_revision = Column(Integer, nullable=False, default=0, server_default="0")
+    tokens_valid_after = Column(DateTime, nullable=True, index=True)
     contacts = relationship("Contact", back_populates="owner")
 
 class Contact(Base):
@@ -45,8 +63,15 @@ class Contact(Base):
         email (str): Unique email address of the contact.
         phone_number (str): Contact's phone number.
         birthday (date): Contact's date of birth.
+        birthday_key (int | None): Month-day of the birthday (month * 100 + day), kept in sync with birthday.
         additional_info (str | None): Additional information about the contact.
+        phone_e164 (str | None): Phone number normalized to E.164 (duplicate detection blocking key).
+        name_key (str | None): Case- and order-insensitive normalized name (duplicate detection blocking key).
         created_at (datetime): Timestamp of contact creation.
+        updated_at (datetime): Timestamp of the last change.
+        version (int): Row version, incremented on every update (optimistic concurrency).
+        revision (int): Owner's contacts_revision at the last change of the row (incremental sync).
+        deleted_at (datetime | None): Soft-delete time; the row is a tombstone until compaction.
         owner_id (int): ID of the user who owns the contact.
         owner (User): The user associated with the contact.
     """
@@ -58,12 +83,163 @@ class Contact(Base):
     email = Column(String, unique=True, index=True)
     phone_number = Column(String, nullable=False)  
     birthday = Column(Date)
+    birthday_key = Column(SmallInteger, nullable=True)
     additional_info = Column(Text, nullable=True)
+    # Ключі блокування для пошуку дублікатів; заповнюються воркером services.dedup
+    phone_e164 = Column(String, nullable=True)
+    name_key = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1)
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
     
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     owner = relationship("User", back_populates="contacts")
 
+    # Композитні індекси для keyset-пагінації за (owner_id, id) та (owner_id, last_name, id)
+    # і для пошуку найближчих днів народження за (owner_id, birthday_key),
+    # стрічка змін для синхронізації - за (owner_id, revision, id),
+    # блоки кандидатів у дублікати - за (owner_id, phone_e164) та (owner_id, name_key)
+    __table_args__ = (
+        Index("ix_contacts_owner_id_id", "owner_id", "id"),
+        Index("ix_contacts_owner_id_last_name_id", "owner_id", "last_name", "id"),
+        Index("ix_contacts_owner_id_birthday_key", "owner_id", "birthday_key"),
+        Index("ix_contacts_owner_id_revision_id", "owner_id", "revision", "id"),
+        Index("ix_contacts_owner_id_phone_e164", "owner_id", "phone_e164"),
+        Index("ix_contacts_owner_id_name_key", "owner_id", "name_key"),
+    )
+
+    @validates("birthday")
+    def _sync_birthday_key(self, key, value):
+        self.birthday_key = birthday_key(value)
+        return value
+
+class ContactDuplicate(Base):
+    """
+    Represents a scored pair of contacts that are likely the same person.
+    Pairs are recomputed per owner by the dedup worker (services.dedup).
+    
+    Attributes:
+        id (int): Unique identifier for the pair.
+        owner_id (int): ID of the user who owns both contacts.
+        contact_id (int): ID of the first contact (the smaller ID).
+        duplicate_id (int): ID of the second contact.
+        score (float): Similarity score from 0 to 1.
+        created_at (datetime): UTC time when the pair was found.
+    """
+    __tablename__ = "contact_duplicates"
+
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    contact_id = Column(Integer, ForeignKey("contacts.id", ondelete="CASCADE"), nullable=False)
+    duplicate_id = Column(Integer, ForeignKey("contacts.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Найімовірніші дублікати власника першими
+    __table_args__ = (
+        Index("ix_contact_duplicates_owner_id_score", "owner_id", "score"),
+    )
+
+class OutboxMessage(Base):
+    """
+    Represents an email waiting in the outbox to be sent by the background worker.
+    
+    Attributes:
+        id (int): Unique identifier for the message.
+        recipient (str): Email address of the recipient.
+        subject (str): Subject of the email.
+        body (str): Plain-text body of the email.
+        status (str): One of "pending", "sent" or "failed".
+        attempts (int): Number of failed delivery attempts so far.
+        next_attempt_at (datetime): UTC time when the message is due for (re)delivery.
+        last_error (str | None): Error message of the last failed attempt.
+        dedup_key (str | None): Optional unique key that prevents enqueuing the same email twice.
+        created_at (datetime): UTC time when the message was enqueued.
+        sent_at (datetime | None): UTC time when the message was delivered.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    dedup_key = Column(String, unique=True, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    # Вибірка повідомлень, що вже настав час надіслати
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+class RevokedToken(Base):
+    """
+    Represents a revoked access or refresh token (by its jti).
+    Rows are needed only until the token expires; processes keep them in memory (services.revocation).
+    
+    Attributes:
+        jti (str): Unique token identifier.
+        expires_at (datetime): UTC expiry time of the token.
+        revoked_at (datetime): UTC time of revocation (incremental sync watermark).
+    """
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class JobCheckpoint(Base):
+    """
+    Represents the progress of a batch job, so a restarted run resumes where the previous one stopped.
+    
+    Attributes:
+        name (str): Job run identifier (e.g. "birthday-digest:2025-06-01").
+        position (int): Last processed key (e.g. owner ID).
+        updated_at (datetime): UTC time of the last checkpoint.
+    """
+    __tablename__ = "job_checkpoints"
+
+    name = Column(String, primary_key=True)
+    position = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Повнотекстовий пошук контактів.
+# Postgres: GIN-індекси tsvector та pg_trgm (btree_gin дозволяє додати owner_id у той самий індекс).
+# SQLite: зовнішня FTS5-таблиця contacts_fts, синхронізована тригерами.
+SEARCH_DOCUMENT = "coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || coalesce(email, '')"
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    f"CREATE INDEX IF NOT EXISTS ix_contacts_search_tsv ON contacts USING gin (owner_id, to_tsvector('simple', {SEARCH_DOCUMENT}))",
+    f"CREATE INDEX IF NOT EXISTS ix_contacts_search_trgm ON contacts USING gin (owner_id, lower({SEARCH_DOCUMENT}) gin_trgm_ops)",
+]
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5("
+    "first_name, last_name, email, content='contacts', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email) VALUES (new.id, new.first_name, new.last_name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) VALUES ('delete', old.id, old.first_name, old.last_name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email) VALUES (new.id, new.first_name, new.last_name, new.email); END",
+]
+
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(Contact.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Contact.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Contact.__table__, "before_drop", DDL("DROP TABLE IF EXISTS contacts_fts").execute_if(dialect="sqlite"))
+
 class ContactResponse(BaseModel):
     """
     API response schema for a contact.
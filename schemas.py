@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, constr
+from pydantic import BaseModel, EmailStr, conlist, constr
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 from typing import Pattern
 
 
@@ -38,6 +38,101 @@ class ContactResponse(ContactCreate):
     class Config:
         orm_mode = True
 
+class UpcomingBirthday(ContactResponse):
+    """
+    Schema for a contact with an upcoming birthday.
+    
+    Attributes:
+        next_birthday (date): Date of the next birthday (Feb 28 for Feb 29 birthdays in non-leap years).
+        days_until (int): Number of days until the next birthday.
+    """
+    next_birthday: date
+    days_until: int
+
+    class Config:
+        orm_mode = True
+
+class ContactFields(BaseModel):
+    """
+    Schema for a contact with an optional subset of fields (``fields=`` projection).
+    
+    Attributes:
+        id (Optional[int]): The unique identifier of the contact.
+        first_name (Optional[str]): The first name of the contact.
+        last_name (Optional[str]): The last name of the contact.
+        email (Optional[str]): The email of the contact.
+        phone_number (Optional[str]): The phone number of the contact.
+        birthday (Optional[date]): The birth date of the contact.
+        additional_info (Optional[str]): Additional information about the contact.
+    """
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    phone_number: Optional[str] = None
+    birthday: Optional[date] = None
+    additional_info: Optional[str] = None
+    id: Optional[int] = None
+
+    class Config:
+        orm_mode = True
+
+class ContactPage(BaseModel):
+    """
+    Schema for a page of contacts with keyset pagination.
+    
+    Attributes:
+        items (List[ContactFields]): Contacts on the current page.
+        next_cursor (Optional[str]): Opaque cursor of the next page, or None on the last page.
+    """
+    items: List[ContactFields]
+    next_cursor: Optional[str] = None
+
+class ContactChange(ContactFields):
+    """
+    Schema for an entry of the incremental sync feed.
+    
+    Attributes:
+        deleted (bool): True for a tombstone of a deleted contact (only ``id`` is set).
+    """
+    deleted: bool = False
+
+class ContactChanges(BaseModel):
+    """
+    Schema for a page of contact changes since a watermark.
+    
+    Attributes:
+        items (List[ContactChange]): Created, modified and deleted contacts in change order.
+        watermark (str): Opaque watermark to pass as ``since`` on the next sync.
+        has_more (bool): Whether more changes are available right away.
+    """
+    items: List[ContactChange]
+    watermark: str
+    has_more: bool = False
+
+class ImportRowError(BaseModel):
+    """
+    Schema for a rejected row of a bulk import.
+    
+    Attributes:
+        row (int): 1-based number of the row in the uploaded data.
+        error (str): Why the row was rejected.
+    """
+    row: int
+    error: str
+
+class ImportReport(BaseModel):
+    """
+    Schema for the result of a bulk contact import.
+    
+    Attributes:
+        inserted (int): Number of contacts created.
+        failed (int): Number of rejected rows.
+        errors (List[ImportRowError]): Per-row error report.
+    """
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
 class ContactSearch(BaseModel):
     """
     Schema for searching contacts.
@@ -73,6 +168,50 @@ class ContactUpdate(BaseModel):
     class Config:
         orm_mode = True
 
+class ContactIds(BaseModel):
+    """
+    Schema for a bulk operation on contacts.
+    
+    Attributes:
+        ids (List[int]): Identifiers of the contacts (1 to 1000 per request, one IN list).
+    """
+    ids: conlist(int, min_length=1, max_length=1000)
+
+class ContactMerge(BaseModel):
+    """
+    Schema for merging a duplicate contact into another one.
+    
+    Attributes:
+        keep_id (int): The contact that stays; its empty fields are filled from the duplicate.
+        merge_id (int): The duplicate, deleted after the merge.
+    """
+    keep_id: int
+    merge_id: int
+
+class DuplicatePair(BaseModel):
+    """
+    Schema for a pair of contacts that are likely the same person.
+    
+    Attributes:
+        score (float): Similarity score from 0 to 1.
+        contact (ContactResponse): The first contact of the pair.
+        duplicate (ContactResponse): The second contact of the pair.
+    """
+    score: float
+    contact: ContactResponse
+    duplicate: ContactResponse
+
+class Duplicates(BaseModel):
+    """
+    Schema for the list of duplicate candidates.
+    
+    Attributes:
+        items (List[DuplicatePair]): Pairs ordered by score, most likely duplicates first.
+        pending (bool): True if contacts changed after the last detection pass (results may be stale).
+    """
+    items: List[DuplicatePair]
+    pending: bool = False
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: constr
@@ -120,9 +259,20 @@ class Token(BaseModel):
     Attributes:
         access_token (str): The access token string.
         token_type (str): The type of the token (e.g., 'bearer').
+        refresh_token (str | None): Refresh token; single-use, rotated by /refresh.
     """
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    """
+    Schema for exchanging (or revoking) a refresh token.
+    
+    Attributes:
+        refresh_token (str): The refresh token string.
+    """
+    refresh_token: str
 
 class EmailVerification(BaseModel):
     """
@@ -1,90 +1,88 @@
-from fastapi import HTTPException, status
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import smtplib
-import os
-from models import User  # Adjust the import according to your project structure
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud
+from database import get_db
+from services.email import send_password_reset_email, send_verification_email
+from services.outbox import enqueue_email
+from services.passwords import password_hasher
+from services.ratelimit import RateLimiter
+from services.tokens import RESET_PASSWORD, VERIFY_EMAIL, claim_purpose_token, create_purpose_token, decode_purpose_token
 
-# Функція для надсилання email
-def send_email(to_email: str, token: str):
-    """Надсилає email з токеном для верифікації."""
-    from_email = os.getenv("EMAIL_USER")
-    email_password = os.getenv("EMAIL_PASSWORD")
-    
-    # Створення листа
+# Функція для надсилання email (лист ставиться в чергу outbox і надсилається фоновим воркером)
+async def send_email(db: AsyncSession, to_email: str, token: str):
+    """Ставить у чергу email з токеном для верифікації."""
     subject = "Підтвердження електронної пошти"
     body = f"Будь ласка, використайте наступний токен для підтвердження вашої електронної пошти: {token}"
-
-    msg = MIMEMultipart()
-    msg["From"] = from_email
-    msg["To"] = to_email
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "plain"))
-    
-    try:
-        # Підключення до SMTP сервера (для Gmail)
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
-        server.login(from_email, email_password)
-        server.sendmail(from_email, to_email, msg.as_string())
-        server.quit()
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Помилка при надсиланні email."
-        )
+    await enqueue_email(db, to_email, subject, body)
 
 # Функція для створення токена підтвердження email
 def create_email_verification_token(email: str) -> str:
-    """Генерує токен для підтвердження email."""
-    # Тут має бути логіка генерації токена
-    return "dummy_token"
-
-# Маршрут для надсилання токена підтвердження email
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel, EmailStr
+    """Підписаний токен підтвердження email зі строком дії (без запису в базу)."""
+    return create_purpose_token(email, VERIFY_EMAIL)
 
 # Функція для перевірки токена підтвердження email
 def verify_email_token(token: str) -> str:
-    """Перевіряє токен підтвердження email."""
-    # Тут має бути логіка перевірки токена
-    return "dummy_email@example.com"
+    """Перевіряє підпис, строк дії та призначення токена; повертає email."""
+    return decode_purpose_token(token, VERIFY_EMAIL)["sub"]
 
 router = APIRouter()
 
+# Маршрути без автентифікації, що ставлять листи в чергу, обмежуються за IP клієнта
+# (create_app налаштовує сховище так само, як для main.limiter)
+limiter = RateLimiter()
+
 class EmailVerificationRequest(BaseModel):
     email: str
 
-@router.post("/send-verification-email/")
-async def send_verification_email_route(email: EmailStr):
-    # Створюємо токен для підтвердження email
-    token = create_email_verification_token(email)
-    
-    # Надсилаємо email з токеном
-    try:
-        send_email(email, token)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Помилка при надсиланні email: {str(e)}")
-    
+class PasswordResetConfirm(BaseModel):
+    token: str
+    new_password: str
+
+@router.post("/send-verification-email/", dependencies=[Depends(limiter.limit("3/minute"))])
+async def send_verification_email_route(email: EmailStr, db: AsyncSession = Depends(get_db)):
+    # Лист ставиться в чергу лише для наявного непідтвердженого користувача; відповідь однакова
+    user = await crud.get_user_by_email(db, email)
+    if user is not None and not user.is_verified:
+        token = create_email_verification_token(email)
+        try:
+            await send_verification_email(db, email, token)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Помилка при надсиланні email: {str(e)}")
+
     return {"message": "Лист з токеном підтвердження надіслано на вашу електронну пошту."}
 
 @router.get("/verify-email/{token}")
-async def verify_email(token: str):
-    try:
-        # Перевіряємо токен
-        email = verify_email_token(token)
-        
-        # Знаходимо користувача за email і оновлюємо його статус верифікації
-        user = await User.get(email=email)
-        if user is None:
-            raise HTTPException(status_code=404, detail="Користувача не знайдено.")
-        
-        user.is_verified = True
-        await user.save()
+async def verify_email(token: str, db: AsyncSession = Depends(get_db)):
+    # Підпис і строк дії перевіряються без звернення до бази
+    claims = decode_purpose_token(token, VERIFY_EMAIL)
+
+    # Єдиний запис - умовний UPDATE is_verified; токен гаситься лише перед комітом цього UPDATE
+    if not await crud.mark_user_verified(db, claims["sub"], before_commit=lambda: claim_purpose_token(claims)):
+        return {"message": "Електронну пошту вже підтверджено."}
+    return {"message": "Електронну пошту успішно підтверджено!"}
+
+@router.post("/request-password-reset/", dependencies=[Depends(limiter.limit("3/minute"))])
+async def request_password_reset(email: EmailStr, db: AsyncSession = Depends(get_db)):
+    # Відповідь однакова незалежно від того, чи існує користувач; лист - лише наявному
+    if await crud.get_user_by_email(db, email) is not None:
+        token = create_purpose_token(email, RESET_PASSWORD)
+        try:
+            await send_password_reset_email(db, email, token)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Помилка при надсиланні email: {str(e)}")
+    return {"message": "Якщо обліковий запис існує, на пошту надіслано посилання для скидання пароля."}
 
-        return {"message": "Електронну пошту успішно підтверджено!"}
-    
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=400, detail="Невірний токен підтвердження.")
\ No newline at end of file
+@router.post("/reset-password/")
+async def reset_password(data: PasswordResetConfirm, db: AsyncSession = Depends(get_db)):
+    # Токен скидання одноразовий: використаний jti зберігається до закінчення строку дії.
+    # Він гаситься після UPDATE і перед комітом, тож збій запису не витрачає дійсний токен
+    claims = decode_purpose_token(data.token, RESET_PASSWORD)
+    hashed_password = await password_hasher.hash(data.new_password)
+    reset = await crud.reset_user_password(
+        db, claims["sub"], hashed_password, before_commit=lambda: claim_purpose_token(claims)
+    )
+    if not reset:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Користувача не знайдено.")
+    return {"message": "Пароль успішно змінено."}
@@ -0,0 +1,224 @@
+"""
+Конвеєр завантаження аватарів поза циклом подій.
+Файл читається порціями з обмеженням розміру, зображення декодується і зменшується
+до кількох фіксованих розмірів у пулі процесів, а результат зберігається через
+змінний бекенд сховища (Cloudinary або локальна файлова система).
+Однакові зображення (за SHA-256 вмісту) повторно не обробляються і не завантажуються.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, ImageOps, UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
+
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Налаштування конвеєра
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", 5 * 1024 * 1024))
+AVATAR_SIZES = tuple(int(size) for size in os.getenv("AVATAR_SIZES", "256,128,64").split(","))
+AVATAR_WORKERS = int(os.getenv("AVATAR_WORKERS", 2))
+AVATAR_STORAGE = os.getenv("AVATAR_STORAGE", "cloudinary")  # cloudinary | local
+AVATAR_LOCAL_DIR = os.getenv("AVATAR_LOCAL_DIR", "./media/avatars")
+AVATAR_BASE_URL = os.getenv("AVATAR_BASE_URL", "/avatars")
+READ_CHUNK_SIZE = 64 * 1024
+# Імена файлів адресуються вмістом (SHA-256 оригіналу + варіант), тож їх можна кешувати назавжди
+AVATAR_CACHE_CONTROL = "public, max-age=31536000, immutable"
+AVATAR_FILE_NAME = re.compile(r"^[0-9a-f]{64}_[a-z0-9]+\.[a-z0-9]+$")
+# Скільки відомих хешів зберігається в пам'яті процесу (CloudinaryStorage.find)
+AVATAR_KNOWN_KEYS = int(os.getenv("AVATAR_KNOWN_KEYS", 10000))
+
+# Варіант зображення: (вміст, розширення файлу)
+Variant = Tuple[bytes, str]
+
+
+async def read_upload(file: UploadFile, max_bytes: int = AVATAR_MAX_BYTES) -> bytes:
+    """Читання файлу порціями; завеликий файл відхиляється з 413 без повного читання."""
+    chunks, size = [], 0
+    while chunk := await file.read(READ_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Avatar file is too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def process_image(data: bytes, sizes: Tuple[int, ...] = AVATAR_SIZES) -> Dict[str, Variant]:
+    """Декодування та зменшення до квадратних мініатюр (виконується в окремому процесі)."""
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise ValueError(f"Invalid image: {e}")
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    variants = {}
+    for size in sizes:
+        thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if has_alpha:
+            thumbnail.save(buffer, format="PNG", optimize=True)
+            variants[str(size)] = (buffer.getvalue(), "png")
+        else:
+            thumbnail.save(buffer, format="JPEG", quality=85, optimize=True)
+            variants[str(size)] = (buffer.getvalue(), "jpg")
+    return variants
+
+
+class AvatarStorage(ABC):
+    """Інтерфейс сховища аватарів. Методи блокуючі - викликаються з пулу потоків."""
+
+    @abstractmethod
+    def find(self, key: str) -> Optional[str]:
+        """URL уже збереженого аватара з цим ключем або None."""
+
+    @abstractmethod
+    def save(self, key: str, variants: Dict[str, Variant]) -> str:
+        """Збереження всіх варіантів; повертає URL основного (найбільшого) варіанта."""
+
+
+class CloudinaryStorage(AvatarStorage):
+    """
+    Сховище в Cloudinary; public_id варіанта - '<key>_<size>'. SDK налаштовується під час першого звернення.
+    Відповідність хеш -> URL запам'ятовується в процесі, а не запитується через Admin API
+    (він має жорсткий ліміт запитів); невідомий хеш завантажується з overwrite=False,
+    тож наявний ресурс Cloudinary не перезаписується.
+    """
+
+    def __init__(self, folder: str = "avatars", known_keys: int = AVATAR_KNOWN_KEYS):
+        self.folder = folder
+        self._configured = False
+        self._urls = TTLCache(maxsize=known_keys, ttl=float("inf"))
+
+    def _configure(self) -> None:
+        if not self._configured:
+            import cloudinary
+
+            from settings import get_settings
+
+            settings = get_settings()
+            cloudinary.config(
+                cloud_name=settings.cloudinary_cloud_name,
+                api_key=settings.cloudinary_api_key,
+                api_secret=settings.cloudinary_api_secret,
+            )
+            self._configured = True
+
+    def _public_id(self, key: str, name: str) -> str:
+        return f"{self.folder}/{key}_{name}"
+
+    def find(self, key: str) -> Optional[str]:
+        return self._urls.get(key)
+
+    def save(self, key: str, variants: Dict[str, Variant]) -> str:
+        import cloudinary.uploader
+
+        self._configure()
+        urls = {}
+        for name, (content, _) in variants.items():
+            result = cloudinary.uploader.upload(io.BytesIO(content), public_id=self._public_id(key, name), overwrite=False)
+            urls[name] = result["secure_url"]
+        url = urls[main_variant(variants)]
+        self._urls.set(key, url)
+        return url
+
+
+class LocalStorage(AvatarStorage):
+    """Сховище на локальному диску (для тестів та офлайн-роботи)."""
+
+    def __init__(self, root: str = AVATAR_LOCAL_DIR, base_url: str = AVATAR_BASE_URL):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _main_file(self, key: str) -> Optional[str]:
+        # Можливі імена основного варіанта відомі заздалегідь (process_image) - без перегляду каталогу
+        candidates = (f"{key}_{max(AVATAR_SIZES)}.jpg", f"{key}_{max(AVATAR_SIZES)}.png")
+        return next((name for name in candidates if os.path.isfile(os.path.join(self.root, name))), None)
+
+    def path(self, name: str) -> Optional[str]:
+        """Шлях до файлу аватара за іменем з URL (None - недопустиме ім'я або файлу немає)."""
+        if not AVATAR_FILE_NAME.match(name):
+            return None
+        path = os.path.join(self.root, name)
+        return path if os.path.isfile(path) else None
+
+    def find(self, key: str) -> Optional[str]:
+        name = self._main_file(key)
+        return f"{self.base_url}/{name}" if name else None
+
+    def save(self, key: str, variants: Dict[str, Variant]) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        main = main_variant(variants)
+        # Основний варіант записується останнім: його наявність означає, що збережено всі
+        for name in sorted(variants, key=lambda name: name == main):
+            content, extension = variants[name]
+            path = os.path.join(self.root, f"{key}_{name}.{extension}")
+            # Запис у тимчасовий файл і атомарне перейменування
+            with open(path + ".tmp", "wb") as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+        return f"{self.base_url}/{key}_{main}.{variants[main][1]}"
+
+
+def main_variant(variants: Dict[str, Variant]) -> str:
+    """Назва найбільшого варіанта."""
+    return max(variants, key=int)
+
+
+STORAGE_BACKENDS = {
+    "cloudinary": CloudinaryStorage,
+    "local": LocalStorage,
+}
+
+
+class AvatarPipeline:
+    """Обробка і збереження аватарів з дедуплікацією за хешем вмісту."""
+
+    def __init__(self, storage: Optional[AvatarStorage] = None, workers: int = AVATAR_WORKERS):
+        self._storage = storage
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def storage(self) -> AvatarStorage:
+        if self._storage is None:
+            self._storage = STORAGE_BACKENDS[AVATAR_STORAGE]()
+        return self._storage
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def store(self, data: bytes) -> str:
+        """Повертає URL аватара; ідентичне зображення, що вже є у сховищі, не завантажується повторно."""
+        key = hashlib.sha256(data).hexdigest()
+        url = await run_in_threadpool(self.storage.find, key)
+        if url:
+            logger.info(f"Аватар {key} уже є у сховищі")
+            return url
+        try:
+            variants = await asyncio.get_running_loop().run_in_executor(self.executor, process_image, data)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return await run_in_threadpool(self.storage.save, key, variants)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+avatar_pipeline = AvatarPipeline()
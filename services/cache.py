@@ -0,0 +1,122 @@
+"""
+Внутрішньопроцесний кеш автентифікованих користувачів.
+Зберігає розібрані JWT-claims за токеном та легкі знімки користувачів за email,
+щоб get_current_user не звертався до бази даних на кожен запит.
+invalidate_user діє лише в поточному процесі; інші процеси скидають знімок після
+скидання пароля під час синхронізації services.revocation (до REVOCATION_SYNC_INTERVAL).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timezone
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """Обмежений LRU-кеш із часом життя записів та лічильниками влучань/промахів."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Повертає значення за ключем або None, якщо його немає чи строк дії минув."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Зберігає значення; найдавніше використаний запис витісняється при переповненні."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Видаляє запис за ключем."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Очищає кеш і лічильники."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Повертає лічильники влучань/промахів та поточний розмір кешу."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """
+    Легкий знімок користувача, що повертається з get_current_user.
+
+    Attributes:
+        id (int): Unique identifier for the user.
+        email (str): Email address of the user.
+        avatar_url (str | None): URL of the user's avatar.
+        is_verified (bool): Indicates if the email is verified.
+        tokens_valid_after (float | None): Unix time of the last password reset; earlier tokens are rejected.
+    """
+    id: int
+    email: str
+    avatar_url: Optional[str] = None
+    is_verified: bool = False
+    tokens_valid_after: Optional[float] = None
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        cutoff = user.tokens_valid_after
+        return cls(
+            id=user.id,
+            email=user.email,
+            avatar_url=user.avatar_url,
+            is_verified=bool(user.is_verified),
+            tokens_valid_after=cutoff.replace(tzinfo=timezone.utc).timestamp() if cutoff else None,
+        )
+
+    def accepts(self, payload: dict) -> bool:
+        """Чи виданий токен після останнього скидання пароля (iat не раніше за межу)."""
+        return self.tokens_valid_after is None or payload.get("iat", 0) >= self.tokens_valid_after
+
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+
+# Розібрані claims за токеном та знімки користувачів за email (sub)
+token_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def invalidate_user(email: str) -> None:
+    """Скидає закешований знімок користувача після зміни його даних."""
+    user_cache.invalidate(email)
+
+
+def cache_stats() -> dict:
+    """Лічильники обох кешів для моніторингу."""
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
@@ -0,0 +1,132 @@
+"""
+Стиснення відповідей за Accept-Encoding (zstd, br, gzip).
+Стискаються лише JSON/текстові відповіді, більші за COMPRESSION_MIN_SIZE; великі тіла
+стискаються в пулі потоків, щоб не блокувати цикл подій. Потокові відповіді (експорт)
+та вже закодовані відповіді передаються без змін.
+zstd і brotli - необов'язкові залежності (zstandard, brotli); gzip є завжди.
+"""
+
+import gzip
+import os
+from typing import Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # необов'язкова залежність
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # необов'язкова залежність
+    zstandard = None
+
+# Менші тіла не варті накладних витрат (і заголовків) стиснення
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+# Тіла від цього розміру стискаються в пулі потоків
+COMPRESSION_THREADPOOL_SIZE = int(os.getenv("COMPRESSION_THREADPOOL_SIZE", 128 * 1024))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain")
+
+
+def _encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    """Доступні кодування в порядку переваги сервера."""
+    encoders = {}
+    if zstandard is not None:
+        encoders["zstd"] = lambda body: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if brotli is not None:
+        encoders["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+    encoders["gzip"] = lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return encoders
+
+
+ENCODERS = _encoders()
+
+
+def negotiate(accept_encoding: str, encoders: Dict[str, Callable] = ENCODERS) -> Optional[str]:
+    """Кодування з найбільшим q серед підтримуваних; за рівних q - за перевагою сервера."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for name in encoders:
+        q = weights.get(name, 0.0)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware:
+    """Чистий ASGI-проміжний шар; ETag стиснутої відповіді стає слабким (інше представлення)."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, threadpool_size: int = COMPRESSION_THREADPOOL_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.threadpool_size = threadpool_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                # Нестискані й уже закодовані відповіді не чекають на тіло
+                if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES) or "content-encoding" in headers:
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if passthrough or start is None:
+                await send(message)
+                return
+            if message["type"] != "http.response.body":
+                # Напр. http.response.pathsend: відкладений start іде першим без змін
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=list(start.get("headers", [])))
+            headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            # Потокові відповіді та малі тіла - без змін
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                passthrough = True
+                await send({**start, "headers": headers.raw})
+                await send(message)
+                return
+
+            encode = ENCODERS[encoding]
+            body = await run_in_threadpool(encode, body) if len(body) >= self.threadpool_size else encode(body)
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(body))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["etag"] = "W/" + etag
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,259 @@
+"""
+Пошук контактів-дублікатів.
+Телефон нормалізується до E.164, ім'я - до ключа без регістру, діакритики, пунктуації
+та порядку слів; обидва зберігаються в індексованих колонках contacts. Кандидати
+порівнюються лише всередині блоку з однаковим ключем (рядки читаються потоком,
+відсортованими за індексом (owner_id, ключ)), тож прохід майже лінійний за кількістю
+контактів. Працює фоновий воркер (manage.py dedup-worker): він обробляє лише власників,
+чия contacts_revision змінилася після попереднього проходу, і зберігає оцінені пари
+в contact_duplicates. Перший прохід власника (contacts_dedup_revision = 0) обчислює ключі
+для всіх контактів; власників, чиї контакти створено до появи ревізій, ставить у чергу
+manage.py migrate (mark_unkeyed_owners).
+"""
+
+import asyncio
+import logging
+import os
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, exists, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import models
+
+logger = logging.getLogger(__name__)
+
+# Код країни для номерів без міжнародного префікса (0XX XXX XX XX -> +380XX XXX XX XX)
+DEFAULT_PHONE_COUNTRY_CODE = os.getenv("DEFAULT_PHONE_COUNTRY_CODE", "380")
+# Більші блоки (спільний телефон офісу, порожнє ім'я) не розрізняють людей і дають квадратичну кількість пар
+DEDUP_MAX_BLOCK_SIZE = int(os.getenv("DEDUP_MAX_BLOCK_SIZE", 50))
+DEDUP_MIN_SCORE = float(os.getenv("DEDUP_MIN_SCORE", 0.5))
+DEDUP_BATCH_SIZE = int(os.getenv("DEDUP_BATCH_SIZE", 1000))
+DEDUP_POLL_INTERVAL = float(os.getenv("DEDUP_POLL_INTERVAL", 30))
+
+NON_DIGITS = re.compile(r"\D")
+
+# Колонки, потрібні для оцінки пари
+SCORE_COLUMNS = (
+    models.Contact.id,
+    models.Contact.email,
+    models.Contact.birthday,
+    models.Contact.phone_e164,
+    models.Contact.name_key,
+)
+
+
+def normalize_phone(raw: Optional[str], country_code: str = DEFAULT_PHONE_COUNTRY_CODE) -> Optional[str]:
+    """Номер у форматі E.164 (+<код країни><номер>) або None, якщо це не схоже на номер."""
+    if not raw:
+        return None
+    raw = raw.strip()
+    digits = NON_DIGITS.sub("", raw)
+    if raw.startswith("+"):
+        number = digits
+    elif digits.startswith("00"):
+        number = digits[2:]
+    elif digits.startswith(country_code) and len(digits) > 10:
+        number = digits
+    else:
+        # Національний формат: префікс 0 замінюється кодом країни
+        number = country_code + digits.removeprefix("0")
+    return "+" + number if 8 <= len(number) <= 15 else None
+
+
+def _normalize_name(value: Optional[str]) -> str:
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    return "".join(char for char in decomposed if char.isalnum()).casefold()
+
+
+def name_key(first_name: Optional[str], last_name: Optional[str]) -> Optional[str]:
+    """Ключ імені, однаковий для "Іван Петренко", "ПЕТРЕНКО іван" та "Petrenko-Ivan"."""
+    parts = sorted(part for part in (_normalize_name(first_name), _normalize_name(last_name)) if part)
+    return " ".join(parts) or None
+
+
+def score_pair(a, b) -> float:
+    """Оцінка від 0 до 1: телефон і ім'я важать найбільше, день народження та email підтверджують."""
+    score = 0.0
+    if a.phone_e164 and a.phone_e164 == b.phone_e164:
+        score += 0.45
+    if a.name_key and a.name_key == b.name_key:
+        score += 0.35
+    elif a.name_key and b.name_key:
+        score += 0.25 * SequenceMatcher(None, a.name_key, b.name_key).ratio()
+    if a.birthday and a.birthday == b.birthday:
+        score += 0.15
+    if a.email and b.email and a.email.partition("@")[0].casefold() == b.email.partition("@")[0].casefold():
+        score += 0.05
+    return round(score, 3)
+
+
+def block_pairs(block: list, max_block_size: int = DEDUP_MAX_BLOCK_SIZE) -> Iterator[tuple]:
+    """Усі пари всередині блоку (порожньо для блоку з одного рядка або завеликого блоку)."""
+    if len(block) > max_block_size:
+        return
+    for i, a in enumerate(block):
+        for b in block[i + 1:]:
+            yield a, b
+
+
+async def mark_unkeyed_owners(db: AsyncSession) -> int:
+    """
+    Бекфіл для контактів, створених до появи ревізій: у таких власників contacts_revision = 0,
+    тож воркер їх не бачить. Збільшена ревізія ставить власника в чергу на перший прохід.
+    """
+    has_contacts = exists().where(models.Contact.owner_id == models.User.id, models.Contact.deleted_at.is_(None))
+    result = await db.execute(
+        update(models.User)
+        .where(models.User.contacts_revision == 0, models.User.contacts_dedup_revision == 0, has_contacts)
+        .values(contacts_revision=models.User.contacts_revision + 1)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+class DedupWorker:
+    """Фоновий воркер: ключі блокування, пари кандидатів та їхні оцінки."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        batch_size: int = DEDUP_BATCH_SIZE,
+        max_block_size: int = DEDUP_MAX_BLOCK_SIZE,
+        min_score: float = DEDUP_MIN_SCORE,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_block_size = max_block_size
+        self.min_score = min_score
+
+    async def refresh_keys(self, db: AsyncSession, owner_id: int, since_revision: int) -> int:
+        """Ключі для контактів, змінених після since_revision; оновлення порціями по batch_size."""
+        table = models.Contact.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("contact_id"))
+            # Службове оновлення: updated_at, версія і ревізія контакту не змінюються
+            .values(phone_e164=bindparam("phone_e164"), name_key=bindparam("name_key"), updated_at=table.c.updated_at)
+        )
+        updated, last_id = 0, 0
+        # Keyset-порції за id: читання і оновлення не перемежовуються на одному курсорі
+        while True:
+            rows = (
+                await db.execute(
+                    select(models.Contact.id, models.Contact.first_name, models.Contact.last_name, models.Contact.phone_number)
+                    .where(
+                        models.Contact.owner_id == owner_id,
+                        models.Contact.revision > since_revision,
+                        models.Contact.deleted_at.is_(None),
+                        models.Contact.id > last_id,
+                    )
+                    .order_by(models.Contact.id)
+                    .limit(self.batch_size)
+                )
+            ).all()
+            if not rows:
+                break
+            params = [
+                {
+                    "contact_id": contact_id,
+                    "phone_e164": normalize_phone(phone_number),
+                    "name_key": name_key(first_name, last_name),
+                }
+                for contact_id, first_name, last_name, phone_number in rows
+            ]
+            await db.execute(stmt, params)
+            updated += len(params)
+            last_id = rows[-1].id
+        return updated
+
+    async def find_candidates(self, db: AsyncSession, owner_id: int) -> Dict[Tuple[int, int], float]:
+        """Пари з оцінкою не нижче min_score; блоки читаються потоком за індексом (owner_id, ключ)."""
+        candidates: Dict[Tuple[int, int], float] = {}
+        for key in (models.Contact.phone_e164, models.Contact.name_key):
+            rows = await db.stream(
+                select(*SCORE_COLUMNS)
+                .where(models.Contact.owner_id == owner_id, models.Contact.deleted_at.is_(None), key.is_not(None))
+                .order_by(key, models.Contact.id)
+                .execution_options(yield_per=self.batch_size)
+            )
+            block, block_key = [], None
+            async for row in rows:
+                value = getattr(row, key.key)
+                if value != block_key:
+                    self._score_block(block, candidates)
+                    block, block_key = [], value
+                block.append(row)
+            self._score_block(block, candidates)
+        return candidates
+
+    def _score_block(self, block: list, candidates: Dict[Tuple[int, int], float]) -> None:
+        if len(block) > self.max_block_size:
+            logger.info(f"Пропущено блок дублікатів із {len(block)} контактів")
+        for a, b in block_pairs(block, self.max_block_size):
+            pair = (a.id, b.id)
+            if pair not in candidates:
+                score = score_pair(a, b)
+                if score >= self.min_score:
+                    candidates[pair] = score
+
+    async def process_owner(self, db: AsyncSession, owner_id: int) -> int:
+        """Повний прохід для власника; повертає кількість знайдених пар."""
+        revision, dedup_revision = (
+            await db.execute(
+                select(models.User.contacts_revision, models.User.contacts_dedup_revision).where(models.User.id == owner_id)
+            )
+        ).one()
+        # Перший прохід охоплює й контакти з ревізією 0 (створені до появи ревізій)
+        await self.refresh_keys(db, owner_id, dedup_revision if dedup_revision else -1)
+        candidates = await self.find_candidates(db, owner_id)
+
+        await db.execute(delete(models.ContactDuplicate).where(models.ContactDuplicate.owner_id == owner_id))
+        rows = [
+            {"owner_id": owner_id, "contact_id": contact_id, "duplicate_id": duplicate_id, "score": score}
+            for (contact_id, duplicate_id), score in candidates.items()
+        ]
+        for start in range(0, len(rows), self.batch_size):
+            await db.execute(insert(models.ContactDuplicate), rows[start:start + self.batch_size])
+        # Зміни після читання revision мають більшу ревізію і потраплять у наступний прохід
+        await db.execute(
+            update(models.User)
+            .where(models.User.id == owner_id)
+            .values(contacts_dedup_revision=revision)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return len(rows)
+
+    async def pending_owners(self, db: AsyncSession, limit: int) -> List[int]:
+        stmt = (
+            select(models.User.id)
+            .where(models.User.contacts_revision > models.User.contacts_dedup_revision)
+            .order_by(models.User.id)
+            .limit(limit)
+        )
+        return list((await db.execute(stmt)).scalars().all())
+
+    async def drain_once(self, owners: int = 100) -> int:
+        """Обробка порції власників зі зміненими контактами; повертає кількість оброблених."""
+        async with self.session_factory() as db:
+            owner_ids = await self.pending_owners(db, owners)
+            for owner_id in owner_ids:
+                pairs = await self.process_owner(db, owner_id)
+                logger.info(f"Дублікати власника {owner_id}: {pairs} пар")
+            return len(owner_ids)
+
+    async def run(self, poll_interval: float = DEDUP_POLL_INTERVAL) -> None:
+        """Нескінченний цикл: поки є власники зі змінами - без паузи, інакше - очікування."""
+        while True:
+            try:
+                processed = await self.drain_once()
+            except Exception:
+                logger.exception("Помилка воркера дублікатів")
+                processed = 0
+            if not processed:
+                await asyncio.sleep(poll_interval)
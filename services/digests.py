@@ -0,0 +1,153 @@
+"""
+Щоденні листи з найближчими днями народження контактів.
+Користувачі обробляються порціями по batch_size за id: для порції дні народження
+обчислюються одним запитом за birthday_key, групуються за власником і рендеряться
+в листи. Листи порції додаються до email_outbox разом із контрольною точкою
+(останній оброблений власник) в одній транзакції, а dedup_key листа (дата + власник) не дає поставити той самий
+дайджест удруге - перезапуск після збою продовжує з контрольної точки без повторних
+листів. Надсилає OutboxWorker через пул повторно використовуваних SMTP-з'єднань.
+"""
+
+import logging
+import os
+from datetime import date, datetime
+from itertools import groupby
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, or_, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud
+import models
+from services.outbox import PENDING
+
+logger = logging.getLogger(__name__)
+
+DIGEST_DAYS = int(os.getenv("BIRTHDAY_DIGEST_DAYS", 7))
+DIGEST_BATCH_SIZE = int(os.getenv("BIRTHDAY_DIGEST_BATCH_SIZE", 500))
+DIGEST_SUBJECT = "Найближчі дні народження ваших контактів"
+
+
+def checkpoint_name(today: date) -> str:
+    return f"birthday-digest:{today.isoformat()}"
+
+
+def render_digest(entries: List[tuple], today: date) -> str:
+    """Текст листа: entries - (ім'я, прізвище, дата дня народження), відсортовані за датою."""
+    lines = ["Найближчі дні народження:", ""]
+    for first_name, last_name, birthday in entries:
+        days = (birthday - today).days
+        when = "сьогодні" if days == 0 else "завтра" if days == 1 else f"через {days} дн."
+        lines.append(f"- {birthday:%d.%m} ({when}): {first_name} {last_name}")
+    return "\n".join(lines)
+
+
+async def upcoming_birthdays_by_owner(
+    db: AsyncSession, today: date, days: int, after_owner: int = 0, last_owner: Optional[int] = None
+) -> Dict[int, dict]:
+    """
+    Один запит для підтверджених користувачів з after_owner < id <= last_owner:
+    {owner_id: {"email": ..., "entries": [(ім'я, прізвище, дата), ...]}} у порядку owner_id.
+    """
+    ranges = crud.birthday_key_ranges(today, days)
+    start_key = ranges[0][0]
+    query = (
+        select(
+            models.Contact.owner_id,
+            models.User.email,
+            models.Contact.first_name,
+            models.Contact.last_name,
+            models.Contact.birthday,
+        )
+        .join(models.User, models.User.id == models.Contact.owner_id)
+        .where(
+            models.User.is_verified.is_(True),
+            models.Contact.owner_id > after_owner,
+            models.Contact.owner_id <= last_owner if last_owner is not None else true(),
+            models.Contact.deleted_at.is_(None),
+            or_(*[models.Contact.birthday_key.between(low, high) for low, high in ranges]),
+        )
+        .order_by(
+            models.Contact.owner_id,
+            case((models.Contact.birthday_key >= start_key, 0), else_=1),
+            models.Contact.birthday_key,
+            models.Contact.id,
+        )
+    )
+    rows = (await db.execute(query)).all()
+    digests = {}
+    for owner_id, group in groupby(rows, key=lambda row: row.owner_id):
+        group = list(group)
+        digests[owner_id] = {
+            "email": group[0].email,
+            "entries": [(row.first_name, row.last_name, crud.next_birthday(row.birthday, today)) for row in group],
+        }
+    return digests
+
+
+async def next_owners(db: AsyncSession, after_owner: int, limit: int) -> List[int]:
+    """Наступна порція підтверджених користувачів за id (keyset)."""
+    stmt = (
+        select(models.User.id)
+        .where(models.User.is_verified.is_(True), models.User.id > after_owner)
+        .order_by(models.User.id)
+        .limit(limit)
+    )
+    return list((await db.execute(stmt)).scalars().all())
+
+
+async def get_checkpoint(db: AsyncSession, name: str) -> int:
+    position = (await db.execute(select(models.JobCheckpoint.position).where(models.JobCheckpoint.name == name))).scalar()
+    return position or 0
+
+
+async def enqueue_birthday_digests(
+    db: AsyncSession,
+    today: Optional[date] = None,
+    days: int = DIGEST_DAYS,
+    batch_size: int = DIGEST_BATCH_SIZE,
+) -> int:
+    """Ставить у чергу дайджести за день today; повертає кількість нових листів."""
+    today = today or date.today()
+    name = checkpoint_name(today)
+    after_owner = await get_checkpoint(db, name)
+    if after_owner:
+        logger.info(f"Дайджести за {today}: продовження після власника {after_owner}")
+
+    insert = crud.INSERT_BY_DIALECT[db.get_bind().dialect.name]
+    enqueued = 0
+    # У пам'яті - лише одна порція власників
+    while owner_ids := await next_owners(db, after_owner, batch_size):
+        last_owner = owner_ids[-1]
+        digests = await upcoming_birthdays_by_owner(db, today, days, after_owner, last_owner)
+        messages = [
+            {
+                "recipient": digest["email"],
+                "subject": DIGEST_SUBJECT,
+                "body": render_digest(digest["entries"], today),
+                "dedup_key": f"{name}:{owner_id}",
+                "status": PENDING,
+                "attempts": 0,
+                "next_attempt_at": datetime.utcnow(),
+                "created_at": datetime.utcnow(),
+            }
+            for owner_id, digest in digests.items()
+        ]
+        if messages:
+            result = await db.execute(
+                insert(models.OutboxMessage)
+                .values(messages)
+                .on_conflict_do_nothing(index_elements=["dedup_key"])
+                .returning(models.OutboxMessage.id)
+            )
+            enqueued += len(result.scalars().all())
+        # Контрольна точка комітиться разом із листами порції
+        checkpoint = {"name": name, "position": last_owner, "updated_at": datetime.utcnow()}
+        await db.execute(
+            insert(models.JobCheckpoint)
+            .values(checkpoint)
+            .on_conflict_do_update(index_elements=["name"], set_={"position": checkpoint["position"], "updated_at": checkpoint["updated_at"]})
+        )
+        await db.commit()
+        after_owner = last_owner
+    return enqueued
@@ -0,0 +1,57 @@
+"""
+ETag та умовні запити для контактів.
+ETag контакту - його id і версія (If-Match для оптимістичного блокування);
+ETag списку - ревізія контактів власника разом із власником і параметрами запиту, тож
+If-None-Match перевіряється одним пошуком за первинним ключем до основного запиту.
+Відповіді залежать від користувача, тому мають Vary: Authorization.
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+# Клієнт зберігає відповідь, але перед використанням перепитує сервер
+CACHE_CONTROL = "private, no-cache"
+# Спільний кеш (браузер, клієнтська бібліотека) не має віддавати відповідь іншому користувачу
+VARY = "Authorization"
+
+
+def contact_etag(contact) -> str:
+    # Лише версія дала б "v1" кожному новому контакту - id робить тег унікальним
+    return f'"{contact.id}-v{contact.version}"'
+
+
+def collection_etag(owner_id: int, revision: int, request: Request) -> str:
+    """
+    Сторінки з різними параметрами - різні представлення, тому query входить до ETag;
+    власник теж, інакше ETag іншого користувача з тією самою ревізією дав би 304.
+    """
+    query = hashlib.blake2s(f"{owner_id}:{request.query_params}".encode(), digest_size=6).hexdigest()
+    return f'"r{revision}-{query}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабке порівняння для If-None-Match (RFC 9110, 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": VARY}
+    )
+
+
+def if_match_version(if_match: Optional[str], contact_id: int) -> Optional[int]:
+    """Очікувана версія з заголовка If-Match (None - без перевірки); тег іншого контакту дає 412."""
+    if not if_match or if_match.strip() == "*":
+        return None
+    tag = if_match.split(",")[0].strip().removeprefix("W/").strip('"')
+    prefix = f"{contact_id}-v"
+    if not tag.startswith(prefix) or not tag[len(prefix):].isdigit():
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Invalid If-Match header")
+    return int(tag[len(prefix):])
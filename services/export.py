@@ -0,0 +1,56 @@
+"""
+Потоковий експорт контактів у NDJSON або CSV.
+Рядки читаються серверним курсором порціями і одразу кодуються,
+тож пам'ять не залежить від розміру адресної книги.
+"""
+
+import csv
+import io
+import json
+from typing import AsyncIterator, Mapping, Sequence
+
+# Колонки експорту в порядку виведення
+EXPORT_FIELDS = ("id", "first_name", "last_name", "email", "phone_number", "birthday", "additional_info")
+
+# Кількість рядків, що кодуються в один фрагмент відповіді
+EXPORT_CHUNK_ROWS = 1000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+async def ndjson_chunks(rows: AsyncIterator[Mapping], fields: Sequence[str] = EXPORT_FIELDS) -> AsyncIterator[str]:
+    """Кодування рядків у NDJSON (один JSON-об'єкт на рядок)."""
+    buffer = []
+    async for row in rows:
+        buffer.append(json.dumps({name: row[name] for name in fields}, ensure_ascii=False, default=str))
+        if len(buffer) >= EXPORT_CHUNK_ROWS:
+            yield "\n".join(buffer) + "\n"
+            buffer = []
+    if buffer:
+        yield "\n".join(buffer) + "\n"
+
+
+async def csv_chunks(rows: AsyncIterator[Mapping], fields: Sequence[str] = EXPORT_FIELDS) -> AsyncIterator[str]:
+    """Кодування рядків у CSV із заголовком."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    count = 0
+    async for row in rows:
+        writer.writerow([row[name] for name in fields])
+        count += 1
+        if count >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    yield buffer.getvalue()
+
+
+ENCODERS = {
+    "ndjson": ndjson_chunks,
+    "csv": csv_chunks,
+}
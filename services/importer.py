@@ -0,0 +1,141 @@
+"""
+Масовий імпорт контактів із JSON-масиву, CSV або vCard.
+Рядки валідуються порціями через schemas.ContactCreate і вставляються
+багаторядковим INSERT ... ON CONFLICT DO NOTHING на кожну порцію.
+"""
+
+import csv
+import io
+import os
+from datetime import datetime
+from itertools import islice
+from typing import IO, Iterable, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+import crud
+import schemas
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+
+# Поля контакту, що очікуються у вхідних рядках
+IMPORT_FIELDS = ("first_name", "last_name", "email", "phone_number", "birthday", "additional_info")
+
+
+def csv_rows(file: IO[bytes]) -> Iterator[dict]:
+    """Читання рядків CSV із заголовком; порожні значення вважаються відсутніми."""
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        yield {key.strip(): value for key, value in row.items() if key and value not in (None, "")}
+
+
+def _vcard_date(value: str) -> str:
+    value = value.strip()
+    for fmt in ("%Y-%m-%d", "%Y%m%d"):
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            pass
+    return value
+
+
+def _vcard_lines(file: IO[bytes]) -> Iterator[str]:
+    """Рядки vCard з розгорнутими продовженнями (рядки, що починаються з пробілу)."""
+    current = None
+    for line in io.TextIOWrapper(file, encoding="utf-8-sig"):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def vcard_rows(file: IO[bytes]) -> Iterator[dict]:
+    """Розбір vCard (BEGIN:VCARD ... END:VCARD) у словники полів контакту."""
+    card = None
+    for line in _vcard_lines(file):
+        name, _, value = line.partition(":")
+        prop = name.split(";", 1)[0].upper()
+        if prop == "BEGIN":
+            card = {}
+        elif prop == "END":
+            if card is not None:
+                yield card
+            card = None
+        elif card is None:
+            continue
+        elif prop == "N":
+            parts = value.split(";")
+            card["last_name"] = parts[0]
+            if len(parts) > 1:
+                card["first_name"] = parts[1]
+        elif prop == "FN" and "first_name" not in card:
+            first, _, last = value.partition(" ")
+            card.setdefault("first_name", first)
+            card.setdefault("last_name", last)
+        elif prop == "EMAIL":
+            card.setdefault("email", value)
+        elif prop == "TEL":
+            card.setdefault("phone_number", value)
+        elif prop == "BDAY":
+            card["birthday"] = _vcard_date(value)
+        elif prop == "NOTE":
+            card["additional_info"] = value.replace("\\n", "\n").replace("\\,", ",")
+
+
+def validate_batch(rows: Iterable[Tuple[int, dict]]) -> Tuple[List[Tuple[int, dict]], List[schemas.ImportRowError]]:
+    """Валідація порції рядків; повертає (валідні значення, помилки по рядках)."""
+    valid, errors = [], []
+    for number, row in rows:
+        try:
+            contact = schemas.ContactCreate(**{key: row.get(key) for key in IMPORT_FIELDS if key in row})
+        except (ValidationError, TypeError) as e:
+            message = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            ) if isinstance(e, ValidationError) else str(e)
+            errors.append(schemas.ImportRowError(row=number, error=message))
+            continue
+        valid.append((number, contact.dict()))
+    return valid, errors
+
+
+async def import_contacts(
+    db: AsyncSession,
+    owner_id: int,
+    rows: Iterable[dict],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    transaction: str = "batch",
+) -> schemas.ImportReport:
+    """
+    Імпорт рядків порціями.
+    transaction="batch" фіксує кожну порцію окремо, "all" - один коміт на весь імпорт.
+    """
+    numbered = enumerate(rows, start=1)
+    report = schemas.ImportReport()
+    try:
+        while True:
+            # Читання джерела (файл або список) - у пулі потоків, щоб не блокувати цикл подій
+            chunk = await run_in_threadpool(list, islice(numbered, batch_size))
+            if not chunk:
+                break
+            valid, errors = validate_batch(chunk)
+            report.errors.extend(errors)
+            inserted, conflicts = await crud.bulk_create_contacts(db, valid, owner_id)
+            report.inserted += inserted
+            report.errors.extend(conflicts)
+            if transaction == "batch":
+                await db.commit()
+        if transaction == "all":
+            await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    report.errors.sort(key=lambda error: error.row)
+    report.failed = len(report.errors)
+    return report
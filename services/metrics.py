@@ -0,0 +1,155 @@
+"""
+Метрики запитів у форматі Prometheus.
+ASGI-проміжний шар рахує для кожного шаблону маршруту (/contacts/{contact_id}, а не
+сирого шляху) гістограму затримок, лічильники кодів відповіді та розміри запитів
+і відповідей; окремо - кількість запитів в обробці.
+Лічильники маршруту створюються один раз із заздалегідь виділеними кошиками гістограми,
+тож обробка запиту лише збільшує числа. Метрики рахуються в межах процесу.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Межі кошиків гістограми затримок, секунди
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Мітка для запитів, що не збіглися з жодним маршрутом (404, CORS preflight тощо)
+UNMATCHED_ROUTE = "<unmatched>"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RouteMetrics:
+    """Лічильники одного маршруту (метод + шаблон шляху)."""
+
+    __slots__ = ("buckets", "latency_sum", "count", "statuses", "request_bytes", "response_bytes")
+
+    def __init__(self):
+        # Останній кошик - +Inf
+        self.buckets: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.count = 0
+        self.statuses: Dict[int, int] = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def observe(self, latency: float, status: int, request_bytes: int, response_bytes: int) -> None:
+        self.buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        self.latency_sum += latency
+        self.count += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+
+
+class MetricsRegistry:
+    """Лічильники всіх маршрутів і додаткові колектори (наприклад, статистика кешу)."""
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.in_flight = 0
+        self.collectors: List[Callable[[], List[str]]] = []
+
+    def route(self, method: str, path: str) -> RouteMetrics:
+        metrics = self.routes.get((method, path))
+        if metrics is None:
+            metrics = self.routes[(method, path)] = RouteMetrics()
+        return metrics
+
+    def render(self) -> str:
+        """Текстовий формат експозиції Prometheus."""
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being processed.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_request_duration_seconds Request latency by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        routes = sorted(self.routes.items())
+        for (method, path), metrics in routes:
+            labels = f'method="{method}",route="{escape(path)}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), metrics.buckets):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {metrics.latency_sum}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {metrics.count}")
+        lines += ["# HELP http_requests_total Requests by route and status code.", "# TYPE http_requests_total counter"]
+        for (method, path), metrics in routes:
+            labels = f'method="{method}",route="{escape(path)}"'
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append(f'http_requests_total{{{labels},status="{status}"}} {count}')
+        for name, attribute, help_text in (
+            ("http_request_size_bytes_total", "request_bytes", "Request body bytes by route."),
+            ("http_response_size_bytes_total", "response_bytes", "Response body bytes by route."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (method, path), metrics in routes:
+                lines.append(f'{name}{{method="{method}",route="{escape(path)}"}} {getattr(metrics, attribute)}')
+        for collector in self.collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+class MetricsMiddleware:
+    """Чистий ASGI-проміжний шар (без BaseHTTPMiddleware, щоб не буферизувати потокові відповіді)."""
+
+    def __init__(self, app, registry: Optional["MetricsRegistry"] = None):
+        self.app = app
+        self.registry = registry or metrics_registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        started = time.perf_counter()
+        # [статус, байти запиту, байти відповіді] - один список на запит
+        counters = [500, 0, 0]
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                counters[1] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                counters[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                counters[2] += len(message.get("body", b""))
+            await send(message)
+
+        registry.in_flight += 1
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            registry.in_flight -= 1
+            # Маршрутизатор записує знайдений маршрут у scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            registry.route(scope["method"], path).observe(
+                time.perf_counter() - started, counters[0], counters[1], counters[2]
+            )
+
+
+def cache_collector() -> List[str]:
+    """Лічильники кешів токенів і користувачів."""
+    from services.cache import cache_stats
+
+    lines = []
+    for metric, kind in (("hits", "counter"), ("misses", "counter"), ("size", "gauge")):
+        name = f"cache_{metric}" + ("_total" if kind == "counter" else "")
+        lines += [f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{cache="{cache}"}} {stats[metric]}' for cache, stats in cache_stats().items()]
+    return lines
+
+
+metrics_registry = MetricsRegistry()
+metrics_registry.collectors.append(cache_collector)
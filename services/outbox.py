@@ -0,0 +1,261 @@
+"""
+Черга вихідних листів (outbox) та фоновий відправник.
+Запит лише додає рядок у таблицю email_outbox; воркер забирає порції листів,
+надсилає їх через пул автентифікованих SMTP-з'єднань, повторює невдалі спроби
+з експоненційною затримкою та обмежує швидкість відправки на кожен домен.
+Параметри SMTP-сервера беруться з Settings під час створення пулу (старт воркера).
+"""
+
+import asyncio
+import logging
+import os
+import smtplib
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import models
+from settings import Settings, email_sender, get_settings
+
+logger = logging.getLogger(__name__)
+
+# Налаштування воркера
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 4))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 30))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 2))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", 300))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", 30))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", 3600))
+OUTBOX_DOMAIN_RATE = float(os.getenv("OUTBOX_DOMAIN_RATE", 5))  # листів на секунду
+OUTBOX_DOMAIN_BURST = int(os.getenv("OUTBOX_DOMAIN_BURST", 20))
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+
+async def enqueue_email(
+    db: AsyncSession,
+    recipient: str,
+    subject: str,
+    body: str,
+    dedup_key: Optional[str] = None,
+    commit: bool = True,
+) -> models.OutboxMessage:
+    """Додавання листа до черги - єдина робота, що виконується в межах запиту."""
+    message = models.OutboxMessage(recipient=recipient, subject=subject, body=body, dedup_key=dedup_key)
+    db.add(message)
+    if commit:
+        await db.commit()
+    return message
+
+
+def build_message(outbox_message: models.OutboxMessage, sender: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = outbox_message.recipient
+    message["Subject"] = outbox_message.subject
+    message.set_content(outbox_message.body)
+    return message
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Експоненційна затримка перед наступною спробою."""
+    return min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+
+
+class SMTPPool:
+    """Пул автентифікованих SMTP-з'єднань; блокуючі виклики smtplib виконуються в потоках."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        size: int = SMTP_POOL_SIZE,
+        timeout: float = SMTP_TIMEOUT,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.timeout = timeout
+        self.connects = 0
+        self._idle: list[smtplib.SMTP] = []
+        self._semaphore = asyncio.Semaphore(size)
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Settings] = None, **kwargs) -> "SMTPPool":
+        """Пул з параметрами сервера з Settings (за замовчуванням - поточних)."""
+        settings = settings or get_settings()
+        return cls(
+            host=settings.smtp_server,
+            port=settings.smtp_port,
+            user=settings.smtp_user,
+            password=settings.smtp_password,
+            starttls=settings.smtp_starttls,
+            **kwargs,
+        )
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.user:
+            connection.login(self.user, self.password)
+        self.connects += 1
+        return connection
+
+    def _send(self, connection: Optional[smtplib.SMTP], message: EmailMessage) -> smtplib.SMTP:
+        if connection is None:
+            connection = self._connect()
+        try:
+            connection.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Сервер закрив простоююче з'єднання - одна спроба перепідключитися
+            connection = self._connect()
+            connection.send_message(message)
+        return connection
+
+    @staticmethod
+    def _close(connection: smtplib.SMTP) -> None:
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+    async def send(self, message: EmailMessage) -> None:
+        async with self._semaphore:
+            connection = self._idle.pop() if self._idle else None
+            try:
+                connection = await asyncio.to_thread(self._send, connection, message)
+            except Exception:
+                if connection is not None:
+                    await asyncio.to_thread(self._close, connection)
+                raise
+            self._idle.append(connection)
+
+    async def close(self) -> None:
+        while self._idle:
+            await asyncio.to_thread(self._close, self._idle.pop())
+
+
+class DomainRateLimiter:
+    """Token bucket на кожен домен одержувача."""
+
+    def __init__(self, rate: float = OUTBOX_DOMAIN_RATE, burst: int = OUTBOX_DOMAIN_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def acquire(self, domain: str) -> float:
+        """Забирає токен; повертає 0, якщо лист можна надсилати, інакше - скільки секунд чекати."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(domain, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[domain] = (tokens - 1, now)
+            return 0.0
+        self._buckets[domain] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+
+class OutboxWorker:
+    """Фоновий воркер, що розвантажує email_outbox."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        pool: Optional[SMTPPool] = None,
+        limiter: Optional[DomainRateLimiter] = None,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        sender: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.pool = pool or SMTPPool.from_settings()
+        self.sender = sender or email_sender()
+        self.limiter = limiter or DomainRateLimiter()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+
+    async def claim_batch(self, db: AsyncSession) -> list[models.OutboxMessage]:
+        """
+        Бере порцію листів, що настав час надіслати, і відкладає їх на час оренди,
+        щоб інші воркери їх не взяли (на Postgres - з SKIP LOCKED).
+        """
+        now = datetime.utcnow()
+        due = (
+            select(models.OutboxMessage.id)
+            .where(models.OutboxMessage.status == PENDING, models.OutboxMessage.next_attempt_at <= now)
+            .order_by(models.OutboxMessage.next_attempt_at, models.OutboxMessage.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        claim = (
+            update(models.OutboxMessage)
+            .where(models.OutboxMessage.id.in_(due.scalar_subquery()))
+            .values(next_attempt_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS))
+            .returning(models.OutboxMessage)
+            .execution_options(synchronize_session=False)
+        )
+        messages = (await db.execute(claim)).scalars().all()
+        await db.commit()
+        return list(messages)
+
+    async def _deliver(self, message: models.OutboxMessage) -> dict:
+        now = datetime.utcnow()
+        wait = self.limiter.acquire(message.recipient.rpartition("@")[2].lower())
+        if wait:
+            return {"id": message.id, "next_attempt_at": now + timedelta(seconds=wait)}
+        try:
+            await self.pool.send(build_message(message, self.sender))
+        except Exception as e:
+            attempts = message.attempts + 1
+            logger.warning(f"Не вдалося надіслати лист {message.id} (спроба {attempts}): {e}")
+            return {
+                "id": message.id,
+                "attempts": attempts,
+                "last_error": str(e),
+                "status": FAILED if attempts >= self.max_attempts else PENDING,
+                "next_attempt_at": now + timedelta(seconds=backoff_seconds(attempts)),
+            }
+        return {"id": message.id, "status": SENT, "sent_at": datetime.utcnow()}
+
+    async def drain_once(self) -> int:
+        """Обробка однієї порції; повертає кількість взятих листів."""
+        async with self.session_factory() as db:
+            messages = await self.claim_batch(db)
+            if not messages:
+                return 0
+            results = await asyncio.gather(*(self._deliver(message) for message in messages))
+            # Оновлення за первинним ключем - один executemany на порцію
+            for keys in {tuple(sorted(result)) for result in results}:
+                rows = [result for result in results if tuple(sorted(result)) == keys]
+                await db.execute(update(models.OutboxMessage), rows)
+            await db.commit()
+            return len(messages)
+
+    async def run(self, poll_interval: float = OUTBOX_POLL_INTERVAL) -> None:
+        """Нескінченний цикл: повні порції обробляються одразу, інакше - пауза."""
+        try:
+            while True:
+                try:
+                    claimed = await self.drain_once()
+                except Exception:
+                    logger.exception("Помилка воркера outbox")
+                    claimed = 0
+                if claimed < self.batch_size:
+                    await asyncio.sleep(poll_interval)
+        finally:
+            await self.pool.close()
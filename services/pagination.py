@@ -0,0 +1,43 @@
+"""
+Непрозорі курсори для keyset-пагінації.
+Курсор - це base64url-кодований JSON-список значень ключа сортування останнього рядка сторінки.
+"""
+
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+# Очікуваний тип значення курсора: тип або кортеж типів (як в isinstance)
+CursorType = Union[type, Tuple[type, ...]]
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Кодування значень ключа сортування у непрозорий курсор."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _matches(value: Any, expected: CursorType) -> bool:
+    # bool - підклас int, але в курсорі не допускається
+    return isinstance(value, expected) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, size: int, types: Optional[Sequence[CursorType]] = None) -> List[Any]:
+    """
+    Розбір курсора; некоректний курсор призводить до 400.
+    types - очікувані типи значень: значення іншого типу не потрапляють у WHERE.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        values = None
+    if (
+        not isinstance(values, list)
+        or len(values) != size
+        or (types is not None and not all(_matches(value, expected) for value, expected in zip(values, types)))
+    ):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
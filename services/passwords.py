@@ -0,0 +1,104 @@
+"""
+Хешування та перевірка паролів поза циклом подій.
+bcrypt виконується в окремому обмеженому пулі потоків/процесів із лімітом черги;
+коли пул переповнений, запит отримує 503 замість того, щоб блокувати інші.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+# Налаштування вартості bcrypt та пулу
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 2))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", HASH_WORKERS * 4))
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "thread")  # thread | process
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context() -> CryptContext:
+    """Контекст bcrypt створюється під час першого хешування, а не під час імпорту."""
+    # min_rounds дорівнює поточній вартості, тож слабші хеші позначаються для оновлення
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+    )
+
+
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    return get_pwd_context().verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """Обмежений пул для bcrypt із back-pressure."""
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING, executor: str = HASH_EXECUTOR):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor_kind = executor
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Хешування пароля в пулі."""
+        return await self._submit(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+        """Перевірка пароля; другий елемент - новий хеш, якщо вартість потрібно підвищити."""
+        return await self._submit(_verify_and_update, password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
+
+
+def calibrate(target_ms: float, min_rounds: int = 4, max_rounds: int = 16) -> int:
+    """Підбір найбільшої кількості раундів bcrypt, що вкладається в target_ms на цьому хості."""
+    best = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds)
+        started = time.perf_counter()
+        context.hash("calibration-password")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms > target_ms:
+            break
+        best = rounds
+    return best
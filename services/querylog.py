@@ -0,0 +1,129 @@
+"""
+Інструментування SQL-запитів.
+Події рушія SQLAlchemy рахують для поточного запиту (contextvar) кількість виразів,
+сумарний час у базі та повтори однакових виразів (ознака N+1). Повільні вирази
+пишуться в лог, а assert_max_queries дозволяє тестам обмежити кількість запитів.
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# Скільки разів однаковий вираз може повторитися за запит, перш ніж це вважатиметься N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+
+
+class QueryStats:
+    """Статистика SQL-виразів одного запиту."""
+
+    __slots__ = ("count", "total_time", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        # Вирази з плейсхолдерами - однаковий текст означає однакову «форму» запиту
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.total_time += duration
+        self.shapes[statement] += 1
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[tuple]:
+        """Вирази, виконані щонайменше threshold разів."""
+        return [(statement, count) for statement, count in self.shapes.most_common() if count >= threshold]
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Збирає статистику виразів, виконаних у цьому контексті (і в задачах, створених у ньому)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(n: int) -> Iterator[QueryStats]:
+    """Тестовий помічник: AssertionError, якщо в блоці виконано більше n SQL-виразів."""
+    with track_queries() as stats:
+        yield stats
+    if stats.count > n:
+        statements = "\n".join(f"  {count}x {statement}" for statement, count in stats.shapes.most_common())
+        raise AssertionError(f"Expected at most {n} queries, got {stats.count}:\n{statements}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if duration * 1000 >= SLOW_QUERY_MS:
+        logger.warning(f"Повільний SQL-запит ({duration * 1000:.1f} ms): {statement}")
+
+
+def instrument(engine) -> None:
+    """Підключає лічильники до рушія (синхронного або AsyncEngine); повторний виклик нічого не змінює."""
+    engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        # Вираз, що впав, не доходить до after_cursor_execute - прибираємо його мітку часу
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def _handle_error(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI-проміжний шар: статистика SQL на кожен HTTP-запит.
+    Додає заголовок Server-Timing (db;dur=...) і попереджає про повтори однакових виразів.
+    """
+
+    def __init__(self, app, threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    timing = f'db;dur={stats.total_time * 1000:.1f};desc="{stats.count} queries"'
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        for statement, count in stats.repeated(self.threshold):
+            logger.warning(f"Можливий N+1: {count} однакових запитів за {scope['method']} {scope['path']}: {statement}")
@@ -0,0 +1,278 @@
+"""
+Обмеження швидкості запитів алгоритмом token bucket.
+Ключ ліміту - автентифікований користувач (або IP клієнта), стан відер зберігається
+у спільному бекенді (SQLite-файл або Redis-сумісний сервер), тож ліміт діє
+однаково для всіх процесів uvicorn.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import Depends, Request
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Скільки чекати на блокування спільного SQLite-файлу між воркерами, секунди
+RATE_LIMIT_BUSY_TIMEOUT = float(os.getenv("RATE_LIMIT_BUSY_TIMEOUT", 1.0))
+# Недоступне сховище: false - відхиляти запит (429), true - пропускати без ліміту
+RATE_LIMIT_FAIL_OPEN = os.getenv("RATE_LIMIT_FAIL_OPEN", "false").lower() == "true"
+# Як часто видаляються відра, що знову наповнилися (повне відро не відрізняється від відсутнього)
+RATE_LIMIT_SWEEP_INTERVAL = float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", 60))
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+# Запити, для яких сховище відер було недоступне, за рішенням (/metrics)
+storage_errors = {"open": 0, "closed": 0}
+
+
+def ratelimit_collector() -> List[str]:
+    """Лічильники недоступності сховища відер у форматі Prometheus."""
+    lines = [
+        "# HELP rate_limit_storage_errors_total Rate limit checks that could not reach the bucket storage.",
+        "# TYPE rate_limit_storage_errors_total counter",
+    ]
+    for mode, count in storage_errors.items():
+        lines.append(f'rate_limit_storage_errors_total{{mode="{mode}"}} {count}')
+    return lines
+
+
+class RateLimitExceeded(Exception):
+    """Ліміт запитів вичерпано; retry_after - через скільки секунд з'явиться токен."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f}s")
+
+
+def parse_rate(rate: str) -> Tuple[float, int]:
+    """'5/minute' -> (токенів на секунду, місткість відра)."""
+    count, _, period = rate.partition("/")
+    count = int(count)
+    return count / PERIODS[period.strip().rstrip("s")], count
+
+
+def refill(tokens: float, updated: float, now: float, rate: float, burst: int, cost: float) -> Tuple[bool, float, float]:
+    """Поповнення відра та спроба забрати cost токенів: (allowed, tokens, retry_after)."""
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+class TokenBucketBackend(ABC):
+    """Сховище стану відер."""
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int, cost: float = 1) -> Tuple[bool, float]:
+        """Забирає cost токенів з відра key; повертає (allowed, retry_after)."""
+
+
+class MemoryBackend(TokenBucketBackend):
+    """
+    Відра в пам'яті процесу (лише для одного воркера та тестів).
+    Відро зберігається до моменту, коли воно знову наповниться (burst / rate після
+    останнього звернення, як PEXPIRE у Redis); прострочені відра видаляє періодичний прохід.
+    """
+
+    def __init__(self, sweep_interval: float = RATE_LIMIT_SWEEP_INTERVAL):
+        self._buckets: dict[str, Tuple[float, float, float]] = {}
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def sweep(self, now: float) -> int:
+        """Видаляє відра, що вже наповнилися; повертає кількість видалених."""
+        expired = [key for key, (_, _, expires) in self._buckets.items() if expires <= now]
+        for key in expired:
+            del self._buckets[key]
+        self._next_sweep = now + self.sweep_interval
+        return len(expired)
+
+    async def take(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self.sweep(now)
+        tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+        allowed, tokens, retry_after = refill(tokens, updated, now, rate, burst, cost)
+        self._buckets[key] = (tokens, now, now + burst / rate)
+        return allowed, retry_after
+
+
+class SQLiteBackend(TokenBucketBackend):
+    """
+    Відра у спільному SQLite-файлі (WAL). Транзакція BEGIN IMMEDIATE робить
+    зчитування-оновлення атомарним між процесами; блокуючі виклики sqlite3 (з очікуванням
+    блокування до busy_timeout) виконуються в пулі потоків, а не в циклі подій.
+    Відра, що знову наповнилися (колонка expires), періодично видаляються.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        busy_timeout: float = RATE_LIMIT_BUSY_TIMEOUT,
+        sweep_interval: float = RATE_LIMIT_SWEEP_INTERVAL,
+        fail_open: bool = RATE_LIMIT_FAIL_OPEN,
+    ):
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, expires REAL NOT NULL DEFAULT 0)"
+        )
+        try:
+            # Файл, створений до появи колонки expires
+            self._conn.execute("ALTER TABLE rate_limit_buckets ADD COLUMN expires REAL NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_expires ON rate_limit_buckets (expires)")
+        self._lock = threading.Lock()
+        self.busy_timeout = busy_timeout
+        self.fail_open = fail_open
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    def sweep(self, now: float) -> int:
+        """Видаляє відра, що вже наповнилися; повертає кількість видалених."""
+        with self._lock:
+            self._next_sweep = now + self.sweep_interval
+            return self._conn.execute("DELETE FROM rate_limit_buckets WHERE expires <= ?", (now,)).rowcount
+
+    def _take(self, key, rate, burst, cost):
+        now = time.time()
+        if now >= self._next_sweep:
+            try:
+                self.sweep(now)
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Rate limit storage sweep failed: {e}")
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = self._conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+                    tokens, updated = row if row else (burst, now)
+                    allowed, tokens, retry_after = refill(tokens, updated, now, rate, burst, cost)
+                    self._conn.execute(
+                        "INSERT INTO rate_limit_buckets (key, tokens, updated, expires) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET "
+                        "tokens = excluded.tokens, updated = excluded.updated, expires = excluded.expires",
+                        (key, tokens, now, now + burst / rate),
+                    )
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.OperationalError as e:
+                # Сховище заблоковане довше за busy_timeout: за замовчуванням запит відхиляється,
+                # щоб ліміт не вимикався саме під конкуренцією воркерів
+                mode = "open" if self.fail_open else "closed"
+                storage_errors[mode] += 1
+                logger.warning(f"Rate limit storage unavailable (fail {mode}): {e}")
+                return (True, 0.0) if self.fail_open else (False, max(self.busy_timeout, 1.0))
+        return allowed, retry_after
+
+    async def take(self, key, rate, burst, cost=1):
+        return await run_in_threadpool(self._take, key, rate, burst, cost)
+
+
+REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(data[1]) or burst
+local updated = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend(TokenBucketBackend):
+    """Відра в Redis (або будь-якому сервері з протоколом Redis) - атомарно через Lua-скрипт."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(REDIS_TOKEN_BUCKET)
+
+    async def take(self, key, rate, burst, cost=1):
+        allowed, tokens = await self._script(keys=[f"ratelimit:{key}"], args=[rate, burst, time.time(), cost])
+        tokens = float(tokens)
+        return bool(allowed), 0.0 if allowed else (cost - tokens) / rate
+
+
+def create_backend(url: str) -> TokenBucketBackend:
+    """memory:// | sqlite:///path/to/file.db | redis://host:port/db"""
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported rate limit storage: {url}")
+
+
+def client_ip(request: Request) -> str:
+    """Ключ ліміту за IP клієнта."""
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimiter:
+    """Фабрика залежностей FastAPI, що застосовують ліміт до маршруту."""
+
+    def __init__(
+        self,
+        backend: Optional[TokenBucketBackend] = None,
+        key_func: Callable = client_ip,
+        enabled: bool = True,
+        storage: str = "memory://",
+    ):
+        self._backend = backend
+        self.storage = storage
+        self.key_func = key_func
+        self.enabled = enabled
+
+    @property
+    def backend(self) -> TokenBucketBackend:
+        """Сховище відер створюється під час першого запиту (з URL storage)."""
+        if self._backend is None:
+            self._backend = create_backend(self.storage)
+        return self._backend
+
+    def configure(self, storage: str) -> None:
+        """Зміна сховища до першого запиту (create_app)."""
+        self.storage = storage
+        self._backend = None
+
+    def limit(self, rate: str, burst: Optional[int] = None, scope: Optional[str] = None):
+        """Залежність для маршруту: rate на кшталт '5/minute', burst - місткість відра (за замовчуванням - count)."""
+        tokens_per_second, default_burst = parse_rate(rate)
+        burst = burst or default_burst
+
+        async def dependency(request: Request, identity: str = Depends(self.key_func)):
+            if not self.enabled:
+                return
+            bucket = f"{scope or request.scope['route'].path}:{identity}"
+            allowed, retry_after = await self.backend.take(bucket, tokens_per_second, burst)
+            if not allowed:
+                raise RateLimitExceeded(retry_after)
+
+        return dependency
@@ -0,0 +1,107 @@
+"""
+Список відкликаних токенів у пам'яті процесу.
+Джерело істини - таблиця revoked_tokens; кожен процес тримає її копію (jti -> строк дії)
+і періодично довантажує нові записи, тож get_current_user перевіряє відкликання
+за O(1) без звернення до бази. Записи зберігаються лише до закінчення строку дії токена.
+Тим самим циклом поширюється скидання пароля: знімки користувачів, чий tokens_valid_after
+змінився, видаляються з user_cache (services.cache), і наступний запит перечитує межу з бази.
+Відкликання чи скидання пароля в іншому процесі стає видимим не пізніше ніж через
+REVOCATION_SYNC_INTERVAL (плюс час одного проходу синхронізації).
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", 5))
+# Перекриття вікон синхронізації (розбіжність годинників процесів, транзакції, що комітяться пізніше)
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+def to_timestamp(value: datetime) -> float:
+    """Наївний UTC datetime (як у базі) -> Unix-час."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class RevocationList:
+    """Відкликані jti зі строком дії; прострочені записи прибираються під час синхронізації."""
+
+    def __init__(self):
+        self._revoked: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._synced_at: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def add(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        expires_at = self._revoked.get(jti) if jti else None
+        return expires_at is not None and expires_at > time.time()
+
+    def prune(self) -> int:
+        """Видалення записів, строк дії яких минув; повертає кількість видалених."""
+        now = time.time()
+        with self._lock:
+            expired = [jti for jti, expires_at in self._revoked.items() if expires_at <= now]
+            for jti in expired:
+                del self._revoked[jti]
+        return len(expired)
+
+    async def sync(self, db: AsyncSession) -> int:
+        """Довантаження відкликань і скидань пароля після попередньої синхронізації."""
+        import crud
+
+        from services.cache import invalidate_user
+
+        started = datetime.utcnow()
+        since = self._synced_at - SYNC_OVERLAP if self._synced_at else None
+        rows = await crud.get_revoked_tokens(db, since)
+        with self._lock:
+            for jti, expires_at in rows:
+                self._revoked[jti] = to_timestamp(expires_at)
+        # Перша синхронізація - під час старту, коли кеш знімків ще порожній
+        if since is not None:
+            for email in await crud.get_token_resets(db, since):
+                invalidate_user(email)
+        self.prune()
+        self._synced_at = started
+        return len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._revoked.clear()
+            self._synced_at = None
+
+
+revocation_list = RevocationList()
+
+
+async def sync_revocations() -> None:
+    """Одна синхронізація зі спільною таблицею (старт застосунку та фоновий цикл)."""
+    from database import AsyncSessionLocal, init_db
+
+    init_db()
+    async with AsyncSessionLocal() as db:
+        await revocation_list.sync(db)
+
+
+async def run_revocation_sync(interval: float = REVOCATION_SYNC_INTERVAL) -> None:
+    """Фоновий цикл синхронізації; помилки бази лише логуються."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sync_revocations()
+        except Exception:
+            logger.exception("Помилка синхронізації відкликаних токенів")
@@ -0,0 +1,118 @@
+"""
+Індексований пошук контактів для type-ahead.
+Postgres використовує tsvector (префікси) та pg_trgm (нечіткий збіг) з ранжуванням,
+SQLite - FTS5 з префіксним індексом і bm25. Пагінація - курсором за (rank, id).
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import schemas
+from models import SEARCH_DOCUMENT
+from services.pagination import decode_cursor, encode_cursor
+
+# Колонки контакту у результатах пошуку
+SEARCH_COLUMNS = ("id", "first_name", "last_name", "email", "phone_number", "birthday", "additional_info")
+
+# Поля ContactSearch, що фільтрують окремі колонки
+SEARCH_FIELDS = ("first_name", "last_name", "email")
+
+TERM_PATTERN = re.compile(r"[^\w@.+-]+", re.UNICODE)
+
+
+def split_terms(value: Optional[str]) -> List[str]:
+    """Розбиття рядка запиту на безпечні терміни (без синтаксису tsquery/FTS5)."""
+    if not value:
+        return []
+    return [term for term in TERM_PATTERN.split(value.lower()) if term]
+
+
+def postgres_tsquery(terms: List[str]) -> str:
+    """Префіксний tsquery: усі терміни мають збігтися як префікси."""
+    return " & ".join("'" + term.replace("'", "''") + "':*" for term in terms)
+
+
+def fts5_match(terms: List[str], fields: dict) -> str:
+    """Вираз MATCH для FTS5: префіксні терміни та фільтри за колонками."""
+
+    def phrase(term: str) -> str:
+        return '"' + term.replace('"', '""') + '"*'
+
+    parts = [phrase(term) for term in terms]
+    for column, value in fields.items():
+        parts.extend(f"{column} : {phrase(term)}" for term in split_terms(value))
+    return " AND ".join(parts)
+
+
+POSTGRES_QUERY = f"""
+SELECT * FROM (
+    SELECT {", ".join(SEARCH_COLUMNS)},
+        ts_rank(to_tsvector('simple', {SEARCH_DOCUMENT}), to_tsquery('simple', :tsquery))
+            + similarity(lower({SEARCH_DOCUMENT}), :q) AS rank
+    FROM contacts
+    WHERE owner_id = :owner_id AND deleted_at IS NULL
+        AND (to_tsvector('simple', {SEARCH_DOCUMENT}) @@ to_tsquery('simple', :tsquery)
+            OR lower({SEARCH_DOCUMENT}) % :q)
+        {{filters}}
+) AS matches
+{{after}}
+ORDER BY rank DESC, id
+LIMIT :limit
+"""
+
+SQLITE_QUERY = f"""
+SELECT * FROM (
+    SELECT {", ".join("contacts." + column for column in SEARCH_COLUMNS)}, bm25(contacts_fts) AS rank
+    FROM contacts_fts JOIN contacts ON contacts.id = contacts_fts.rowid
+    WHERE contacts_fts MATCH :match AND contacts.owner_id = :owner_id AND contacts.deleted_at IS NULL
+) AS matches
+{{after}}
+ORDER BY rank, id
+LIMIT :limit
+"""
+
+
+async def search_contacts(
+    db: AsyncSession,
+    owner_id: int,
+    search: schemas.ContactSearch,
+    q: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Пошук контактів власника; повертає (contacts, next_cursor)."""
+    fields = {name: getattr(search, name) for name in SEARCH_FIELDS if getattr(search, name)}
+    terms = split_terms(q)
+    all_terms = terms + [term for value in fields.values() for term in split_terms(value)]
+    if not all_terms:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty search query")
+
+    params = {"owner_id": owner_id, "limit": limit + 1}
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        filters = "".join(f"AND {name} ILIKE :{name} " for name in fields)
+        params.update({name: value.replace("%", r"\%") + "%" for name, value in fields.items()})
+        params.update(tsquery=postgres_tsquery(all_terms), q=" ".join(all_terms))
+        after = "WHERE rank < :rank OR (rank = :rank AND id > :id)"
+        sql = POSTGRES_QUERY.format(filters=filters, after=after if cursor else "")
+    elif dialect == "sqlite":
+        params["match"] = fts5_match(terms, fields)
+        after = "WHERE rank > :rank OR (rank = :rank AND id > :id)"
+        sql = SQLITE_QUERY.format(after=after if cursor else "")
+    else:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Search is not supported for this database")
+
+    if cursor:
+        params["rank"], params["id"] = decode_cursor(cursor, 2, types=((int, float), int))
+
+    rows = (await db.execute(text(sql), params)).mappings().all()
+    contacts = [{name: row[name] for name in SEARCH_COLUMNS} for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor([last["rank"], last["id"]])
+    return contacts, next_cursor
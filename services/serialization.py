@@ -0,0 +1,44 @@
+"""
+Швидке кодування сторінок контактів у JSON.
+Рядки з column-only select() кодуються одразу в тіло відповіді, без ORM-об'єктів
+і валідації pydantic. Результат побайтово збігається з відповіддю
+response_model=ContactPage (компактний JSON, UTF-8 без екранування, дати ISO 8601).
+"""
+
+import json
+import os
+from datetime import date
+from typing import Any, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:  # orjson - необов'язкова залежність; без нього використовується json
+    orjson = None
+
+# Відповідь GET /contacts/ без валідації pydantic (див. contact_page_json)
+FAST_CONTACT_LIST = os.getenv("FAST_CONTACT_LIST", "false").lower() == "true"
+
+
+def _default(value: Any) -> str:
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default)
+
+    def dumps(value: Any) -> bytes:
+        return _encoder.encode(value).encode("utf-8")
+
+
+def contact_page_json(names: Sequence[str], rows: Sequence[Sequence[Any]], next_cursor: Optional[str]) -> bytes:
+    """
+    Тіло сторінки {"items": [...], "next_cursor": ...} з кортежів рядків.
+    names - порядок колонок у рядках; він же порядок ключів у кожному об'єкті.
+    """
+    items = [dict(zip(names, row)) for row in rows]
+    return dumps({"items": items, "next_cursor": next_cursor})
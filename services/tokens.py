@@ -0,0 +1,125 @@
+"""
+Підписані одноцільові токени (підтвердження email, скидання пароля).
+Токен - JWT з полями sub, purpose, exp та jti, тож перевіряється без читання бази.
+Повторне використання блокує компактна множина використаних jti зі строком дії
+(у пам'яті процесу або в Redis для кількох воркерів).
+"""
+
+import os
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, status
+from jose import JWTError, jwt
+
+ALGORITHM = "HS256"
+
+VERIFY_EMAIL = "verify_email"
+RESET_PASSWORD = "reset_password"
+
+# Строк дії токенів за призначенням, секунди
+TOKEN_TTL = {
+    VERIFY_EMAIL: int(os.getenv("VERIFY_EMAIL_TOKEN_TTL", 24 * 3600)),
+    RESET_PASSWORD: int(os.getenv("RESET_PASSWORD_TOKEN_TTL", 30 * 60)),
+}
+
+USED_TOKENS_STORAGE = os.getenv("USED_TOKENS_STORAGE", "memory://")
+
+
+def _secret_key() -> str:
+    from settings import get_settings
+
+    return get_settings().secret_key
+
+
+def create_purpose_token(subject: str, purpose: str, ttl: Optional[int] = None) -> str:
+    """Підписаний токен для subject (email), придатний лише для purpose."""
+    claims = {
+        "sub": subject,
+        "purpose": purpose,
+        "exp": datetime.utcnow() + timedelta(seconds=ttl or TOKEN_TTL[purpose]),
+        "jti": secrets.token_urlsafe(12),
+    }
+    return jwt.encode(claims, _secret_key(), algorithm=ALGORITHM)
+
+
+def decode_purpose_token(token: str, purpose: str) -> dict:
+    """Перевірка підпису, строку дії та призначення; 400, якщо токен недійсний."""
+    try:
+        claims = jwt.decode(token, _secret_key(), algorithms=[ALGORITHM])
+    except JWTError:
+        claims = None
+    if not claims or claims.get("purpose") != purpose or not claims.get("sub") or not claims.get("jti"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or expired token")
+    return claims
+
+
+class UsedTokenStore(ABC):
+    """Множина використаних jti; запис живе до закінчення строку дії токена."""
+
+    @abstractmethod
+    async def claim(self, jti: str, expires_at: float) -> bool:
+        """Позначає jti використаним; False, якщо його вже було використано."""
+
+
+class MemoryUsedTokenStore(UsedTokenStore):
+    """Використані jti у пам'яті процесу; прострочені записи прибираються під час вставки."""
+
+    def __init__(self, purge_every: int = 1024):
+        self._used: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._purge_every = purge_every
+        self._inserts = 0
+
+    async def claim(self, jti, expires_at):
+        now = time.time()
+        with self._lock:
+            if self._used.get(jti, 0) > now:
+                return False
+            self._used[jti] = expires_at
+            self._inserts += 1
+            if self._inserts % self._purge_every == 0:
+                self._used = {key: exp for key, exp in self._used.items() if exp > now}
+        return True
+
+
+class RedisUsedTokenStore(UsedTokenStore):
+    """Використані jti у Redis: SET NX з автоматичним видаленням після строку дії."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url)
+
+    async def claim(self, jti, expires_at):
+        ttl = max(1, int(expires_at - time.time()) + 1)
+        return bool(await self._client.set(f"used_token:{jti}", 1, nx=True, ex=ttl))
+
+
+def create_used_token_store(url: str = USED_TOKENS_STORAGE) -> UsedTokenStore:
+    """memory:// | redis://host:port/db"""
+    if url.startswith("memory://"):
+        return MemoryUsedTokenStore()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisUsedTokenStore(url)
+    raise ValueError(f"Unsupported used-token storage: {url}")
+
+
+used_tokens = create_used_token_store()
+
+
+async def claim_purpose_token(claims: dict, store: Optional[UsedTokenStore] = None) -> None:
+    """Погашення вже перевіреного токена; повтор того самого токена - 400."""
+    if not await (store or used_tokens).claim(claims["jti"], claims["exp"]):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token has already been used")
+
+
+async def consume_purpose_token(token: str, purpose: str, store: Optional[UsedTokenStore] = None) -> dict:
+    """Перевірка токена та одноразове використання; повтор того самого токена - 400."""
+    claims = decode_purpose_token(token, purpose)
+    await claim_purpose_token(claims, store)
+    return claims
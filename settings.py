@@ -0,0 +1,125 @@
+"""
+Налаштування застосунку.
+Файл .env завантажує load_env(): точки входу (main, manage.py) викликають її до імпорту
+services.*, бо модулі сервісів читають свої параметри (os.getenv) під час імпорту.
+Settings читає змінні середовища під час створення; create_app(settings) робить їх поточними.
+"""
+
+import os
+import secrets
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+
+def load_env() -> None:
+    """Завантажує .env у змінні середовища (наявні змінні не перезаписуються)."""
+    load_dotenv()
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Налаштування, що передаються у create_app.
+
+    Attributes:
+        database_url (str | None): URL бази даних (синхронний або асинхронний драйвер).
+        database_replica_url (str | None): URL репліки для ендпоінтів лише для читання (None - основна база).
+        db_pool_size (int): Кількість постійних з'єднань у пулі.
+        db_max_overflow (int): Скільки з'єднань понад pool_size можна відкрити під навантаженням.
+        db_pool_timeout (float): Скільки секунд чекати на вільне з'єднання.
+        db_pool_recycle (int): Через скільки секунд перевідкривати з'єднання (-1 - ніколи).
+        db_pool_pre_ping (bool): Перевіряти з'єднання перед видачею з пулу.
+        secret_key (str): Ключ підпису JWT.
+        cors_origins (Tuple[str, ...]): Дозволені джерела CORS.
+        rate_limit_storage (str): Сховище відер обмеження запитів (memory://, sqlite:///..., redis://...).
+        rate_limit_enabled (bool): Чи застосовувати обмеження запитів (вимикається для навантажувальних тестів).
+        create_schema (bool): Створювати таблиці під час старту (для розробки; у продакшні - manage.py migrate).
+        metrics_token (str | None): Bearer-токен службових ендпоінтів (/metrics, /cache/stats/); None - вимкнені.
+        cloudinary_cloud_name (str | None): Назва хмари Cloudinary.
+        cloudinary_api_key (str | None): API-ключ Cloudinary.
+        cloudinary_api_secret (str | None): API-секрет Cloudinary.
+        smtp_server (str): SMTP-сервер для відправки листів.
+        smtp_port (int): Порт SMTP-сервера.
+        smtp_user (str | None): Логін SMTP (None - без автентифікації).
+        smtp_password (str | None): Пароль SMTP.
+        smtp_starttls (bool): Чи вмикати STARTTLS.
+        email_from (str | None): Адреса відправника (за замовчуванням - smtp_user).
+    """
+    database_url: Optional[str] = None
+    database_replica_url: Optional[str] = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    secret_key: str = field(default_factory=lambda: secrets.token_urlsafe(32))
+    cors_origins: Tuple[str, ...] = ("*",)
+    rate_limit_storage: str = "memory://"
+    rate_limit_enabled: bool = True
+    create_schema: bool = False
+    metrics_token: Optional[str] = None
+    cloudinary_cloud_name: Optional[str] = None
+    cloudinary_api_key: Optional[str] = None
+    cloudinary_api_secret: Optional[str] = None
+    smtp_server: str = "smtp.gmail.com"
+    smtp_port: int = 587
+    smtp_user: Optional[str] = None
+    smtp_password: Optional[str] = None
+    smtp_starttls: bool = True
+    email_from: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Налаштування зі змінних середовища та .env."""
+        load_env()
+        defaults = cls()
+        return cls(
+            database_url=os.getenv("DATABASE_URL"),
+            database_replica_url=os.getenv("DATABASE_REPLICA_URL") or None,
+            db_pool_size=int(os.getenv("DB_POOL_SIZE", defaults.db_pool_size)),
+            db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", defaults.db_max_overflow)),
+            db_pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", defaults.db_pool_timeout)),
+            db_pool_recycle=int(os.getenv("DB_POOL_RECYCLE", defaults.db_pool_recycle)),
+            db_pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+            secret_key=os.getenv("SECRET_KEY", defaults.secret_key),
+            cors_origins=tuple(os.getenv("CORS_ORIGINS", "*").split(",")),
+            rate_limit_storage=os.getenv("RATE_LIMIT_STORAGE", defaults.rate_limit_storage),
+            rate_limit_enabled=os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true",
+            create_schema=os.getenv("CREATE_SCHEMA", "false").lower() == "true",
+            metrics_token=os.getenv("METRICS_TOKEN") or None,
+            cloudinary_cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            cloudinary_api_key=os.getenv("CLOUDINARY_API_KEY"),
+            cloudinary_api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+            smtp_server=os.getenv("SMTP_SERVER", defaults.smtp_server),
+            smtp_port=int(os.getenv("SMTP_PORT", defaults.smtp_port)),
+            smtp_user=os.getenv("SMTP_USER"),
+            smtp_password=os.getenv("SMTP_PASSWORD"),
+            smtp_starttls=os.getenv("SMTP_STARTTLS", "true").lower() == "true",
+            email_from=os.getenv("EMAIL_FROM"),
+        )
+
+
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    """Поточні налаштування (за замовчуванням - зі змінних середовища)."""
+    global _settings
+    if _settings is None:
+        _settings = Settings.from_env()
+    return _settings
+
+
+def email_sender(settings: Optional[Settings] = None) -> str:
+    """Адреса відправника листів."""
+    settings = settings or get_settings()
+    return settings.email_from or settings.smtp_user or "no-reply@example.com"
+
+
+def configure(settings: Settings) -> Settings:
+    """Робить settings поточними для процесу."""
+    global _settings
+    _settings = settings
+    return settings
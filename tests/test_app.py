@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+
+from database import create_schema
+from main import create_access_token, create_app
+from settings import Settings
+
+
+class TestAppFactory(unittest.TestCase):
+
+    def setUp(self):
+        """Окремий застосунок із тимчасовою SQLite-базою; схема створюється під час старту"""
+        self.tmp = tempfile.TemporaryDirectory()
+        url = "sqlite+aiosqlite:///" + os.path.join(self.tmp.name, "app.db")
+        self.app = create_app(Settings(database_url=url, secret_key="test-secret", create_schema=True))
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': 'owner@example.com'})}"}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lifespan_creates_schema_and_serves_requests(self):
+        """Тестуємо старт через lifespan і першу відповідь"""
+        with TestClient(self.app) as client:
+            response = client.post("/register/", params={"email": "owner@example.com", "password": "secret"})
+            self.assertEqual(response.status_code, 200)
+            response = client.get("/contacts/", headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["items"], [])
+
+    def test_bulk_delete_ids_are_bounded(self):
+        """Тестуємо межі розміру списку id для масового видалення"""
+        with TestClient(self.app) as client:
+            client.post("/register/", params={"email": "owner@example.com", "password": "secret"})
+            for ids, status_code in (([], 422), (list(range(1, 1002)), 422), ([1, 2], 200)):
+                response = client.post("/contacts/bulk-delete", json={"ids": ids}, headers=self.headers)
+                self.assertEqual(response.status_code, status_code)
+
+    def test_contact_etag_names_the_contact(self):
+        """Тестуємо, що ETag контакту містить id, а If-Match іншого контакту дає 412"""
+        with TestClient(self.app) as client:
+            client.post("/register/", params={"email": "owner@example.com", "password": "secret"})
+            etags = []
+            for n in range(2):
+                contact = {
+                    "first_name": f"Contact{n}",
+                    "last_name": "Test",
+                    "email": f"contact{n}@example.com",
+                    "phone_number": "+380501234567",
+                    "birthday": "1990-01-01",
+                }
+                response = client.post("/contacts/", json=contact, headers=self.headers)
+                etags.append((response.json()["id"], response.headers["etag"]))
+            (first_id, first_etag), (second_id, second_etag) = etags
+            self.assertEqual(first_etag, f'"{first_id}-v1"')
+            self.assertNotEqual(first_etag, second_etag)
+            response = client.patch(
+                f"/contacts/{first_id}", json={"first_name": "Renamed"}, headers={**self.headers, "If-Match": second_etag}
+            )
+            self.assertEqual(response.status_code, 412)
+            response = client.patch(
+                f"/contacts/{first_id}", json={"first_name": "Renamed"}, headers={**self.headers, "If-Match": first_etag}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["etag"], f'"{first_id}-v2"')
+
+    def test_collection_etag_is_per_owner(self):
+        """Тестуємо, що ETag списку одного користувача не дає 304 іншому"""
+        other = {"Authorization": f"Bearer {create_access_token({'sub': 'other@example.com'})}"}
+        with TestClient(self.app) as client:
+            for email in ("owner@example.com", "other@example.com"):
+                client.post("/register/", params={"email": email, "password": "secret"})
+            response = client.get("/contacts/", headers=self.headers)
+            self.assertIn("Authorization", response.headers["vary"])
+            etag = response.headers["etag"]
+            self.assertEqual(client.get("/contacts/", headers={**self.headers, "If-None-Match": etag}).status_code, 304)
+            response = client.get("/contacts/", headers={**other, "If-None-Match": etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers["etag"], etag)
+
+    def test_cache_stats_require_metrics_token(self):
+        """Тестуємо, що статистика кешу вимкнена без токена і закрита від сторонніх"""
+        with TestClient(self.app) as client:
+            self.assertEqual(client.get("/cache/stats/").status_code, 404)
+        url = "sqlite+aiosqlite:///" + os.path.join(self.tmp.name, "metrics.db")
+        app = create_app(Settings(database_url=url, secret_key="test-secret", create_schema=True, metrics_token="scrape"))
+        with TestClient(app) as client:
+            self.assertEqual(client.get("/cache/stats/").status_code, 401)
+            self.assertEqual(client.get("/cache/stats/", headers=self.headers).status_code, 401)
+            response = client.get("/cache/stats/", headers={"Authorization": "Bearer scrape"})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("users", response.json())
+
+    def test_read_only_endpoints_use_replica(self):
+        """Тестуємо маршрутизацію читання на репліку та метрики пулів"""
+        primary = "sqlite+aiosqlite:///" + os.path.join(self.tmp.name, "primary.db")
+        replica = "sqlite+aiosqlite:///" + os.path.join(self.tmp.name, "replica.db")
+        create_schema(replica)
+        app = create_app(
+            Settings(
+                database_url=primary,
+                database_replica_url=replica,
+                secret_key="test-secret",
+                create_schema=True,
+                metrics_token="scrape",
+            )
+        )
+        contact = {"first_name": "A", "last_name": "B", "email": "a@example.com", "phone_number": "1", "birthday": "1990-01-01"}
+        with TestClient(app) as client:
+            client.post("/register/", params={"email": "owner@example.com", "password": "secret"})
+            self.assertEqual(client.post("/contacts/", json=contact, headers=self.headers).status_code, 201)
+            # Репліка - окремий файл без реплікації, тож запис туди не потрапив
+            self.assertEqual(client.get("/contacts/", headers=self.headers).json()["items"], [])
+            self.assertEqual(client.get("/metrics", headers=self.headers).status_code, 401)
+            metrics = client.get("/metrics", headers={"Authorization": "Bearer scrape"}).text
+        self.assertIn('db_pool_checkouts_total{pool="primary"}', metrics)
+        self.assertIn('db_pool_checkouts_total{pool="replica"}', metrics)
+        self.assertIn('db_pool_utilization{pool="primary"}', metrics)
+
+
+if __name__ == "__main__":
+    unittest.main()
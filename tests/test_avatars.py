@@ -0,0 +1,78 @@
+import io
+import os
+import tempfile
+import unittest
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from services.avatars import AvatarPipeline, CloudinaryStorage, LocalStorage, read_upload
+
+
+class CountingStorage(LocalStorage):
+    """Локальне сховище, що рахує збереження"""
+
+    saves = 0
+
+    def save(self, key, variants):
+        self.saves += 1
+        return super().save(key, variants)
+
+
+class TestAvatarPipeline(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = CountingStorage(root=self.tmp.name, base_url="/avatars")
+        self.pipeline = AvatarPipeline(storage=self.storage, workers=1)
+        buffer = io.BytesIO()
+        Image.new("RGB", (400, 300), "red").save(buffer, format="JPEG")
+        self.image = buffer.getvalue()
+
+    async def asyncTearDown(self):
+        self.pipeline.shutdown()
+        self.tmp.cleanup()
+
+    async def test_resizes_and_deduplicates(self):
+        """Тестуємо створення мініатюр і пропуск повторного завантаження того самого зображення"""
+        url = await self.pipeline.store(self.image)
+        self.assertEqual(await self.pipeline.store(self.image), url)
+        self.assertEqual(self.storage.saves, 1)
+        with Image.open(os.path.join(self.tmp.name, os.path.basename(url))) as stored:
+            self.assertEqual(stored.size[0], stored.size[1])
+
+    async def test_non_image_is_rejected(self):
+        """Тестуємо, що файл, який не декодується як зображення, не зберігається"""
+        with self.assertRaises(HTTPException) as ctx:
+            await self.pipeline.store(b"not an image")
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertEqual(self.storage.saves, 0)
+
+    async def test_upload_size_cap(self):
+        """Тестуємо відхилення завеликого файлу"""
+        upload = UploadFile(io.BytesIO(self.image))
+        with self.assertRaises(HTTPException) as ctx:
+            await read_upload(upload, max_bytes=100)
+        self.assertEqual(ctx.exception.status_code, 413)
+
+
+class TestStorageLookup(unittest.TestCase):
+
+    def test_local_find_ignores_partial_files(self):
+        """Тестуємо пошук основного варіанта за точним іменем, без тимчасових файлів"""
+        key = "a" * 64
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = LocalStorage(root=tmp, base_url="/avatars")
+            with open(os.path.join(tmp, f"{key}_256.png.tmp"), "wb") as f:
+                f.write(b"partial")
+            self.assertIsNone(storage.find(key))
+            url = storage.save(key, {"256": (b"big", "png"), "64": (b"small", "png")})
+            self.assertEqual(storage.find(key), url)
+            self.assertEqual(url, f"/avatars/{key}_256.png")
+
+    def test_cloudinary_find_does_not_call_admin_api(self):
+        """Тестуємо, що відомі хеші беруться з пам'яті процесу"""
+        storage = CloudinaryStorage()
+        self.assertIsNone(storage.find("a" * 64))
+        storage._urls.set("a" * 64, "https://res.cloudinary.com/demo/avatars/a_256.jpg")
+        self.assertEqual(storage.find("a" * 64), "https://res.cloudinary.com/demo/avatars/a_256.jpg")
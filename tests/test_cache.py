@@ -0,0 +1,37 @@
+import time
+import unittest
+
+from services.cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_hit_and_miss_counters(self):
+        """Тестуємо лічильники влучань і промахів"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_lru_eviction(self):
+        """Тестуємо витіснення найдавніше використаного запису"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_expiry_and_invalidation(self):
+        """Тестуємо закінчення строку дії та інвалідацію"""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("short", 1, ttl=0.01)
+        cache.set("long", 2)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("short"))
+        cache.invalidate("long")
+        self.assertIsNone(cache.get("long"))
@@ -0,0 +1,125 @@
+import asyncio
+import gzip
+import os
+import tempfile
+import unittest
+
+from fastapi import FastAPI, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from services.compression import CompressionMiddleware, negotiate
+
+
+class TestCompression(unittest.TestCase):
+
+    def setUp(self):
+        """Мінімальний застосунок із проміжним шаром стиснення"""
+        app = FastAPI()
+        app.add_middleware(CompressionMiddleware, minimum_size=100, threadpool_size=1000)
+
+        @app.get("/items")
+        async def items(size: int):
+            return Response(b'{"items": [' + b"1, " * size + b"1]}", media_type="application/json", headers={"ETag": '"r1"'})
+
+        @app.get("/stream")
+        async def stream():
+            return StreamingResponse(iter([b"[1]\n"] * 100), media_type="application/x-ndjson")
+
+        self.client = TestClient(app)
+
+    def test_negotiate(self):
+        """Тестуємо вибір кодування за Accept-Encoding і q"""
+        self.assertEqual(negotiate("gzip, deflate"), "gzip")
+        self.assertIsNone(negotiate("gzip;q=0, identity"))
+        self.assertIsNone(negotiate(""))
+
+    def test_large_json_is_compressed(self):
+        """Тестуємо стиснення (інлайн і в пулі потоків) та слабкий ETag"""
+        for size in (100, 10000):
+            response = self.client.get("/items", params={"size": size}, headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(response.headers["content-encoding"], "gzip")
+            self.assertEqual(response.headers["etag"], 'W/"r1"')
+            self.assertIn("Accept-Encoding", response.headers["vary"])
+            self.assertEqual(len(response.json()["items"]), size + 1)
+
+    def test_small_streaming_and_identity_pass_through(self):
+        """Тестуємо відповіді, що не стискаються"""
+        response = self.client.get("/items", params={"size": 1}, headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.headers["etag"], '"r1"')
+        response = self.client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", response.headers)
+        response = self.client.get("/items", params={"size": 1000}, headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_gzip_body_is_valid(self):
+        """Тестуємо довжину стиснутого тіла"""
+        body = b'{"items": [' + b"1, " * 1000 + b"1]}"
+        response = self.client.get("/items", params={"size": 1000}, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.content, body)
+        self.assertEqual(int(response.headers["content-length"]), len(gzip.compress(body, mtime=0)))
+
+    def test_pathsend_keeps_response_start(self):
+        """Тестуємо FileResponse із розширенням http.response.pathsend"""
+        with tempfile.NamedTemporaryFile(suffix=".json") as f:
+            f.write(b"[1]" * 1000)
+            f.flush()
+            for media_type in ("application/json", "image/png"):
+                middleware = CompressionMiddleware(FileResponse(f.name, media_type=media_type), minimum_size=100)
+                scope = {
+                    "type": "http",
+                    "method": "GET",
+                    "path": "/file",
+                    "headers": [(b"accept-encoding", b"gzip")],
+                    "extensions": {"http.response.pathsend": {}},
+                }
+                sent = []
+
+                async def receive():
+                    return {"type": "http.request", "body": b""}
+
+                async def send(message):
+                    sent.append(message)
+
+                asyncio.run(middleware(scope, receive, send))
+                self.assertEqual([message["type"] for message in sent], ["http.response.start", "http.response.pathsend"])
+                self.assertNotIn(b"content-encoding", dict(sent[0]["headers"]))
+
+
+class TestAvatarEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        """Застосунок із локальним сховищем аватарів"""
+        from main import avatar_pipeline, create_app
+        from services.avatars import LocalStorage
+        from settings import Settings
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pipeline = avatar_pipeline
+        self.previous = avatar_pipeline._storage
+        avatar_pipeline._storage = LocalStorage(root=self.tmp.name, base_url="/avatars")
+        self.name = "a" * 64 + "_256.png"
+        with open(os.path.join(self.tmp.name, self.name), "wb") as f:
+            f.write(b"\x89PNG fake image")
+        self.client = TestClient(create_app(Settings(secret_key="test-secret")))
+
+    def tearDown(self):
+        self.pipeline._storage = self.previous
+        self.tmp.cleanup()
+
+    def test_avatar_file_with_strong_etag(self):
+        """Тестуємо віддачу файлу, кешування та 304"""
+        response = self.client.get(f"/avatars/{self.name}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"\x89PNG fake image")
+        self.assertEqual(response.headers["etag"], f'"{"a" * 64}_256"')
+        self.assertIn("immutable", response.headers["cache-control"])
+        response = self.client.get(f"/avatars/{self.name}", headers={"If-None-Match": response.headers["etag"]})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get("/avatars/..%2Fapp.db").status_code, 404)
+        self.assertEqual(self.client.get("/avatars/" + "b" * 64 + "_256.png").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
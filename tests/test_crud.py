@@ -0,0 +1,274 @@
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import crud
+import schemas
+from services.importer import import_contacts
+from services.search import search_contacts
+from services.pagination import encode_cursor
+from services.querylog import assert_max_queries, instrument
+from services.serialization import contact_page_json
+from models import Base, User
+
+# Асинхронна тестова база даних у пам'яті (aiosqlite)
+DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+class TestAsyncCrud(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """Створюємо таблиці та тестового користувача перед кожним тестом"""
+        self.engine = create_async_engine(DATABASE_URL)
+        instrument(self.engine)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.SessionLocal = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.db = self.SessionLocal()
+        self.user = User(email="owner@example.com", hashed_password="hashedpassword")
+        self.db.add(self.user)
+        await self.db.commit()
+
+    async def asyncTearDown(self):
+        """Закриваємо сесію та рушій після кожного тесту"""
+        await self.db.close()
+        await self.engine.dispose()
+
+    def make_contact(self, n: int) -> schemas.ContactCreate:
+        return schemas.ContactCreate(
+            first_name=f"First{n}",
+            last_name=f"Last{n}",
+            email=f"contact{n}@example.com",
+            phone_number=f"+38050000{n:04d}",
+            birthday=date(1990, 1, 1 + n % 28),
+        )
+
+    async def test_create_and_get_contact(self):
+        """Тестуємо створення та отримання контакту"""
+        contact = await crud.create_contact(self.db, self.make_contact(1), self.user.id)
+        fetched = await crud.get_contact(self.db, contact.id, self.user.id)
+        self.assertEqual(fetched.email, "contact1@example.com")
+        self.assertIsNone(await crud.get_contact(self.db, contact.id, self.user.id + 1))
+
+    async def test_get_contacts(self):
+        """Тестуємо отримання контактів власника"""
+        for n in range(3):
+            await crud.create_contact(self.db, self.make_contact(n), self.user.id)
+        contacts, next_cursor = await crud.get_contacts(self.db, self.user.id)
+        self.assertEqual(len(contacts), 3)
+        self.assertIsNone(next_cursor)
+
+    async def test_get_contacts_keyset_pagination(self):
+        """Тестуємо курсорну пагінацію за (last_name, id) без пропусків і повторів"""
+        for n in range(7):
+            await crud.create_contact(self.db, self.make_contact(n), self.user.id)
+        seen, cursor = [], None
+        while True:
+            page, cursor = await crud.get_contacts(self.db, self.user.id, limit=3, cursor=cursor, order_by="last_name")
+            seen.extend(contact.last_name for contact in page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, sorted(f"Last{n}" for n in range(7)))
+
+    async def test_get_contacts_rejects_wrong_cursor_types(self):
+        """Курсор зі значеннями не того типу, що й колонки ключа, дає 400"""
+        for order_by, values in (("id", ["1"]), ("last_name", [1, 2]), ("last_name", ["Last1", "x"])):
+            with self.assertRaises(HTTPException) as ctx:
+                await crud.get_contacts(self.db, self.user.id, cursor=encode_cursor(values), order_by=order_by)
+            self.assertEqual(ctx.exception.status_code, 400)
+
+    async def test_get_contacts_fields_projection(self):
+        """Тестуємо вибірку лише запитаних полів"""
+        await crud.create_contact(self.db, self.make_contact(1), self.user.id)
+        contacts, _ = await crud.get_contacts(self.db, self.user.id, fields=["email"])
+        self.assertEqual(contacts, [{"email": "contact1@example.com"}])
+
+    async def test_contact_rows_fast_path_matches_response_model(self):
+        """Швидкий шлях дає побайтово той самий JSON, що й response_model=ContactPage"""
+        for n in range(5):
+            await crud.create_contact(self.db, self.make_contact(n), self.user.id)
+        for fields in (None, ["id", "email"]):
+            contacts, next_cursor = await crud.get_contacts(self.db, self.user.id, limit=3, order_by="last_name", fields=fields)
+            page = schemas.ContactPage.model_validate({"items": contacts, "next_cursor": next_cursor}, from_attributes=True)
+            expected = JSONResponse(jsonable_encoder(page, exclude_unset=True)).body
+            names, rows, fast_cursor = await crud.get_contact_rows(self.db, self.user.id, limit=3, order_by="last_name", fields=fields)
+            self.assertEqual(contact_page_json(names, rows, fast_cursor), expected)
+
+    async def test_stream_contacts(self):
+        """Тестуємо потокове читання контактів серверним курсором"""
+        for n in range(5):
+            await crud.create_contact(self.db, self.make_contact(n), self.user.id)
+        rows = [row async for row in crud.stream_contacts(self.db, self.user.id, fields=["id", "email"], batch_size=2)]
+        self.assertEqual([row["email"] for row in rows], [f"contact{n}@example.com" for n in range(5)])
+
+    async def test_import_contacts_reports_row_errors(self):
+        """Тестуємо масовий імпорт порціями зі звітом про помилки рядків"""
+        rows = [self.make_contact(n).dict() for n in range(5)]
+        rows.append({"first_name": "Broken"})
+        rows.append(self.make_contact(0).dict())
+        report = await import_contacts(self.db, self.user.id, rows, batch_size=2)
+        self.assertEqual(report.inserted, 5)
+        self.assertEqual([(error.row, error.error) for error in report.errors][1:], [(7, "Email already exists")])
+        self.assertEqual(report.errors[0].row, 6)
+        contacts, _ = await crud.get_contacts(self.db, self.user.id)
+        self.assertEqual(len(contacts), 5)
+
+    async def test_bulk_create_splits_by_bind_params(self):
+        """Тестуємо поділ великої порції на INSERT-и в межах ліміту параметрів"""
+        rows = [(n, self.make_contact(n).model_dump()) for n in range(crud.MAX_BIND_PARAMS // 16 + 10)]
+        with assert_max_queries(3):
+            inserted, errors = await crud.bulk_create_contacts(self.db, rows, self.user.id)
+        self.assertEqual((inserted, errors), (len(rows), []))
+
+    async def test_search_contacts_prefix(self):
+        """Тестуємо префіксний пошук через FTS5 з курсорною пагінацією"""
+        for n in range(3):
+            await crud.create_contact(self.db, self.make_contact(n), self.user.id)
+        contacts, next_cursor = await search_contacts(self.db, self.user.id, schemas.ContactSearch(), q="fir", limit=2)
+        self.assertEqual(len(contacts), 2)
+        more, last_cursor = await search_contacts(self.db, self.user.id, schemas.ContactSearch(), q="fir", limit=2, cursor=next_cursor)
+        self.assertEqual(len(more), 1)
+        self.assertIsNone(last_cursor)
+        found, _ = await search_contacts(self.db, self.user.id, schemas.ContactSearch(last_name="last1"))
+        self.assertEqual([contact["email"] for contact in found], ["contact1@example.com"])
+
+    async def test_upcoming_birthdays_year_wrap_and_leap_day(self):
+        """Тестуємо найближчі дні народження через межу року та 29 лютого"""
+        birthdays = [date(1990, 12, 30), date(1991, 1, 2), date(1992, 2, 29), date(1993, 6, 1)]
+        for n, birthday in enumerate(birthdays):
+            await crud.create_contact(self.db, self.make_contact(n).copy(update={"birthday": birthday}), self.user.id)
+
+        upcoming = await crud.get_upcoming_birthdays(self.db, self.user.id, days=5, today=date(2025, 12, 29))
+        self.assertEqual([next_date for _, next_date in upcoming], [date(2025, 12, 30), date(2026, 1, 2)])
+
+        upcoming = await crud.get_upcoming_birthdays(self.db, self.user.id, days=3, today=date(2025, 2, 25))
+        self.assertEqual([next_date for _, next_date in upcoming], [date(2025, 2, 28)])
+
+        upcoming = await crud.get_upcoming_birthdays(self.db, self.user.id, days=0, today=date(2024, 2, 28))
+        self.assertEqual(upcoming, [])
+
+    async def test_update_contact(self):
+        """Тестуємо оновлення контакту"""
+        contact = await crud.create_contact(self.db, self.make_contact(1), self.user.id)
+        updated = await crud.update_contact(self.db, contact.id, schemas.ContactUpdate(first_name="Renamed"), self.user.id)
+        self.assertEqual(updated.first_name, "Renamed")
+        self.assertEqual(updated.last_name, "Last1")
+        self.assertEqual(updated.version, 2)
+
+        cleared = await crud.update_contact(self.db, contact.id, schemas.ContactUpdate(additional_info=None), self.user.id)
+        self.assertIsNone(cleared.additional_info)
+        with self.assertRaises(HTTPException) as ctx:
+            await crud.update_contact(self.db, contact.id, schemas.ContactUpdate(first_name=None), self.user.id)
+        self.assertEqual(ctx.exception.status_code, 422)
+
+    async def test_update_contact_version_conflict(self):
+        """Застаріла версія дає 412, відсутній контакт - 404"""
+        # Невдала зміна відкочує всю транзакцію й прострочує ORM-об'єкти сесії
+        owner_id = self.user.id
+        contact = await crud.create_contact(self.db, self.make_contact(1), owner_id)
+        await crud.update_contact(self.db, contact.id, schemas.ContactUpdate(first_name="A"), owner_id, expected_version=1)
+        with self.assertRaises(HTTPException) as ctx:
+            await crud.update_contact(self.db, contact.id, schemas.ContactUpdate(first_name="B"), owner_id, expected_version=1)
+        self.assertEqual(ctx.exception.status_code, 412)
+        with self.assertRaises(HTTPException) as ctx:
+            await crud.update_contact(self.db, contact.id, schemas.ContactUpdate(first_name="B"), owner_id + 1)
+        self.assertEqual(ctx.exception.status_code, 404)
+
+    async def test_delete_contact(self):
+        """Тестуємо видалення контакту"""
+        contact = await crud.create_contact(self.db, self.make_contact(1), self.user.id)
+        await crud.delete_contact(self.db, contact.id, self.user.id)
+        self.assertIsNone(await crud.get_contact(self.db, contact.id, self.user.id))
+
+    async def test_contacts_revision_bumped_by_writes(self):
+        """Кожна зміна контактів збільшує ревізію власника, невдала - ні"""
+        owner_id = self.user.id
+        revision = await crud.get_contacts_revision(self.db, owner_id)
+        contact = await crud.create_contact(self.db, self.make_contact(1), owner_id)
+        await crud.update_contact(self.db, contact.id, schemas.ContactUpdate(first_name="Renamed"), owner_id)
+        await import_contacts(self.db, owner_id, [self.make_contact(2).dict()])
+        with self.assertRaises(HTTPException):
+            await crud.delete_contact(self.db, contact.id, owner_id, expected_version=1)
+        await crud.delete_contact(self.db, contact.id, owner_id)
+        self.assertEqual(await crud.get_contacts_revision(self.db, owner_id), revision + 4)
+
+    async def test_contact_changes_since_watermark(self):
+        """Стрічка змін повертає лише зміни після водяного знаку, включно з надгробками"""
+        contacts = [await crud.create_contact(self.db, self.make_contact(n), self.user.id) for n in range(3)]
+        changes, watermark, has_more = await crud.get_contact_changes(self.db, self.user.id, limit=2)
+        self.assertEqual([change["id"] for change in changes], [contacts[0].id, contacts[1].id])
+        self.assertTrue(has_more)
+        changes, watermark, has_more = await crud.get_contact_changes(self.db, self.user.id, since=watermark)
+        self.assertEqual([change["id"] for change in changes], [contacts[2].id])
+        self.assertFalse(has_more)
+
+        await crud.update_contact(self.db, contacts[0].id, schemas.ContactUpdate(first_name="Renamed"), self.user.id)
+        await crud.delete_contact(self.db, contacts[1].id, self.user.id)
+        changes, new_watermark, _ = await crud.get_contact_changes(self.db, self.user.id, since=watermark)
+        self.assertEqual(changes[0]["first_name"], "Renamed")
+        self.assertEqual(changes[1], {"id": contacts[1].id, "deleted": True})
+        self.assertIsNone(await crud.get_contact(self.db, contacts[1].id, self.user.id))
+        # Email надгробка звільнено для нового контакту
+        await crud.create_contact(self.db, self.make_contact(1), self.user.id)
+
+        self.assertEqual(await crud.compact_tombstones(self.db, datetime.now(timezone.utc) + timedelta(days=1)), 1)
+        with self.assertRaises(HTTPException) as ctx:
+            await crud.get_contact_changes(self.db, self.user.id, since=watermark)
+        self.assertEqual(ctx.exception.status_code, 410)
+        changes, _, _ = await crud.get_contact_changes(self.db, self.user.id, since=new_watermark)
+        self.assertEqual(len(changes), 1)
+
+    async def test_compaction_inside_bulk_delete_revision(self):
+        """Водяний знак посеред ревізії масового видалення після компакції дає 410"""
+        ids = [(await crud.create_contact(self.db, self.make_contact(n), self.user.id)).id for n in range(4)]
+        _, watermark, _ = await crud.get_contact_changes(self.db, self.user.id)
+        await crud.delete_contacts(self.db, ids, self.user.id)
+        changes, page_watermark, has_more = await crud.get_contact_changes(self.db, self.user.id, since=watermark, limit=2)
+        self.assertEqual([change["id"] for change in changes], ids[:2])
+        self.assertTrue(has_more)
+        _, end_watermark, _ = await crud.get_contact_changes(self.db, self.user.id, since=page_watermark)
+
+        self.assertEqual(await crud.compact_tombstones(self.db, datetime.now(timezone.utc) + timedelta(days=1)), 4)
+        with self.assertRaises(HTTPException) as ctx:
+            await crud.get_contact_changes(self.db, self.user.id, since=page_watermark, limit=2)
+        self.assertEqual(ctx.exception.status_code, 410)
+        # Клієнт, що дочитав ревізію до кінця, продовжує без повної синхронізації
+        changes, _, has_more = await crud.get_contact_changes(self.db, self.user.id, since=end_watermark)
+        self.assertEqual((changes, has_more), ([], False))
+
+    async def test_contact_changes_rejects_malformed_watermark(self):
+        """Водяний знак з нечисловими значеннями дає 400, а не помилку порівняння"""
+        for since in (encode_cursor(["a", "b"]), encode_cursor([1, True]), "not-a-cursor"):
+            with self.assertRaises(HTTPException) as ctx:
+                await crud.get_contact_changes(self.db, self.user.id, since=since)
+            self.assertEqual(ctx.exception.status_code, 400)
+
+    async def test_query_counts(self):
+        """Кількість SQL-виразів на операцію не зростає непомітно"""
+        with assert_max_queries(3):
+            contact = await crud.create_contact(self.db, self.make_contact(1), self.user.id)
+        with assert_max_queries(1):
+            await crud.get_contacts(self.db, self.user.id)
+        with assert_max_queries(1):
+            await crud.get_contact_rows(self.db, self.user.id)
+        with assert_max_queries(2):
+            await crud.get_contact_changes(self.db, self.user.id)
+        # Ревізія власника і сам UPDATE ... RETURNING
+        with assert_max_queries(2):
+            await crud.update_contact(self.db, contact.id, schemas.ContactUpdate(first_name="Renamed"), self.user.id)
+        with assert_max_queries(2):
+            await crud.delete_contact(self.db, contact.id, self.user.id)
+        with self.assertRaises(AssertionError):
+            with assert_max_queries(0):
+                await crud.get_contacts(self.db, self.user.id)
+
+    async def test_delete_contacts_bulk(self):
+        """Тестуємо масове видалення лише власних контактів"""
+        ids = [(await crud.create_contact(self.db, self.make_contact(n), self.user.id)).id for n in range(3)]
+        deleted = await crud.delete_contacts(self.db, ids[:2] + [9999], self.user.id)
+        self.assertEqual(deleted, ids[:2])
+        contacts, _ = await crud.get_contacts(self.db, self.user.id)
+        self.assertEqual([c.id for c in contacts], ids[2:])
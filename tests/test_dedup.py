@@ -0,0 +1,117 @@
+import unittest
+from datetime import date, datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import crud
+import schemas
+from models import Base, Contact, ContactDuplicate, User
+from services.dedup import DedupWorker, mark_unkeyed_owners, name_key, normalize_phone
+
+DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+class TestNormalization(unittest.TestCase):
+
+    def test_normalize_phone(self):
+        """Тестуємо приведення різних форматів до E.164"""
+        for raw in ("+380 (50) 123-45-67", "050 123 45 67", "380501234567", "00380501234567"):
+            self.assertEqual(normalize_phone(raw), "+380501234567")
+        self.assertIsNone(normalize_phone("123"))
+        self.assertIsNone(normalize_phone(None))
+
+    def test_name_key(self):
+        """Тестуємо ключ імені без регістру, пунктуації та порядку слів"""
+        self.assertEqual(name_key("Іван", "Петренко"), name_key("ПЕТРЕНКО", "іван"))
+        self.assertEqual(name_key("José", "O'Neil"), "jose oneil")
+        self.assertIsNone(name_key("", None))
+
+
+class TestDedupWorker(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine(DATABASE_URL)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.SessionLocal = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.db = self.SessionLocal()
+        self.user = User(email="owner@example.com", hashed_password="hashedpassword")
+        self.db.add(self.user)
+        await self.db.commit()
+        self.worker = DedupWorker(self.SessionLocal, batch_size=2, max_block_size=3)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.engine.dispose()
+
+    async def add(self, n: int, first_name: str, last_name: str, phone: str, birthday=date(1990, 5, 1)):
+        contact = schemas.ContactCreate(
+            first_name=first_name, last_name=last_name, email=f"c{n}@example.com", phone_number=phone, birthday=birthday
+        )
+        return await crud.create_contact(self.db, contact, self.user.id)
+
+    async def test_finds_and_merges_duplicates(self):
+        """Тестуємо пошук пар у блоках, оцінку та об'єднання"""
+        a = await self.add(1, "Іван", "Петренко", "+380 50 123 45 67")
+        b = await self.add(2, "ПЕТРЕНКО", "іван", "0501234567")
+        c = await self.add(3, "Ivan", "Petrenko", "+380631112233", birthday=date(1991, 1, 1))
+        await self.add(4, "Ольга", "Коваль", "+380661234567")
+
+        self.assertEqual(await self.worker.drain_once(), 1)
+        pairs, pending = await crud.get_duplicate_candidates(self.db, self.user.id)
+        self.assertFalse(pending)
+        self.assertEqual([(contact.id, duplicate.id) for _, contact, duplicate in pairs], [(a.id, b.id)])
+        self.assertEqual(pairs[0][0], 0.95)
+        # Без змін повторний прохід не потрібен
+        self.assertEqual(await self.worker.drain_once(), 0)
+
+        await crud.update_contact(self.db, c.id, schemas.ContactUpdate(additional_info="note"), self.user.id)
+        merged = await crud.merge_contacts(self.db, self.user.id, a.id, b.id)
+        self.assertEqual(merged.version, 2)
+        self.assertIsNone(await crud.get_contact(self.db, b.id, self.user.id))
+        pairs, pending = await crud.get_duplicate_candidates(self.db, self.user.id)
+        self.assertEqual(pairs, [])
+        self.assertTrue(pending)
+        with self.assertRaises(HTTPException):
+            await crud.merge_contacts(self.db, self.user.id, a.id, b.id)
+
+    async def test_oversized_blocks_are_skipped(self):
+        """Тестуємо пропуск блоків, більших за max_block_size"""
+        for n in range(4):
+            await self.add(n, f"Name{n}", f"Other{n}", "+380441234567", birthday=date(1990, 1, 1 + n))
+        await self.worker.drain_once()
+        pairs, _ = await crud.get_duplicate_candidates(self.db, self.user.id)
+        self.assertEqual(pairs, [])
+
+    async def test_backfill_keys_contacts_created_before_revisions(self):
+        """Тестуємо, що бекфіл ставить у чергу власника з контактами ревізії 0"""
+        owner_id = self.user.id
+        a = await self.add(1, "Іван", "Петренко", "+380 50 123 45 67")
+        b = await self.add(2, "ПЕТРЕНКО", "іван", "0501234567")
+        # Стан до появи ревізій: усі лічильники нульові, ключів немає
+        await self.db.execute(update(Contact).values(revision=0, phone_e164=None, name_key=None))
+        await self.db.execute(update(User).values(contacts_revision=0))
+        await self.db.commit()
+        self.assertEqual(await self.worker.drain_once(), 0)
+
+        self.assertEqual(await mark_unkeyed_owners(self.db), 1)
+        self.assertEqual(await self.worker.drain_once(), 1)
+        pairs, _ = await crud.get_duplicate_candidates(self.db, owner_id)
+        self.assertEqual([(contact.id, duplicate.id) for _, contact, duplicate in pairs], [(a.id, b.id)])
+        self.assertEqual(await mark_unkeyed_owners(self.db), 0)
+
+    async def test_compaction_removes_pairs_of_purged_contacts(self):
+        """Тестуємо, що остаточне видалення надгробка прибирає його пари"""
+        owner_id = self.user.id
+        await self.add(1, "Іван", "Петренко", "+380 50 123 45 67")
+        b = await self.add(2, "ПЕТРЕНКО", "іван", "0501234567")
+        await self.worker.drain_once()
+        await crud.delete_contact(self.db, b.id, owner_id)
+        self.assertEqual(await crud.compact_tombstones(self.db, datetime.now(timezone.utc) + timedelta(days=1)), 1)
+        self.assertEqual((await self.db.execute(select(func.count()).select_from(ContactDuplicate))).scalar(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import crud
+import schemas
+from models import Base, JobCheckpoint, OutboxMessage, User
+from services.digests import checkpoint_name, enqueue_birthday_digests, render_digest
+
+DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+TODAY = date(2024, 12, 29)
+
+
+class TestBirthdayDigests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine(DATABASE_URL)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.db = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)()
+        self.users = []
+        for n, verified in enumerate((True, True, True, False)):
+            user = User(email=f"owner{n}@example.com", hashed_password="hashedpassword", is_verified=verified)
+            self.db.add(user)
+            self.users.append(user)
+        await self.db.commit()
+        for user in self.users:
+            await self.add(user, "Олена", "Січнева", date(1990, 1, 2))
+            await self.add(user, "Петро", "Грудневий", date(1985, 12, 30))
+            await self.add(user, "Марія", "Липнева", date(1992, 7, 1))
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.engine.dispose()
+
+    async def add(self, user: User, first_name: str, last_name: str, birthday: date):
+        contact = schemas.ContactCreate(
+            first_name=first_name,
+            last_name=last_name,
+            email=f"{first_name}.{user.id}@example.com",
+            phone_number="+380501234567",
+            birthday=birthday,
+        )
+        await crud.create_contact(self.db, contact, user.id)
+
+    async def outbox(self):
+        return (await self.db.execute(select(OutboxMessage).order_by(OutboxMessage.id))).scalars().all()
+
+    def test_render_digest(self):
+        """Тестуємо текст листа"""
+        body = render_digest([("Петро", "Грудневий", date(2024, 12, 30)), ("Олена", "Січнева", date(2025, 1, 2))], TODAY)
+        self.assertIn("30.12 (завтра): Петро Грудневий", body)
+        self.assertIn("02.01 (через 4 дн.): Олена Січнева", body)
+
+    async def test_one_digest_per_verified_owner(self):
+        """Тестуємо один лист на власника з днями народження через межу року"""
+        self.assertEqual(await enqueue_birthday_digests(self.db, TODAY, days=7, batch_size=2), 3)
+        messages = await self.outbox()
+        self.assertEqual([message.recipient for message in messages], [user.email for user in self.users[:3]])
+        body = messages[0].body
+        self.assertLess(body.index("Петро"), body.index("Олена"))
+        self.assertNotIn("Марія", body)
+        position = (await self.db.execute(select(JobCheckpoint.position))).scalar()
+        self.assertEqual(position, self.users[2].id)
+
+        # Повторний запуск за той самий день нічого не ставить у чергу
+        self.assertEqual(await enqueue_birthday_digests(self.db, TODAY, days=7, batch_size=2), 0)
+        self.assertEqual(len(await self.outbox()), 3)
+
+    async def test_resume_after_crash(self):
+        """Тестуємо продовження після контрольної точки без повторних листів"""
+        # Стан після збою: перший власник уже в черзі, а контрольна точка не встигла оновитися
+        await enqueue_birthday_digests(self.db, TODAY, days=7, batch_size=1)
+        await self.db.execute(JobCheckpoint.__table__.delete())
+        await self.db.execute(OutboxMessage.__table__.delete().where(OutboxMessage.recipient != self.users[0].email))
+        await self.db.commit()
+
+        self.assertEqual(await enqueue_birthday_digests(self.db, TODAY, days=7), 2)
+        self.assertEqual(len(await self.outbox()), 3)
+        # Дайджест на інший день - окрема контрольна точка і нові ключі
+        self.assertEqual(checkpoint_name(date(2024, 12, 30)), "birthday-digest:2024-12-30")
+        self.assertEqual(await enqueue_birthday_digests(self.db, date(2024, 12, 30), days=7), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
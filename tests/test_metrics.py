@@ -0,0 +1,49 @@
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.metrics import LATENCY_BUCKETS, MetricsMiddleware, MetricsRegistry, RouteMetrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        """Мінімальний застосунок із проміжним шаром метрик"""
+        self.registry = MetricsRegistry()
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware, registry=self.registry)
+
+        @app.get("/contacts/{contact_id}")
+        async def get_contact(contact_id: int):
+            return {"id": contact_id}
+
+        self.client = TestClient(app)
+
+    def test_histogram_buckets(self):
+        """Тестуємо розкладання затримок по кошиках"""
+        metrics = RouteMetrics()
+        metrics.observe(0.001, 200, 0, 10)
+        metrics.observe(100.0, 500, 5, 0)
+        self.assertEqual(metrics.buckets[0], 1)
+        self.assertEqual(metrics.buckets[len(LATENCY_BUCKETS)], 1)
+        self.assertEqual(metrics.statuses, {200: 1, 500: 1})
+        self.assertEqual((metrics.request_bytes, metrics.response_bytes), (5, 10))
+
+    def test_route_template_labels(self):
+        """Тестуємо, що мітками є шаблони маршрутів, а не сирі шляхи"""
+        self.client.get("/contacts/1")
+        self.client.get("/contacts/2")
+        self.client.get("/contacts/abc")
+        self.client.get("/missing")
+        text = self.registry.render()
+        self.assertIn('http_requests_total{method="GET",route="/contacts/{contact_id}",status="200"} 2', text)
+        self.assertIn('http_requests_total{method="GET",route="/contacts/{contact_id}",status="422"} 1', text)
+        self.assertIn('http_requests_total{method="GET",route="<unmatched>",status="404"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/contacts/{contact_id}",le="+Inf"} 3', text)
+        self.assertNotIn("/contacts/1", text)
+        self.assertIn("http_requests_in_flight 0", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
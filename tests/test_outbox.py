@@ -0,0 +1,94 @@
+import socket
+import unittest
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from models import Base, OutboxMessage
+from services.outbox import FAILED, PENDING, SENT, DomainRateLimiter, OutboxWorker, SMTPPool, enqueue_email
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # aiosmtpd - лише для тестів
+    Controller = None
+
+
+class RecordingHandler:
+    """Локальний SMTP-сервер, що запам'ятовує отримані листи"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class TestOutboxWorker(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.SessionLocal = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.handler = RecordingHandler()
+        self.port = free_port()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+
+    async def asyncTearDown(self):
+        self.controller.stop()
+        await self.engine.dispose()
+
+    async def statuses(self):
+        async with self.SessionLocal() as db:
+            return (await db.execute(select(OutboxMessage.status, OutboxMessage.attempts).order_by(OutboxMessage.id))).all()
+
+    async def test_drains_queue_over_reused_connection(self):
+        """Тестуємо відправку порції листів через одне повторно використане з'єднання"""
+        async with self.SessionLocal() as db:
+            for n in range(5):
+                await enqueue_email(db, f"user{n}@example.com", "Subject", f"Body {n}")
+        pool = SMTPPool(host="127.0.0.1", port=self.port, user=None, starttls=False, size=1)
+        worker = OutboxWorker(self.SessionLocal, pool=pool, batch_size=10)
+        self.assertEqual(await worker.drain_once(), 5)
+        await pool.close()
+        self.assertEqual(len(self.handler.messages), 5)
+        self.assertEqual(pool.connects, 1)
+        self.assertEqual([status for status, _ in await self.statuses()], [SENT] * 5)
+        self.assertEqual(await worker.drain_once(), 0)
+
+    async def test_failed_delivery_is_retried_with_backoff(self):
+        """Тестуємо повторну спробу з затримкою та остаточну помилку"""
+        async with self.SessionLocal() as db:
+            await enqueue_email(db, "user@example.com", "Subject", "Body")
+        pool = SMTPPool(host="127.0.0.1", port=free_port(), user=None, starttls=False, size=1, timeout=1)
+        worker = OutboxWorker(self.SessionLocal, pool=pool, max_attempts=2)
+        await worker.drain_once()
+        self.assertEqual(await self.statuses(), [(PENDING, 1)])
+        async with self.SessionLocal() as db:
+            message = (await db.execute(select(OutboxMessage))).scalar_one()
+            self.assertGreater(message.next_attempt_at, datetime.utcnow())
+            message.next_attempt_at = datetime.utcnow()
+            await db.commit()
+        await worker.drain_once()
+        self.assertEqual(await self.statuses(), [(FAILED, 2)])
+
+    async def test_domain_rate_limit_defers_messages(self):
+        """Тестуємо обмеження швидкості на домен"""
+        async with self.SessionLocal() as db:
+            for n in range(3):
+                await enqueue_email(db, f"user{n}@example.com", "Subject", "Body")
+        pool = SMTPPool(host="127.0.0.1", port=self.port, user=None, starttls=False, size=1)
+        worker = OutboxWorker(self.SessionLocal, pool=pool, limiter=DomainRateLimiter(rate=0.01, burst=2))
+        await worker.drain_once()
+        await pool.close()
+        self.assertEqual(len(self.handler.messages), 2)
+        self.assertEqual(sorted(status for status, _ in await self.statuses()), [PENDING, SENT, SENT])
@@ -0,0 +1,39 @@
+import unittest
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from services.passwords import PasswordHasher, get_pwd_context
+
+
+class TestPasswordHasher(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.hasher = PasswordHasher(workers=2, max_pending=2)
+
+    async def asyncTearDown(self):
+        self.hasher.shutdown()
+
+    async def test_hash_and_verify(self):
+        """Тестуємо хешування та перевірку пароля в пулі"""
+        hashed = await self.hasher.hash("secret")
+        valid, new_hash = await self.hasher.verify("secret", hashed)
+        self.assertTrue(valid)
+        self.assertIsNone(new_hash)
+        valid, _ = await self.hasher.verify("wrong", hashed)
+        self.assertFalse(valid)
+
+    async def test_rehash_on_cost_upgrade(self):
+        """Тестуємо оновлення хешу зі слабшою вартістю"""
+        weak = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("secret")
+        valid, new_hash = await self.hasher.verify("secret", weak)
+        self.assertTrue(valid)
+        self.assertIsNotNone(new_hash)
+        self.assertFalse(get_pwd_context().needs_update(new_hash))
+
+    async def test_saturated_pool_returns_503(self):
+        """Тестуємо back-pressure при переповненні черги"""
+        self.hasher.pending = self.hasher.max_pending
+        with self.assertRaises(HTTPException) as ctx:
+            await self.hasher.hash("secret")
+        self.assertEqual(ctx.exception.status_code, 503)
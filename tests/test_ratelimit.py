@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from services.ratelimit import MemoryBackend, SQLiteBackend, parse_rate, ratelimit_collector, storage_errors
+
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+
+    def test_parse_rate(self):
+        """Тестуємо розбір рядка ліміту"""
+        self.assertEqual(parse_rate("5/minute"), (5 / 60, 5))
+        self.assertEqual(parse_rate("10/seconds"), (10.0, 10))
+
+    async def test_burst_then_reject(self):
+        """Тестуємо вичерпання відра та час до наступного токена"""
+        backend = MemoryBackend()
+        results = [await backend.take("user:1", rate=1.0, burst=3) for _ in range(4)]
+        self.assertEqual([allowed for allowed, _ in results], [True, True, True, False])
+        self.assertGreater(results[-1][1], 0)
+        allowed, _ = await backend.take("user:2", rate=1.0, burst=3)
+        self.assertTrue(allowed)
+
+    async def test_sqlite_buckets_are_shared_between_workers(self):
+        """Тестуємо спільний ліміт для двох процесів через один SQLite-файл"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ratelimit.db")
+            first, second = SQLiteBackend(path), SQLiteBackend(path)
+            results = []
+            for backend in (first, second, first, second):
+                allowed, _ = await backend.take("user:1", rate=0.001, burst=3)
+                results.append(allowed)
+            self.assertEqual(results, [True, True, True, False])
+
+    async def test_refilled_buckets_are_evicted(self):
+        """Тестуємо, що відра, які знову наповнилися, не накопичуються"""
+        backend = MemoryBackend(sweep_interval=0)
+        for n in range(100):
+            await backend.take(f"ip:{n}", rate=1000.0, burst=1)
+        time.sleep(0.01)
+        await backend.take("ip:last", rate=1.0, burst=3)
+        self.assertEqual(len(backend), 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = SQLiteBackend(os.path.join(tmp, "ratelimit.db"))
+            for n in range(10):
+                await backend.take(f"ip:{n}", rate=1000.0, burst=1)
+            await backend.take("ip:last", rate=1.0, burst=3)
+            self.assertEqual(backend.sweep(time.time() + 0.01), 10)
+            allowed, _ = await backend.take("ip:last", rate=1.0, burst=3)
+            self.assertTrue(allowed)
+
+    async def test_locked_storage_fails_closed_by_default(self):
+        """Тестуємо відхилення запиту (або пропуск за fail_open), коли файл лімітів заблоковано"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ratelimit.db")
+            closed, opened = SQLiteBackend(path, busy_timeout=0.01), SQLiteBackend(path, busy_timeout=0.01, fail_open=True)
+            holder = sqlite3.connect(path, isolation_level=None)
+            holder.execute("BEGIN IMMEDIATE")
+            before = dict(storage_errors)
+            try:
+                allowed, retry_after = await closed.take("user:1", rate=1.0, burst=3)
+                self.assertFalse(allowed)
+                self.assertGreater(retry_after, 0)
+                allowed, _ = await opened.take("user:1", rate=1.0, burst=3)
+                self.assertTrue(allowed)
+            finally:
+                holder.execute("ROLLBACK")
+                holder.close()
+            self.assertEqual(storage_errors["closed"], before["closed"] + 1)
+            self.assertEqual(storage_errors["open"], before["open"] + 1)
+            self.assertIn('rate_limit_storage_errors_total{mode="closed"}', "\n".join(ratelimit_collector()))
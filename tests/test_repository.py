@@ -1,60 +1,51 @@
+import os
+import tempfile
 import unittest
+
 from fastapi.testclient import TestClient
-from main import app  # імпортуємо додаток FastAPI
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Base, User  # імпортуємо необхідні моделі
 
-# Налаштування тестової бази даних
-DATABASE_URL = "sqlite:///./test.db"  # використовується SQLite для тестування
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from main import create_app
+from settings import Settings
 
-# Створення таблиць для тестів
-Base.metadata.create_all(bind=engine)
 
 class TestUserRegistration(unittest.TestCase):
 
     def setUp(self):
-        """Ініціалізуємо тестову базу даних та клієнта FastAPI перед кожним тестом"""
-        self.db = SessionLocal()
-        self.client = TestClient(app)
-        # Очищаємо базу даних перед кожним тестом
-        self.db.query(User).delete()
-        self.db.commit()
+        """Окремий застосунок із тимчасовою SQLite-базою для кожного тесту"""
+        self.tmp = tempfile.TemporaryDirectory()
+        url = "sqlite+aiosqlite:///" + os.path.join(self.tmp.name, "test.db")
+        self.app = create_app(Settings(database_url=url, secret_key="test-secret", create_schema=True))
 
     def tearDown(self):
-        """Закриваємо тестову базу після кожного тесту"""
-        self.db.close()
+        """Видаляємо тимчасову базу після кожного тесту"""
+        self.tmp.cleanup()
 
     def test_register_user(self):
         """Тестуємо реєстрацію нового користувача"""
-        response = self.client.post("/register/", json={"email": "newuser@example.com", "password": "testpassword"})
-        print(response.json())  # Додаємо виведення відповіді на помилку
-        self.assertEqual(response.status_code, 201)
-        self.assertIn("User created successfully", response.json())
+        with TestClient(self.app) as client:
+            response = client.post("/register/", params={"email": "newuser@example.com", "password": "testpassword"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["message"], "User created successfully")
 
     def test_register_existing_user(self):
         """Тестуємо реєстрацію користувача, який вже існує"""
-        # Створюємо користувача в базі даних
-        db_user = User(email="testuser@example.com", hashed_password="hashedpassword", verification_code="code")
-        self.db.add(db_user)
-        self.db.commit()
-
-        response = self.client.post("/register/", json={"email": "testuser@example.com", "password": "testpassword"})
-        print(response.json())  # Виводимо помилку, щоб зрозуміти, чому 422
-        self.assertEqual(response.status_code, 409)  # Повинно бути 409
-        self.assertEqual(response.json()["detail"], "Email already registered")
+        params = {"email": "testuser@example.com", "password": "testpassword"}
+        with TestClient(self.app) as client:
+            self.assertEqual(client.post("/register/", params=params).status_code, 200)
 
-        # Тепер намагаємося зареєструвати користувача з таким же email
-        response = self.client.post("/register/", json={"email": "testuser@example.com", "password": "testpassword"})
+            # Тепер намагаємося зареєструвати користувача з таким же email
+            response = client.post("/register/", params=params)
         self.assertEqual(response.status_code, 409)  # Повинно бути 409, оскільки користувач вже існує
         self.assertEqual(response.json()["detail"], "Email already registered")
 
     def test_register_user_missing_fields(self):
         """Тестуємо реєстрацію користувача без обов'язкових полів"""
-        response = self.client.post("/register/", json={"email": "incompleteuser@example.com"})
-        print(response.json())  # Додаємо виведення помилки для зрозумілості
+        with TestClient(self.app) as client:
+            response = client.post("/register/", params={"email": "incompleteuser@example.com"})
         self.assertEqual(response.status_code, 422)
         self.assertIn("detail", response.json())
         self.assertEqual(response.json()["detail"][0]["msg"].lower(), "field required")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import crud
+from main import create_app
+from models import Base, User
+from services.cache import UserSnapshot, user_cache
+from services.revocation import RevocationList
+from services.tokens import RESET_PASSWORD, create_purpose_token
+from settings import Settings
+
+
+class TestRevocationList(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.db = AsyncSession(self.engine, expire_on_commit=False)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.engine.dispose()
+
+    async def test_sync_loads_only_live_revocations(self):
+        """Тестуємо синхронізацію з таблицею та пропуск прострочених записів"""
+        now = datetime.utcnow()
+        self.assertTrue(await crud.revoke_token(self.db, "live", now + timedelta(minutes=5)))
+        self.assertFalse(await crud.revoke_token(self.db, "live", now + timedelta(minutes=5)))
+        await crud.revoke_token(self.db, "expired", now - timedelta(minutes=5))
+
+        revocations = RevocationList()
+        self.assertEqual(await revocations.sync(self.db), 1)
+        self.assertTrue(revocations.is_revoked("live"))
+        self.assertFalse(revocations.is_revoked("expired"))
+        self.assertFalse(revocations.is_revoked(None))
+
+        # Наступна синхронізація довантажує нові записи
+        await crud.revoke_token(self.db, "later", now + timedelta(minutes=5))
+        await revocations.sync(self.db)
+        self.assertTrue(revocations.is_revoked("later"))
+        self.assertEqual(await crud.prune_revoked_tokens(self.db), 1)
+
+    async def test_sync_drops_snapshots_after_password_reset(self):
+        """Тестуємо, що скидання пароля в іншому процесі прибирає знімок користувача з кешу"""
+        user = User(email="reset@example.com", hashed_password="hashed")
+        self.db.add(user)
+        await self.db.commit()
+        revocations = RevocationList()
+        await revocations.sync(self.db)
+        user_cache.set(user.email, UserSnapshot.from_user(user))
+
+        # Інший процес: рядок у базі змінено, локальний кеш про це не знає
+        await self.db.execute(User.__table__.update().values(tokens_valid_after=datetime.utcnow()))
+        await self.db.commit()
+        self.assertIsNotNone(user_cache.get("reset@example.com"))
+        await revocations.sync(self.db)
+        self.assertIsNone(user_cache.get("reset@example.com"))
+
+    def test_prune_drops_expired_entries(self):
+        """Тестуємо очищення списку від прострочених jti"""
+        revocations = RevocationList()
+        revocations.add("old", time.time() - 1)
+        revocations.add("new", time.time() + 60)
+        self.assertEqual(revocations.prune(), 1)
+        self.assertEqual(len(revocations), 1)
+
+
+class TestTokenFlow(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        url = "sqlite+aiosqlite:///" + os.path.join(self.tmp.name, "app.db")
+        self.app = create_app(Settings(database_url=url, secret_key="test-secret", create_schema=True))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_login_refresh_rotation_and_logout(self):
+        """Тестуємо вхід, ротацію refresh token, повторне використання та вихід"""
+        with TestClient(self.app) as client:
+            client.post("/register/", params={"email": "user@example.com", "password": "secret"})
+            self.assertEqual(client.post("/login", data={"username": "user@example.com", "password": "bad"}).status_code, 401)
+            tokens = client.post("/login", data={"username": "user@example.com", "password": "secret"}).json()
+            self.assertEqual(tokens["token_type"], "bearer")
+
+            # Refresh token не приймається як access token
+            headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+            self.assertEqual(client.get("/contacts/", headers=headers).status_code, 401)
+
+            rotated = client.post("/refresh", json={"refresh_token": tokens["refresh_token"]})
+            self.assertEqual(rotated.status_code, 200)
+            self.assertEqual(client.post("/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code, 401)
+
+            headers = {"Authorization": f"Bearer {rotated.json()['access_token']}"}
+            self.assertEqual(client.get("/contacts/", headers=headers).status_code, 200)
+            response = client.post("/logout", json={"refresh_token": rotated.json()["refresh_token"]}, headers=headers)
+            self.assertEqual(response.status_code, 204)
+            self.assertEqual(client.get("/contacts/", headers=headers).status_code, 401)
+            self.assertEqual(client.post("/refresh", json={"refresh_token": rotated.json()["refresh_token"]}).status_code, 401)
+
+    def test_password_reset_invalidates_issued_tokens(self):
+        """Тестуємо відхилення токенів, виданих до скидання пароля"""
+        with TestClient(self.app) as client:
+            client.post("/register/", params={"email": "reset@example.com", "password": "secret"})
+            tokens = client.post("/login", data={"username": "reset@example.com", "password": "secret"}).json()
+            headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+            self.assertEqual(client.get("/contacts/", headers=headers).status_code, 200)
+
+            token = create_purpose_token("reset@example.com", RESET_PASSWORD)
+            response = client.post("/reset-password/", json={"token": token, "new_password": "new-secret"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(client.get("/contacts/", headers=headers).status_code, 401)
+            self.assertEqual(client.post("/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code, 401)
+
+            tokens = client.post("/login", data={"username": "reset@example.com", "password": "new-secret"}).json()
+            headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+            self.assertEqual(client.get("/contacts/", headers=headers).status_code, 200)
+            self.assertEqual(client.post("/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
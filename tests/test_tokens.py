@@ -0,0 +1,110 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from main import create_app
+from models import OutboxMessage
+from services.querylog import assert_max_queries
+from services.tokens import (
+    RESET_PASSWORD,
+    VERIFY_EMAIL,
+    MemoryUsedTokenStore,
+    consume_purpose_token,
+    create_purpose_token,
+    decode_purpose_token,
+)
+from settings import Settings
+
+
+class TestPurposeTokens(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        create_app(Settings(secret_key="test-secret"))
+
+    def test_token_is_bound_to_purpose(self):
+        """Тестуємо, що токен підтвердження не приймається для скидання пароля"""
+        token = create_purpose_token("user@example.com", VERIFY_EMAIL)
+        self.assertEqual(decode_purpose_token(token, VERIFY_EMAIL)["sub"], "user@example.com")
+        with self.assertRaises(HTTPException):
+            decode_purpose_token(token, RESET_PASSWORD)
+
+    def test_expired_token_is_rejected(self):
+        """Тестуємо строк дії токена"""
+        token = create_purpose_token("user@example.com", VERIFY_EMAIL, ttl=-1)
+        with self.assertRaises(HTTPException):
+            decode_purpose_token(token, VERIFY_EMAIL)
+
+    async def test_token_can_be_used_once(self):
+        """Тестуємо захист від повторного використання"""
+        store = MemoryUsedTokenStore()
+        token = create_purpose_token("user@example.com", RESET_PASSWORD)
+        await consume_purpose_token(token, RESET_PASSWORD, store)
+        with self.assertRaises(HTTPException) as context:
+            await consume_purpose_token(token, RESET_PASSWORD, store)
+        self.assertEqual(context.exception.status_code, 400)
+
+    async def test_expired_entries_are_purged(self):
+        """Тестуємо, що множина використаних jti не росте безмежно"""
+        store = MemoryUsedTokenStore(purge_every=2)
+        self.assertTrue(await store.claim("old", time.time() - 1))
+        self.assertTrue(await store.claim("new", time.time() + 60))
+        self.assertEqual(list(store._used), ["new"])
+
+
+class TestVerificationFlow(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        url = "sqlite+aiosqlite:///" + os.path.join(self.tmp.name, "app.db")
+        self.app = create_app(Settings(database_url=url, secret_key="test-secret", create_schema=True))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_verify_email_and_reset_password(self):
+        """Тестуємо підтвердження email одним UPDATE і одноразове скидання пароля"""
+        with TestClient(self.app) as client:
+            client.post("/register/", params={"email": "user@example.com", "password": "secret"})
+            token = create_purpose_token("user@example.com", VERIFY_EMAIL)
+            with assert_max_queries(1):
+                response = client.get(f"/verify-email/{token}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(client.get(f"/verify-email/{token}").status_code, 400)
+
+            # Токен підтвердження не є токеном доступу
+            response = client.get("/contacts/", headers={"Authorization": f"Bearer {token}"})
+            self.assertEqual(response.status_code, 401)
+
+            reset = create_purpose_token("user@example.com", RESET_PASSWORD)
+            payload = {"token": reset, "new_password": "new-secret"}
+            self.assertEqual(client.post("/reset-password/", json=payload).status_code, 200)
+            self.assertEqual(client.post("/reset-password/", json=payload).status_code, 400)
+
+    def test_reset_email_only_for_existing_users_and_rate_limited(self):
+        """Тестуємо, що лист скидання ставиться в чергу лише наявному користувачу, а маршрут обмежено"""
+        with TestClient(self.app) as client:
+            client.post("/register/", params={"email": "user@example.com", "password": "secret"})
+            responses = [
+                client.post("/request-password-reset/", params={"email": email})
+                for email in ("nobody@example.com", "user@example.com")
+            ]
+            self.assertEqual(responses[0].json(), responses[1].json())
+            self.assertEqual(asyncio.run(self.outbox_recipients()), ["user@example.com"])
+            client.post("/request-password-reset/", params={"email": "nobody@example.com"})
+            response = client.post("/request-password-reset/", params={"email": "nobody@example.com"})
+            self.assertEqual(response.status_code, 429)
+
+    async def outbox_recipients(self):
+        async with AsyncSessionLocal() as db:
+            return list((await db.execute(select(OutboxMessage.recipient))).scalars().all())
+
+
+if __name__ == "__main__":
+    unittest.main()